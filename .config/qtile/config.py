@@ -2,20 +2,111 @@
 # -*- coding=utf-8 -*-
 
 import os
-import subprocess
 
 # Layouts
 from libqtile import backend, bar, hook, layout, qtile, widget
-from libqtile.config import Click, Drag, DropDown, Group, Key, Match, ScratchPad, Screen
+from libqtile.config import (
+    Click,
+    Drag,
+    DropDown,
+    Group,
+    Key,
+    KeyChord,
+    Match,
+    ScratchPad,
+    Screen,
+)
 from libqtile.lazy import lazy
 
+import dashboard
+import evtrace
+import fonts
+import generation
+import groupbox
+import latency
+import layoutbench
+import loopwatch
+import marquee
+import metrics
+import modes
+import music
+import overview
+import power
+import prewarm
+import profiler
+import services
+import session
+import spawner
+import tasklist
+import timeline
+import updates
+import weather
+
+timeline.mark("config modules imported")
+generation.begin()
+
 # Startup ------------------------------
 
+# Started in parallel once their dependencies are up, see services.py
+autostart_services = [
+    services.Service(
+        "setxkbmap",
+        ["setxkbmap", "us,ir", "-option", "grp:alt_shift_toggle"],
+        oneshot=True,
+    ),
+    # ksuperkey forks into the background, so it is done once it exits
+    services.Service(
+        "ksuperkey",
+        ["ksuperkey", "-e", "Super_L=Alt_L|F1"],
+        after=["setxkbmap"],
+        oneshot=True,
+    ),
+    services.Service(
+        "xsetroot", ["xsetroot", "-cursor_name", "left_ptr"], oneshot=True
+    ),
+    services.Service("compfy", ["compfy"]),
+    services.Service(
+        "feh",
+        ["feh", "--bg-scale", "-z", os.path.expanduser("~/.config/Wallpaper/")],
+        after=["compfy"],
+        oneshot=True,
+    ),
+    services.Service(
+        "dunst", ["dunst"], ready=services.BusName("org.freedesktop.Notifications")
+    ),
+    services.Service(
+        "polkit agent", ["/usr/lib/polkit-gnome/polkit-gnome-authentication-agent-1"]
+    ),
+    services.Service(
+        "xfce4-power-manager",
+        ["xfce4-power-manager", "--no-daemon"],
+        ready=services.BusName("org.xfce.PowerManager"),
+    ),
+    services.Service(
+        "mpd",
+        ["mpd", "--no-daemon"],
+        ready=services.Listening(("localhost", 6600)),
+    ),
+    services.Service(
+        "eww",
+        ["eww", "daemon", "--no-daemonize"],
+        ready=services.Succeeds("eww", "ping"),
+    ),
+]
+
+
+# harness.py runs this config on a throwaway display
+harness = bool(os.environ.get("QTILE_HARNESS"))
+
 
 @hook.subscribe.startup_once
 def autostart():
-    home = os.path.expanduser("~")
-    subprocess.Popen([home + "/.config/qtile/autostart.sh"])
+    if harness:
+        return
+    services.start(autostart_services)
+
+
+hook.subscribe.shutdown(services.stop)
 
 
 # Key Bindings ------------------------------
@@ -36,6 +127,25 @@ file_manager = "pcmanfm"
 text_editor = "kitty -e nvim"
 web_browser = "brave-browser-nightly"
 notify_cmd = "dunstify -u low -h string:x-dunst-stack-tag:qtileconfig"
+# Start the ScratchPad dropdowns hidden after startup so the first toggle is instant
+prewarm_dropdowns = not harness
+# Kill prewarmed dropdowns unused for this many seconds (0 keeps them loaded)
+prewarm_idle_timeout = 30 * 60
+
+# Measure event loop lag and log what was running during stalls, see loopwatch.py
+watch_event_loop = True
+
+# Time every hook, lazy function and bar callback of this config, see profiler.py
+profile_callbacks = False
+
+# Measure bar text once per (font, size, text) for every widget, see fonts.py
+fonts.install()
+
+# Commands are split and resolved once here, see spawner.py
+launch = spawner.Launcher()
+
+# The eww dashboard's open state is tracked here, see dashboard.py
+eww_dashboard = dashboard.Dashboard("dashboard")
 
 colors = {
     "glass": "afafff26",
@@ -49,6 +159,21 @@ colors = {
     "orange": "#F6890A",
 }
 
+# Every window of every group, with thumbnails captured as focus moves, see overview.py
+windows_overview = overview.Overview(
+    background="#000000cc",
+    foreground=colors["white"],
+    highlight=colors["purple"],
+    font="SFMono Nerd Font Bold",
+    font_size=13,
+)
+
+# Group layouts, split ratios and column widths survive restarts, see session.py
+layout_session = session.Session()
+
+# Window, group and key events go to a ring buffer on disk, see evtrace.py
+event_trace = evtrace.Recorder()
+
 
 # resize functions
 def resize(qtile, direction):
@@ -151,294 +276,431 @@ ScratchGroups = (
     ),
 )
 
+# importlib.reload keeps the Prewarm of the previous load here. config.py runs
+# twice per reload_config and only the second copy is started, by the startup
+# hook load_config fires, so the started one is the one to take over from.
+if "scratch" in globals() and scratch.started:
+    previous_scratch = scratch
+elif "previous_scratch" not in globals():
+    previous_scratch = None
+scratch = prewarm.Prewarm("SPD", ["term", "music"], idle_timeout=prewarm_idle_timeout)
 
-keys = [
-    # A list of available commands that can be bound to keys can be found
-    # at https://docs.qtile.org/en/latest/manual/config/lazy.html
-    # Terminal --
-    Key(
-        [mod], "Return", lazy.spawn(terminal), desc="Launch terminal with qtile configs"
-    ),
-    Key(
-        [mod, "shift"],
-        "Return",
-        lazy.spawn(terminalfloat),
-        desc="Launch floating terminal with qtile configs",
-    ),
-    # GUI Apps --
-    Key([mod, "shift"], "f", lazy.spawn(file_manager), desc="Launch file manager"),
-    Key([mod, "shift"], "e", lazy.spawn(text_editor), desc="Launch text editor"),
-    Key([mod, "shift"], "w", lazy.spawn(web_browser), desc="Launch web browser"),
-    # CLI Apps --
-    Key(
-        ["control", "mod1"],
-        "v",
-        lazy.spawn(terminalfloat + " -e nvim"),
-        desc="Open vim in qtile's terminal",
-    ),
-    Key(
-        ["control", "mod1"],
-        "r",
-        lazy.spawn(terminalfloat + " -e ranger"),
-        desc="Open ranger in qtile's terminal",
-    ),
-    Key(
-        ["control", "mod1"],
-        "h",
-        lazy.spawn(terminalfloat + " -e gotop"),
-        desc="Open htop in qtile's terminal",
-    ),
-    Key(
-        ["control", "mod1"],
-        "m",
-        lazy.spawn(terminalfloat + " -e ncmpcpp"),
-        desc="Open ncmpcpp in qtile's terminal",
-    ),
-    # Rofi Applets --
-    Key(
-        ["mod1"],
-        "F1",
-        lazy.spawn("launcher"),
-        desc="Run application launcher",
-    ),
-    Key(
-        [mod],
-        "x",
-        lazy.spawn("powermenu"),
-        desc="Run powermenu applet",
-    ),
-    # Function keys : Brightness --
-    Key(
-        [],
-        "XF86MonBrightnessUp",
-        lazy.spawn(brightness + " --inc"),
-        desc="Increase display brightness",
-    ),
-    Key(
-        [],
-        "XF86MonBrightnessDown",
-        lazy.spawn(brightness + " --dec"),
-        desc="Decrease display brightness",
-    ),
-    # Function keys : Volume --
-    Key(
-        [],
-        "XF86AudioRaiseVolume",
-        lazy.spawn(volume + " --inc"),
-        desc="Raise speaker volume",
-    ),
-    Key(
-        [],
-        "XF86AudioLowerVolume",
-        lazy.spawn(volume + " --dec"),
-        desc="Lower speaker volume",
-    ),
-    Key([], "XF86AudioMute", lazy.spawn(volume + " --toggle"), desc="Toggle mute"),
-    Key(
-        [],
-        "XF86AudioMicMute",
-        lazy.spawn(volume + " --toggle-mic"),
-        desc="Toggle mute for mic",
-    ),
-    # Function keys : Media --
-    Key([], "XF86AudioNext", lazy.spawn("mpc next"), desc="Next track"),
-    Key([], "XF86AudioPrev", lazy.spawn("mpc prev"), desc="Previous track"),
-    Key([], "XF86AudioPlay", lazy.spawn("mpc toggle"), desc="Toggle play/pause"),
-    Key([], "XF86AudioStop", lazy.spawn("mpc stop"), desc="Stop playing"),
-    # Screenshots --
-    Key([], "Print", lazy.spawn(screenshot + " --area"), desc="Take Screenshot"),
-    Key(
-        ["control"],
-        "Print",
-        lazy.spawn(screenshot + " --in5"),
-        desc="Take Screenshot in 5 seconds",
-    ),
-    Key(
-        ["shift"],
-        "Print",
-        lazy.spawn(screenshot + " --in10"),
-        desc="Take Screenshot in 10 seconds",
-    ),
-    Key(
-        ["control", "shift"],
-        "Print",
-        lazy.spawn(screenshot + " --win"),
-        desc="Take Screenshot of active window",
-    ),
-    Key(
-        [mod],
-        "Print",
-        lazy.spawn(screenshot + " --area"),
-        desc="Take Screenshot of selected area",
-    ),
-    # Misc --
-    Key([mod], "p", lazy.spawn("toggle_eww"), desc="Run colorpicker"),
-    Key([mod], "m", lazy.spawn("toggle_music"), desc="Run colorpicker"),
-    # Key([mod], "p", lazy.spawn("toggle_eww"), desc="Run colorpicker"),
-    Key(
-        ["mod1", "control"],
-        "l",
-        lazy.spawn("sh lock.sh"),
-        desc="Run lockscreen",
-    ),
-    # WM Specific --
-    Key([mod], "c", lazy.window.kill(), desc="Kill focused window"),
-    Key([mod], "q", lazy.window.kill(), desc="Kill focused window"),
-    Key([mod], "k", lazy.spawn("keys.sh"), desc="Keybindings"),
-    # Control Qtile
-    Key(
-        [mod, "control"],
-        "r",
-        lazy.reload_config(),
-        lazy.spawn(notify_cmd + ' "Configuration Reloaded!"'),
-        desc="Reload the config",
-    ),
-    Key(
-        [mod, "control"],
-        "s",
-        lazy.restart(),
-        lazy.spawn(notify_cmd + ' "Restarting Qtile..."'),
-        desc="Restart Qtile",
-    ),
-    Key(
-        [mod, "control"],
-        "q",
-        lazy.shutdown(),
-        lazy.spawn(notify_cmd + ' "Exiting Qtile..."'),
-        desc="Shutdown Qtile",
-    ),
-    # Switch between windows
-    Key([mod], "Left", lazy.layout.left(), desc="Move focus to left"),
-    Key([mod], "Right", lazy.layout.right(), desc="Move focus to right"),
-    Key([mod], "Down", lazy.layout.down(), desc="Move focus down"),
-    Key([mod], "Up", lazy.layout.up(), desc="Move focus up"),
-    Key([alt], "Left", resize_left, desc="Resize window left"),
-    Key([alt], "Right", resize_right, desc="Resize window Right"),
-    Key([alt], "Up", resize_up, desc="Resize windows upward"),
-    Key([alt], "Down", resize_down, desc="Resize windows downward"),
-    Key([alt], "n", lazy.layout.normalize(), desc="Normalize window size ratios"),
-    # Move windows between left/right columns or move up/down in current stack.
-    # Moving out of range in Columns layout will create new column.
-    Key(
-        [mod, "shift"],
-        "Left",
-        lazy.layout.shuffle_left(),
-        desc="Move window to the left",
-    ),
-    Key(
-        [mod, "shift"],
-        "Right",
-        lazy.layout.shuffle_right(),
-        desc="Move window to the right",
-    ),
-    Key([mod, "shift"], "Down", lazy.layout.shuffle_down(), desc="Move window down"),
-    Key([mod, "shift"], "Up", lazy.layout.shuffle_up(), desc="Move window up"),
-    # Grow windows. If current window is on the edge of screen and direction
-    # will be to screen edge - window would shrink.
-    Key(
-        [mod, "control"],
-        "Left",
-        lazy.layout.grow_left(),
-        desc="Grow window to the left",
-    ),
-    Key(
-        [mod, "control"],
-        "Right",
-        lazy.layout.grow_right(),
-        desc="Grow window to the right",
-    ),
-    Key([mod, "control"], "Down", lazy.layout.grow_down(), desc="Grow window down"),
-    Key([mod, "control"], "Up", lazy.layout.grow_up(), desc="Grow window up"),
-    Key(
-        [mod, "control"],
-        "Return",
-        lazy.layout.normalize(),
-        desc="Reset all window sizes",
-    ),
-    # Toggle floating and fullscreen
-    Key(
-        [mod],
-        "space",
-        lazy.window.toggle_floating(),
-        desc="Put the focused window to/from floating mode",
-    ),
-    Key(
-        [mod],
-        "f",
-        lazy.window.toggle_fullscreen(),
-        desc="Put the focused window to/from fullscreen mode",
-    ),
-    # Go to next/prev group
-    Key(
-        [mod, "mod1"],
-        "Right",
-        lazy.screen.next_group(),
-        desc="Move to the group on the right",
-    ),
-    Key(
-        [mod, "mod1"],
-        "Left",
-        lazy.screen.prev_group(),
-        desc="Move to the group on the left",
-    ),
-    # Back-n-forth groups
-    Key([mod], "b", lazy.screen.toggle_group(), desc="Move to the last visited group"),
-    # Change focus to other window
-    Key([mod], "Tab", lazy.layout.next(), desc="Move window focus to other window"),
-    # Toggle between different layouts as defined below
-    Key([mod, "shift"], "space", lazy.next_layout(), desc="Toggle between layouts"),
-    # Increase the space for master window at the expense of slave windows
-    Key(
-        [mod],
-        "equal",
-        lazy.layout.increase_ratio(),
-        desc="Increase the space for master window",
-    ),
-    # Decrease the space for master window in the advantage of slave windows
-    Key(
-        [mod],
-        "minus",
-        lazy.layout.decrease_ratio(),
-        desc="Decrease the space for master window",
-    ),
-    # Toggle between split and unsplit sides of stack.
-    Key(
-        [mod, "shift"],
-        "s",
-        lazy.layout.toggle_split(),
-        desc="Toggle between split and unsplit sides of stack",
-    ),
-    Key([mod], "comma", lazy.group["SPD"].dropdown_toggle("term")),
-    Key([mod], "period", lazy.group["SPD"].dropdown_toggle("music")),
-    # Modes: Reize
-    # Modes: Layouts
-]
 
+@hook.subscribe.startup
+def prewarm_scratchpad():
+    if prewarm_dropdowns:
+        scratch.start(previous_scratch)
+    elif previous_scratch is not None:
+        previous_scratch.stop()
 
-def show_keys():
-    key_help = ""
-    for i in range(0, len(keys)):
-        k = keys[i]
-        if not isinstance(k, Key):
-            continue
-        mods = ""
-
-        for m in k.modifiers:
-            if m == "mod4":
-                mods += "Super + "
-            else:
-                mods += m.capitalize() + " + "
-
-        if len(k.key) > 1:
-            mods += k.key.capitalize()
+
+@hook.subscribe.startup
+def prewarm_dashboard():
+    if not harness:
+        eww_dashboard.prewarm()
+
+
+@hook.subscribe.startup
+def start_loopwatch():
+    if watch_event_loop:
+        loopwatch.start()
+
+
+# Key bindings reach the helper objects through these functions, which look
+# them up when a key is pressed: the keys can then be kept across
+# reload_config while the objects are made anew, see generation.py
+@spawner.by_line
+def spawn(qtile, line):
+    return launch.cmd(line).spawn()
+
+
+def toggle_overview(qtile):
+    windows_overview.toggle(qtile)
+
+
+def toggle_dashboard(qtile):
+    eww_dashboard.toggle(qtile)
+
+
+def toggle_dropdown(qtile, name):
+    scratch.toggle(qtile, name)
+
+
+def build_keys():
+    return [
+        # A list of available commands that can be bound to keys can be found
+        # at https://docs.qtile.org/en/latest/manual/config/lazy.html
+        # Terminal --
+        Key(
+            [mod],
+            "Return",
+            lazy.function(spawn, terminal),
+            desc="Launch terminal with qtile configs",
+        ),
+        Key(
+            [mod, "shift"],
+            "Return",
+            lazy.function(spawn, terminalfloat),
+            desc="Launch floating terminal with qtile configs",
+        ),
+        # GUI Apps --
+        Key(
+            [mod, "shift"],
+            "f",
+            lazy.function(spawn, file_manager),
+            desc="Launch file manager",
+        ),
+        Key(
+            [mod, "shift"],
+            "e",
+            lazy.function(spawn, text_editor),
+            desc="Launch text editor",
+        ),
+        Key(
+            [mod, "shift"],
+            "w",
+            lazy.function(spawn, web_browser),
+            desc="Launch web browser",
+        ),
+        # CLI Apps --
+        Key(
+            ["control", "mod1"],
+            "v",
+            lazy.function(spawn, terminalfloat + " -e nvim"),
+            desc="Open vim in qtile's terminal",
+        ),
+        Key(
+            ["control", "mod1"],
+            "r",
+            lazy.function(spawn, terminalfloat + " -e ranger"),
+            desc="Open ranger in qtile's terminal",
+        ),
+        Key(
+            ["control", "mod1"],
+            "h",
+            lazy.function(spawn, terminalfloat + " -e gotop"),
+            desc="Open htop in qtile's terminal",
+        ),
+        Key(
+            ["control", "mod1"],
+            "m",
+            lazy.function(spawn, terminalfloat + " -e ncmpcpp"),
+            desc="Open ncmpcpp in qtile's terminal",
+        ),
+        # Rofi Applets --
+        Key(
+            ["mod1"],
+            "F1",
+            lazy.function(spawn, "launcher"),
+            desc="Run application launcher",
+        ),
+        Key(
+            [mod],
+            "x",
+            lazy.function(spawn, "powermenu"),
+            desc="Run powermenu applet",
+        ),
+        # Function keys : Brightness --
+        Key(
+            [],
+            "XF86MonBrightnessUp",
+            lazy.spawn(brightness + " --inc"),
+            desc="Increase display brightness",
+        ),
+        Key(
+            [],
+            "XF86MonBrightnessDown",
+            lazy.spawn(brightness + " --dec"),
+            desc="Decrease display brightness",
+        ),
+        # Function keys : Volume --
+        Key(
+            [],
+            "XF86AudioRaiseVolume",
+            lazy.spawn(volume + " --inc"),
+            desc="Raise speaker volume",
+        ),
+        Key(
+            [],
+            "XF86AudioLowerVolume",
+            lazy.spawn(volume + " --dec"),
+            desc="Lower speaker volume",
+        ),
+        Key([], "XF86AudioMute", lazy.spawn(volume + " --toggle"), desc="Toggle mute"),
+        Key(
+            [],
+            "XF86AudioMicMute",
+            lazy.spawn(volume + " --toggle-mic"),
+            desc="Toggle mute for mic",
+        ),
+        # Function keys : Media --
+        Key(
+            [], "XF86AudioNext", lazy.function(music.command, "next"), desc="Next track"
+        ),
+        Key(
+            [],
+            "XF86AudioPrev",
+            lazy.function(music.command, "previous"),
+            desc="Previous track",
+        ),
+        Key(
+            [],
+            "XF86AudioPlay",
+            lazy.function(music.command, "toggle"),
+            desc="Toggle play/pause",
+        ),
+        Key(
+            [],
+            "XF86AudioStop",
+            lazy.function(music.command, "stop"),
+            desc="Stop playing",
+        ),
+        # Screenshots --
+        Key([], "Print", lazy.spawn(screenshot + " --area"), desc="Take Screenshot"),
+        Key(
+            ["control"],
+            "Print",
+            lazy.spawn(screenshot + " --in5"),
+            desc="Take Screenshot in 5 seconds",
+        ),
+        Key(
+            ["shift"],
+            "Print",
+            lazy.spawn(screenshot + " --in10"),
+            desc="Take Screenshot in 10 seconds",
+        ),
+        Key(
+            ["control", "shift"],
+            "Print",
+            lazy.spawn(screenshot + " --win"),
+            desc="Take Screenshot of active window",
+        ),
+        Key(
+            [mod],
+            "Print",
+            lazy.spawn(screenshot + " --area"),
+            desc="Take Screenshot of selected area",
+        ),
+        # Misc --
+        Key(
+            [mod],
+            "o",
+            lazy.function(toggle_overview),
+            desc="Show every window across groups",
+        ),
+        Key([mod], "p", lazy.function(toggle_dashboard), desc="Toggle dashboard"),
+        Key([mod], "m", lazy.spawn("toggle_music"), desc="Toggle music widget"),
+        # Key([mod], "p", lazy.spawn("toggle_eww"), desc="Run colorpicker"),
+        Key(
+            ["mod1", "control"],
+            "l",
+            lazy.spawn("sh lock.sh"),
+            desc="Run lockscreen",
+        ),
+        # WM Specific --
+        Key([mod], "c", lazy.window.kill(), desc="Kill focused window"),
+        Key([mod], "q", lazy.window.kill(), desc="Kill focused window"),
+        Key([mod], "k", lazy.spawn("keys.sh"), desc="Keybindings"),
+        # Control Qtile
+        Key(
+            [mod, "control"],
+            "r",
+            lazy.reload_config(),
+            lazy.spawn(notify_cmd + ' "Configuration Reloaded!"'),
+            desc="Reload the config",
+        ),
+        Key(
+            [mod, "control"],
+            "s",
+            lazy.restart(),
+            lazy.spawn(notify_cmd + ' "Restarting Qtile..."'),
+            desc="Restart Qtile",
+        ),
+        Key(
+            [mod, "control"],
+            "q",
+            lazy.shutdown(),
+            lazy.spawn(notify_cmd + ' "Exiting Qtile..."'),
+            desc="Shutdown Qtile",
+        ),
+        # Switch between windows
+        Key([mod], "Left", lazy.layout.left(), desc="Move focus to left"),
+        Key([mod], "Right", lazy.layout.right(), desc="Move focus to right"),
+        Key([mod], "Down", lazy.layout.down(), desc="Move focus down"),
+        Key([mod], "Up", lazy.layout.up(), desc="Move focus up"),
+        # Move windows between left/right columns or move up/down in current stack.
+        # Moving out of range in Columns layout will create new column.
+        Key(
+            [mod, "shift"],
+            "Left",
+            lazy.layout.shuffle_left(),
+            desc="Move window to the left",
+        ),
+        Key(
+            [mod, "shift"],
+            "Right",
+            lazy.layout.shuffle_right(),
+            desc="Move window to the right",
+        ),
+        Key(
+            [mod, "shift"], "Down", lazy.layout.shuffle_down(), desc="Move window down"
+        ),
+        Key([mod, "shift"], "Up", lazy.layout.shuffle_up(), desc="Move window up"),
+        # Toggle floating and fullscreen
+        Key(
+            [mod],
+            "space",
+            lazy.window.toggle_floating(),
+            desc="Put the focused window to/from floating mode",
+        ),
+        Key(
+            [mod],
+            "f",
+            lazy.window.toggle_fullscreen(),
+            desc="Put the focused window to/from fullscreen mode",
+        ),
+        # Go to next/prev group
+        Key(
+            [mod, "mod1"],
+            "Right",
+            lazy.screen.next_group(),
+            desc="Move to the group on the right",
+        ),
+        Key(
+            [mod, "mod1"],
+            "Left",
+            lazy.screen.prev_group(),
+            desc="Move to the group on the left",
+        ),
+        # Back-n-forth groups
+        Key(
+            [mod],
+            "b",
+            lazy.screen.toggle_group(),
+            desc="Move to the last visited group",
+        ),
+        # Change focus to other window
+        Key([mod], "Tab", lazy.layout.next(), desc="Move window focus to other window"),
+        Key([mod], "comma", lazy.function(toggle_dropdown, "term")),
+        Key([mod], "period", lazy.function(toggle_dropdown, "music")),
+        # Modes: Resize
+        # Only grabbed while the mode is on, see modes.py
+        modes.mode(
+            [mod],
+            "r",
+            "resize",
+            [
+                Key([], "Left", resize_left, desc="Resize window left"),
+                Key([], "Right", resize_right, desc="Resize window Right"),
+                Key([], "Up", resize_up, desc="Resize windows upward"),
+                Key([], "Down", resize_down, desc="Resize windows downward"),
+                # Grow windows. If current window is on the edge of screen and
+                # direction will be to screen edge - window would shrink.
+                Key(
+                    ["shift"],
+                    "Left",
+                    lazy.layout.grow_left(),
+                    desc="Grow window to the left",
+                ),
+                Key(
+                    ["shift"],
+                    "Right",
+                    lazy.layout.grow_right(),
+                    desc="Grow window to the right",
+                ),
+                Key(
+                    ["shift"], "Down", lazy.layout.grow_down(), desc="Grow window down"
+                ),
+                Key(["shift"], "Up", lazy.layout.grow_up(), desc="Grow window up"),
+                # Increase the space for master window at the expense of slave windows
+                Key(
+                    [],
+                    "equal",
+                    lazy.layout.increase_ratio(),
+                    desc="Increase the space for master window",
+                ),
+                # Decrease the space for master window in the advantage of slave windows
+                Key(
+                    [],
+                    "minus",
+                    lazy.layout.decrease_ratio(),
+                    desc="Decrease the space for master window",
+                ),
+                Key([], "n", lazy.layout.normalize(), desc="Reset all window sizes"),
+            ],
+        ),
+        # Modes: Layouts
+        modes.mode(
+            [mod],
+            "l",
+            "layouts",
+            [
+                Key([], "space", lazy.next_layout(), desc="Next layout"),
+                Key(["shift"], "space", lazy.prev_layout(), desc="Previous layout"),
+                # Toggle between split and unsplit sides of stack.
+                Key(
+                    [],
+                    "s",
+                    lazy.layout.toggle_split(),
+                    desc="Toggle between split and unsplit sides of stack",
+                ),
+            ]
+            + [
+                Key(
+                    [],
+                    key,
+                    lazy.group.setlayout(name),
+                    lazy.ungrab_chord(),
+                    desc="Use the {} layout".format(name),
+                )
+                for key, name in (
+                    ("b", "bsp"),
+                    ("c", "columns"),
+                    ("m", "max"),
+                    ("t", "monadtall"),
+                    ("w", "monadwide"),
+                    ("x", "matrix"),
+                    ("p", "spiral"),
+                    ("f", "floating"),
+                )
+            ],
+        ),
+    ]
+
+
+keys = generation.section("keys", build_keys)
+
+
+def key_name(k):
+    mods = ""
+
+    for m in k.modifiers:
+        if m == "mod4":
+            mods += "Super + "
         else:
-            mods += k.key
+            mods += m.capitalize() + " + "
+
+    if len(k.key) > 1:
+        mods += k.key.capitalize()
+    else:
+        mods += k.key
+
+    return mods
+
+
+def key_lines(bindings, prefix=""):
+    # a chord's bindings are listed after the keys that start it
+    lines = []
+    for k in bindings:
+        if isinstance(k, KeyChord):
+            lines += key_lines(k.submappings, prefix + key_name(k) + ", ")
+        elif isinstance(k, Key):
+            lines.append("{:<25} {}".format(prefix + key_name(k), k.desc))
+    return lines
 
-        key_help += "{:<25} {}".format(
-            mods, k.desc + ("\n" if i != len(keys) - 1 else "")
-        )
 
-    return key_help
+def show_keys():
+    return "\n".join(key_lines(keys))
 
 
 keys.extend(
@@ -458,19 +720,28 @@ keys.extend(
 
 ## Mouse Bindings ------------------------------
 
+
 # Drag floating layouts.
-mouse = [
-    Drag(
-        [mod],
-        "Button1",
-        lazy.window.set_position_floating(),
-        start=lazy.window.get_position(),
-    ),
-    Drag(
-        [mod], "Button3", lazy.window.set_size_floating(), start=lazy.window.get_size()
-    ),
-    Click([mod], "Button2", lazy.window.bring_to_front()),
-]
+def build_mouse():
+    return [
+        Drag(
+            [mod],
+            "Button1",
+            lazy.window.set_position_floating(),
+            start=lazy.window.get_position(),
+        ),
+        Drag(
+            [mod],
+            "Button3",
+            lazy.window.set_size_floating(),
+            start=lazy.window.get_size(),
+        ),
+        Click([mod], "Button2", lazy.window.bring_to_front()),
+    ]
+
+
+mouse = generation.section("mouse", build_mouse)
+timeline.mark("keys and mouse built")
 
 ## Groups ------------------------------
 groups = [Group(i) for i in "1234567"]
@@ -494,6 +765,7 @@ for i in groups:
         ]
     )
 groups.append(ScratchGroups[0])
+timeline.mark("groups built")
 ## Layouts ------------------------------
 var_bg_color = colors["white"]
 var_active_bg_color = colors["glass"]
@@ -513,253 +785,235 @@ var_gap_left = 2
 var_gap_right = 2
 var_font_name = "JetBrainsMono Nerd Font"
 
-layouts = [
-    # Extension of the Stack layout
-    # Layout inspired by bspwm
-    layout.Bsp(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_on_single=False,
-        border_width=var_border_width,
-        fair=True,
-        grow_amount=1,
-        lower_right=False,
-        margin=var_margin,
-        margin_on_single=None,
-        ratio=1.5,
-        wrap_clients=False,
-    ),
-    layout.Columns(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_on_single=False,
-        border_width=var_border_width,
-        fair=False,
-        grow_amount=10,
-        insert_position=0,
-        margin=var_margin,
-        margin_on_single=None,
-        num_columns=2,
-        split=True,
-        wrap_focus_columns=True,
-        wrap_focus_rows=True,
-        wrap_focus_stacks=True,
-    ),
-    # This layout divides the screen into a matrix of equally sized cells and places one window in each cell.
-    layout.Matrix(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        columns=2,
-        margin=var_margin,
-    ),
-    # Maximized layout
-    layout.Max(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        margin=0,
-    ),
-    # Emulate the behavior of XMonad's default tiling scheme.
-    layout.MonadTall(
-        align=0,
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        change_ratio=0.05,
-        change_size=20,
-        margin=0,
-        max_ratio=0.75,
-        min_ratio=0.25,
-        min_secondary_size=85,
-        new_client_position="after_current",
-        ratio=0.5,
-        single_border_width=None,
-        single_margin=None,
-    ),
-    # Emulate the behavior of XMonad's ThreeColumns layout.
-    layout.MonadThreeCol(
-        align=0,
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        change_ratio=0.05,
-        change_size=20,
-        main_centered=True,
-        margin=0,
-        max_ratio=0.75,
-        min_ratio=0.25,
-        min_secondary_size=85,
-        new_client_position="top",
-        ratio=0.5,
-        single_border_width=None,
-        single_margin=None,
-    ),
-    # Emulate the behavior of XMonad's horizontal tiling scheme.
-    layout.MonadWide(
-        align=0,
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        change_ratio=0.05,
-        change_size=20,
-        margin=0,
-        max_ratio=0.75,
-        min_ratio=0.25,
-        min_secondary_size=85,
-        new_client_position="after_current",
-        ratio=0.5,
-        single_border_width=None,
-        single_margin=None,
-    ),
-    # Tries to tile all windows in the width/height ratio passed in
-    layout.RatioTile(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        fancy=False,
-        margin=var_margin,
-        ratio=1.618,
-        ratio_increment=0.1,
-    ),
-    # This layout cuts piece of screen_rect and places a single window on that piece, and delegates other window placement to other layout
-    layout.Slice(match=None, side="left", width=256),
-    # A mathematical layout, Renders windows in a spiral form by splitting the screen based on a selected ratio.
-    layout.Spiral(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        clockwise=True,
-        main_pane="left",
-        main_pane_ratio=None,
-        margin=0,
-        new_client_position="top",
-        ratio=0.6180469715698392,
-        ratio_increment=0.1,
-    ),
-    # A layout composed of stacks of windows
-    layout.Stack(
-        autosplit=False,
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        fair=False,
-        margin=var_margin,
-        num_stacks=2,
-    ),
-    # A layout with two stacks of windows dividing the screen
-    layout.Tile(
-        add_after_last=False,
-        add_on_top=True,
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_on_single=False,
-        border_width=var_border_width,
-        expand=True,
-        margin=var_margin,
-        margin_on_single=None,
-        master_length=1,
-        master_match=None,
-        max_ratio=0.85,
-        min_ratio=0.15,
-        ratio=0.618,
-        ratio_increment=0.05,
-        shift_windows=False,
-    ),
-    # This layout works just like Max but displays tree of the windows at the left border of the screen_rect, which allows you to overview all opened windows.
-    layout.TreeTab(
-        active_bg=colors["black"],
-        active_fg=var_active_fg_color,
-        bg_color=colors["glass"],
-        border_width=var_border_width,
-        font=var_font_name,
-        fontshadow=None,
-        fontsize=14,
-        inactive_bg=var_inactive_bg_color,
-        inactive_fg=var_inactive_fg_color,
-        level_shift=0,
-        margin_left=0,
-        margin_y=0,
-        padding_left=10,
-        padding_x=10,
-        padding_y=10,
-        panel_width=100,
-        place_right=False,
-        previous_on_rm=False,
-        section_bottom=0,
-        section_fg=var_section_fg_color,
-        section_fontsize=14,
-        section_left=10,
-        section_padding=10,
-        section_top=10,
-        sections=["Default"],
-        urgent_bg=var_urgent_bg_color,
-        urgent_fg=var_urgent_fg_color,
-        vspace=5,
-    ),
-    # Tiling layout that works nice on vertically mounted monitors
-    layout.VerticalTile(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        margin=var_margin,
-    ),
-    # A layout with single active windows, and few other previews at the right
-    layout.Zoomy(
-        columnwidth=300,
-        margin=var_margin,
-        property_big="1.0",
-        property_name="ZOOM",
-        property_small="0.1",
-    ),
-    # Floating layout, which does nothing with windows but handles focus order
-    layout.Floating(
-        border_focus=var_active_color,
-        border_normal=var_normal_color,
-        border_width=var_border_width,
-        fullscreen_border_width=0,
-        max_border_width=2,
-    ),
-]
-
-
-## Screens ------------------------------
-def apps():
-    qtile.cmd_spawn("launcher")
-
-
-def powermenu():
-    qtile.cmd_spawn("powermenu")
-
-
-def search():
-    qtile.cmd_spawn("fsearch")
-
-
-def ranger():
-    qtile.cmd_spawn(terminalfloat + " -e ranger")
-
-
-def pacseek():
-    qtile.cmd_spawn(terminalfloat + " -e pacseek")
 
-
-def nmtui():
-    qtile.cmd_spawn("nmgui")
-
-
-def cal():
-    qtile.cmd_spawn("galendae -c" + home + "/.config/qtile/cal.conf")
-
-
-def dash():
-    qtile.cmd_spawn("toggle_eww")
+def build_layouts():
+    return [
+        # Extension of the Stack layout
+        # Layout inspired by bspwm
+        layout.Bsp(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_on_single=False,
+            border_width=var_border_width,
+            fair=True,
+            grow_amount=1,
+            lower_right=False,
+            margin=var_margin,
+            margin_on_single=None,
+            ratio=1.5,
+            wrap_clients=False,
+        ),
+        layout.Columns(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_on_single=False,
+            border_width=var_border_width,
+            fair=False,
+            grow_amount=10,
+            insert_position=0,
+            margin=var_margin,
+            margin_on_single=None,
+            num_columns=2,
+            split=True,
+            wrap_focus_columns=True,
+            wrap_focus_rows=True,
+            wrap_focus_stacks=True,
+        ),
+        # This layout divides the screen into a matrix of equally sized cells and places one window in each cell.
+        layout.Matrix(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            columns=2,
+            margin=var_margin,
+        ),
+        # Maximized layout
+        layout.Max(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            margin=0,
+        ),
+        # Emulate the behavior of XMonad's default tiling scheme.
+        layout.MonadTall(
+            align=0,
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            change_ratio=0.05,
+            change_size=20,
+            margin=0,
+            max_ratio=0.75,
+            min_ratio=0.25,
+            min_secondary_size=85,
+            new_client_position="after_current",
+            ratio=0.5,
+            single_border_width=None,
+            single_margin=None,
+        ),
+        # Emulate the behavior of XMonad's ThreeColumns layout.
+        layout.MonadThreeCol(
+            align=0,
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            change_ratio=0.05,
+            change_size=20,
+            main_centered=True,
+            margin=0,
+            max_ratio=0.75,
+            min_ratio=0.25,
+            min_secondary_size=85,
+            new_client_position="top",
+            ratio=0.5,
+            single_border_width=None,
+            single_margin=None,
+        ),
+        # Emulate the behavior of XMonad's horizontal tiling scheme.
+        layout.MonadWide(
+            align=0,
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            change_ratio=0.05,
+            change_size=20,
+            margin=0,
+            max_ratio=0.75,
+            min_ratio=0.25,
+            min_secondary_size=85,
+            new_client_position="after_current",
+            ratio=0.5,
+            single_border_width=None,
+            single_margin=None,
+        ),
+        # Tries to tile all windows in the width/height ratio passed in
+        layout.RatioTile(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            fancy=False,
+            margin=var_margin,
+            ratio=1.618,
+            ratio_increment=0.1,
+        ),
+        # This layout cuts piece of screen_rect and places a single window on that piece, and delegates other window placement to other layout
+        layout.Slice(match=None, side="left", width=256),
+        # A mathematical layout, Renders windows in a spiral form by splitting the screen based on a selected ratio.
+        layout.Spiral(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            clockwise=True,
+            main_pane="left",
+            main_pane_ratio=None,
+            margin=0,
+            new_client_position="top",
+            ratio=0.6180469715698392,
+            ratio_increment=0.1,
+        ),
+        # A layout composed of stacks of windows
+        layout.Stack(
+            autosplit=False,
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            fair=False,
+            margin=var_margin,
+            num_stacks=2,
+        ),
+        # A layout with two stacks of windows dividing the screen
+        layout.Tile(
+            add_after_last=False,
+            add_on_top=True,
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_on_single=False,
+            border_width=var_border_width,
+            expand=True,
+            margin=var_margin,
+            margin_on_single=None,
+            master_length=1,
+            master_match=None,
+            max_ratio=0.85,
+            min_ratio=0.15,
+            ratio=0.618,
+            ratio_increment=0.05,
+            shift_windows=False,
+        ),
+        # This layout works just like Max but displays tree of the windows at the left border of the screen_rect, which allows you to overview all opened windows.
+        layout.TreeTab(
+            active_bg=colors["black"],
+            active_fg=var_active_fg_color,
+            bg_color=colors["glass"],
+            border_width=var_border_width,
+            font=var_font_name,
+            fontshadow=None,
+            fontsize=14,
+            inactive_bg=var_inactive_bg_color,
+            inactive_fg=var_inactive_fg_color,
+            level_shift=0,
+            margin_left=0,
+            margin_y=0,
+            padding_left=10,
+            padding_x=10,
+            padding_y=10,
+            panel_width=100,
+            place_right=False,
+            previous_on_rm=False,
+            section_bottom=0,
+            section_fg=var_section_fg_color,
+            section_fontsize=14,
+            section_left=10,
+            section_padding=10,
+            section_top=10,
+            sections=["Default"],
+            urgent_bg=var_urgent_bg_color,
+            urgent_fg=var_urgent_fg_color,
+            vspace=5,
+        ),
+        # Tiling layout that works nice on vertically mounted monitors
+        layout.VerticalTile(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            margin=var_margin,
+        ),
+        # A layout with single active windows, and few other previews at the right
+        layout.Zoomy(
+            columnwidth=300,
+            margin=var_margin,
+            property_big="1.0",
+            property_name="ZOOM",
+            property_small="0.1",
+        ),
+        # Floating layout, which does nothing with windows but handles focus order
+        layout.Floating(
+            border_focus=var_active_color,
+            border_normal=var_normal_color,
+            border_width=var_border_width,
+            fullscreen_border_width=0,
+            max_border_width=2,
+        ),
+    ]
 
 
-def update():
-    qtile.cmd_spawn(terminalfloat + " -e yay")
+layouts = generation.section("layouts", build_layouts)
+timeline.mark("layouts built")
 
 
+## Screens ------------------------------
+apps = launch.cmd("launcher")
+powermenu = launch.cmd("powermenu")
+search = launch.cmd("fsearch")
+ranger = launch.cmd(terminalfloat + " -e ranger")
+pacseek = launch.cmd(terminalfloat + " -e pacseek")
+nmtui = launch.cmd("nmgui")
+cal = launch.cmd("galendae -c" + home + "/.config/qtile/cal.conf", name="galendae")
+dash = eww_dashboard.toggle
+update = launch.cmd(terminalfloat + " -e yay")
+
+
+# Not a generation.py section: reload_config finalizes every bar and widget
 screens = [
     Screen(
         top=bar.Bar(
@@ -780,7 +1034,7 @@ screens = [
                     foreground=colors["magenta"],
                     size_percent=100,
                 ),
-                widget.GroupBox(
+                groupbox.GroupBox(
                     font="SFMono Nerd Font Bold",
                     fontsize=14,
                     borderwidth=2,
@@ -827,6 +1081,22 @@ screens = [
                     font="SFMono Nerd Font Bold",
                     fontsize=13,
                 ),
+                # The active mode, if any
+                widget.Chord(
+                    background=colors["glass"],
+                    foreground=colors["purple"],
+                    fmt="{}",
+                    font="SFMono Nerd Font Bold",
+                    fontsize=13,
+                ),
+                # Replayed cost of the current layout, see layoutbench.py
+                layoutbench.LayoutCost(
+                    background=colors["glass"],
+                    foreground=colors["orange"],
+                    font="SFMono Nerd Font Bold",
+                    fontsize=12,
+                    update_interval=5,
+                ),
                 widget.Sep(
                     background=colors["glass"],
                     foreground=colors["magenta"],
@@ -856,7 +1126,7 @@ screens = [
                     foreground=colors["magenta"],
                     size_percent=100,
                 ),
-                widget.TaskList(
+                tasklist.TaskList(
                     background=colors["glass"],
                     border=colors["purple"],
                     borderwidth=2,
@@ -895,7 +1165,7 @@ screens = [
                     margin=0,
                     background=colors["glass"],
                 ),
-                widget.Mpd2(
+                music.Mpd(
                     background=colors["glass"],
                     foreground=colors["white"],
                     fmt="{}",
@@ -915,6 +1185,20 @@ screens = [
                 #     length=-8,
                 #     background=colors["glass"],
                 # ),
+                latency.SpawnLatency(
+                    background=colors["glass"],
+                    foreground=colors["orange"],
+                    font="SFMono Nerd Font Bold",
+                    fontsize=12,
+                    update_interval=5,
+                ),
+                loopwatch.LoopLatency(
+                    background=colors["glass"],
+                    foreground=colors["white"],
+                    font="SFMono Nerd Font Bold",
+                    fontsize=12,
+                    update_interval=5,
+                ),
                 widget.Sep(
                     background=colors["glass"],
                     foreground=colors["magenta"],
@@ -939,7 +1223,7 @@ screens = [
                     background=colors["glass"],
                     margin=0,
                 ),
-                widget.CheckUpdates(
+                updates.CheckUpdates(
                     background=colors["glass"],
                     foreground=colors["white"],
                     colour_have_updates=colors["blue"],
@@ -958,7 +1242,7 @@ screens = [
                     background=colors["glass"],
                     margin=0,
                 ),
-                widget.Wttr(
+                weather.Wttr(
                     background=colors["glass"],
                     foreground=colors["white"],
                     location={},
@@ -975,7 +1259,7 @@ screens = [
                     background=colors["glass"],
                     margin=2,
                 ),
-                widget.Wlan(
+                marquee.Wlan(
                     background=colors["glass"],
                     interface="wlp2s0",
                     format="{essid}{percent:2.0%}",
@@ -1007,7 +1291,7 @@ screens = [
                     filename="~/.config/qtile/IconsNew/ssd.png",
                     margin=1,
                 ),
-                widget.DF(
+                metrics.DF(
                     background=colors["glass"],
                     foreground=colors["blue"],
                     format="{uf}|{r:.0f}%",
@@ -1023,7 +1307,7 @@ screens = [
                     background=colors["glass"],
                     margin=1,
                 ),
-                widget.Memory(
+                metrics.Memory(
                     background=colors["glass"],
                     format="{MemUsed: .0f}{mm}",
                     foreground=colors["white"],
@@ -1031,12 +1315,12 @@ screens = [
                     fontsize=13,
                     update_interval=3,
                 ),
-                widget.BatteryIcon(
+                power.BatteryIcon(
                     theme_path="~/.config/qtile/IconsNew/Battery/",
                     background=colors["glass"],
                     scale=1,
                 ),
-                widget.Battery(
+                power.Battery(
                     font="SFMono Nerd Font Bold",
                     background=colors["glass"],
                     foreground=colors["white"],
@@ -1103,6 +1387,25 @@ screens = [
         ),
     ),
 ]
+timeline.mark("bars and widgets built")
+
+# Time bar setup, first paints and autostart until everything is up, see timeline.py
+timeline.instrument(screens)
+
+# Time every spawning key, mouse binding and bar callback until its window maps
+latency.instrument(keys, mouse, screens)
+
+if profile_callbacks:
+    keys.append(
+        Key(
+            [mod, "control"],
+            "p",
+            lazy.function(profiler.dump),
+            desc="Dump the callback profile",
+        )
+    )
+    profiler.wrap_config(keys, mouse, screens)
+
 ## General Configuration Variables ------------------------------
 
 # If a window requests to be fullscreen, it is automatically fullscreened.
@@ -1126,29 +1429,33 @@ dgroups_app_rules = []  # type: list
 
 
 # The default floating layout to use. This allows you to set custom floating rules among other things if you wish.
-floating_layout = layout.Floating(
-    border_focus=var_active_color,
-    border_normal=var_normal_color,
-    border_width=var_border_width,
-    float_rules=[
-        # Run the utility of `xprop` to see the wm class and name of an X client.
-        *layout.Floating.default_float_rules,
-        Match(wm_class="matplotlib"),
-        Match(wm_class="Lxappearance"),
-        Match(wm_class="Pavucontrol|Xfce4-power-manager-settings"),
-        Match(wm_class="Xfce4-power-manager-settings"),
-        Match(wm_class="feh|Viewnior|Mpv"),
-        Match(wm_class="Kvantum Manager|qt5ct"),
-        Match(title="branchdialog"),
-        Match(wm_class="Fsearch"),
-        Match(wm_class="TelegramDesktop"),
-        Match(wm_class="Bluetooth|bluetooth"),
-        Match(wm_class="Windscribe2"),
-        Match(wm_class="MATLAB R2018b|matlab r2018b"),
-        Match(wm_class="Blueman-manager"),
-        Match(wm_class="kitty"),
-    ],
-)
+def build_floating_layout():
+    return layout.Floating(
+        border_focus=var_active_color,
+        border_normal=var_normal_color,
+        border_width=var_border_width,
+        float_rules=[
+            # Run the utility of `xprop` to see the wm class and name of an X client.
+            *layout.Floating.default_float_rules,
+            Match(wm_class="matplotlib"),
+            Match(wm_class="Lxappearance"),
+            Match(wm_class="Pavucontrol|Xfce4-power-manager-settings"),
+            Match(wm_class="Xfce4-power-manager-settings"),
+            Match(wm_class="feh|Viewnior|Mpv"),
+            Match(wm_class="Kvantum Manager|qt5ct"),
+            Match(title="branchdialog"),
+            Match(wm_class="Fsearch"),
+            Match(wm_class="TelegramDesktop"),
+            Match(wm_class="Bluetooth|bluetooth"),
+            Match(wm_class="Windscribe2"),
+            Match(wm_class="MATLAB R2018b|matlab r2018b"),
+            Match(wm_class="Blueman-manager"),
+            Match(wm_class="kitty"),
+        ],
+    )
+
+
+floating_layout = generation.section("floating rules", build_floating_layout)
 
 # Behavior of the _NET_ACTIVATE_WINDOW message sent by applications
 #
@@ -1186,3 +1493,5 @@ auto_minimize = False
 # We choose LG3D to maximize irony: it is a 3D non-reparenting WM written in
 # java that happens to be on java's whitelist.
 wmname = "Qtile"
+
+generation.finish()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Eww dashboard ------------------------------
+#
+# toggle_eww asked eww which windows were open (`eww windows | grep`) before
+# every open or close: two client launches and a daemon round trip per press.
+# Dashboard asks once, when the eww daemon answers after startup, and from
+# then on tracks the state itself (also from the window's eww-<name> class
+# appearing or going away), so a press is a single `eww open` or `eww close`.
+# Presses within `debounce` seconds of the last one (key repeat, double
+# clicks) are dropped, and presses while a command is still running are
+# coalesced into the state the last press asked for.
+
+import asyncio
+import shutil
+import time
+
+from libqtile import hook
+from libqtile.log_utils import logger
+
+
+class Dashboard:
+    def __init__(self, window="dashboard", eww="eww", debounce=0.25, wait=15):
+        self.window = window
+        self.binary = shutil.which(eww) or eww
+        self.debounce = debounce
+        self.wait = wait
+        self.wm_class = "eww-" + window
+        self.open = False
+        self.wanted = False
+        self.synced = False
+        self.busy = False
+        self.last = 0
+        hook.subscribe.client_new(self.on_client_new)
+        hook.subscribe.client_killed(self.on_client_killed)
+
+    async def _eww(self, *args):
+        proc = await asyncio.create_subprocess_exec(
+            self.binary,
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        out, _ = await proc.communicate()
+        return proc.returncode, out.decode(errors="replace")
+
+    async def sync(self):
+        code, out = await self._eww("active-windows")
+        if code == 0:
+            # "<id>: <name>" per open window
+            names = [line.partition(":")[2].strip() for line in out.splitlines()]
+            is_open = self.window in names
+        else:
+            # eww before active-windows marks open windows with a '*'
+            code, out = await self._eww("windows")
+            is_open = "*" + self.window in out.split()
+        if code != 0:
+            return False
+        self.open = self.wanted = is_open
+        self.synced = True
+        return True
+
+    async def _prewarm(self):
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            try:
+                if (await self._eww("ping"))[0] == 0:
+                    await self.sync()
+                    return
+            except OSError as e:
+                logger.warning("dashboard: cannot run eww: %s", e)
+                return
+            await asyncio.sleep(0.2)
+
+    def prewarm(self):
+        asyncio.create_task(self._prewarm())
+
+    def toggle(self, qtile=None):
+        now = time.monotonic()
+        if now - self.last < self.debounce:
+            return
+        self.last = now
+        self.wanted = not self.wanted
+        if not self.busy:
+            asyncio.create_task(self._apply())
+
+    async def _apply(self):
+        self.busy = True
+        try:
+            if not self.synced and await self.sync():
+                self.wanted = not self.open
+            while self.wanted != self.open:
+                target = self.wanted
+                code, _ = await self._eww("open" if target else "close", self.window)
+                if code != 0:
+                    logger.warning("dashboard: eww could not toggle %s", self.window)
+                    self.wanted = self.open
+                    break
+                self.open = target
+        except OSError as e:
+            logger.warning("dashboard: cannot run eww: %s", e)
+            self.wanted = self.open
+        finally:
+            self.busy = False
+
+    def _is_dashboard(self, window):
+        return self.wm_class in (window.get_wm_class() or [])
+
+    def on_client_new(self, window):
+        if self._is_dashboard(window):
+            self.open = True
+            if not self.busy:
+                self.wanted = True
+
+    def on_client_killed(self, window):
+        if self._is_dashboard(window):
+            self.open = False
+            if not self.busy:
+                self.wanted = False
@@ -0,0 +1,578 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Window event trace ------------------------------
+#
+# `Recorder` logs what happens on the desktop to ~/.cache/qtile/evtrace.bin:
+# windows mapping, unmapping, taking the focus, changing their title or moving
+# to another group, group and layout switches, and key presses. The file is a
+# ring of fixed 32-byte records behind a small header, mapped into memory, so
+# recording an event costs one struct.pack_into and no system call. When the
+# ring is full the oldest records are overwritten. The ring outlives
+# restarts; each start adds the windows already there and the current group,
+# so a replay can begin anywhere in it. Titles are cut to their first bytes
+# (and their length), window classes likewise.
+#
+# Run as a script, it prints a trace or replays it. The replay starts qtile
+# with this config on a throwaway Xvfb, as harness.py does. Every window is a
+# real X window, and the events are sent as fast as the server takes them:
+# XTEST for the keys, pager messages for the focus and group switches, IPC
+# for group moves and layouts. A last window, named after the run, marks the
+# end. The time is compared with the harness baseline. Spawned
+# commands find an empty PATH, as in harness.py, and keys bound to shutdown,
+# restart or reload_config are skipped.
+#
+# `smoke` replays a short trace with one event of each kind and checks where
+# qtile ended up, and that its own Recorder logged the group move.
+#
+#   python evtrace.py dump [trace]
+#   python evtrace.py replay [--save] [--display :N] [trace]
+#   python evtrace.py smoke [--display :N]
+
+import collections
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+try:
+    from libqtile import hook, qtile
+    from libqtile.command.base import CommandError, CommandException, SelectError
+    from libqtile.log_utils import logger
+    from libqtile.scratchpad import ScratchPad
+except ImportError:
+    # dump only needs the standard library
+    hook = qtile = logger = ScratchPad = None
+
+import harness
+
+trace_path = os.path.expanduser("~/.cache/qtile/evtrace.bin")
+
+MAGIC = b"QEVT"
+VERSION = 1
+# magic, version, record size, capacity, records written
+header = struct.Struct("<4sHHIQ12x")
+# time, window, value (keysym or title length), kind, group, mask, text
+record = struct.Struct("<dIIBBH12s")
+
+MAP, UNMAP, FOCUS, TITLE, MOVE, GROUP, LAYOUT, KEY = range(8)
+kinds = ["map", "unmap", "focus", "title", "move", "group", "layout", "key"]
+
+FLOATING = 1
+
+Event = collections.namedtuple(
+    "Event", "time kind wid value group mask text", defaults=(0, 0, 0, 0, "")
+)
+
+# keys whose replay would end it
+blocked_commands = {"shutdown", "restart", "reload_config"}
+
+
+def read(path=trace_path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, size, capacity, count = header.unpack_from(data)
+    if magic != MAGIC or version != VERSION or size != record.size:
+        raise ValueError("{} is not an event trace".format(path))
+    first = max(0, count - capacity)
+    events = []
+    for n in range(first, count):
+        at, wid, value, kind, group, mask, text = record.unpack_from(
+            data, header.size + (n % capacity) * record.size
+        )
+        text = text.rstrip(b"\0").decode(errors="ignore")
+        events.append(Event(at, kind, wid, value, group, mask, text))
+    return events
+
+
+class Recorder:
+    def __init__(self, path=trace_path, capacity=65536):
+        self.path = path
+        self.capacity = capacity
+        # mapped at startup, which also records what is there by then
+        self.map = None
+        self.count = 0
+        # group index per window: group_window_add comes after group.remove
+        # has cleared window.group, so a move is told apart from here
+        self.where = {}
+        hook.subscribe.startup(self.start)
+        hook.subscribe.client_managed(self.on_map)
+        hook.subscribe.client_killed(self.on_unmap)
+        hook.subscribe.client_focus(self.on_focus)
+        hook.subscribe.client_name_updated(self.on_title)
+        hook.subscribe.group_window_add(self.on_move)
+        hook.subscribe.setgroup(self.on_group)
+        hook.subscribe.layout_change(self.on_layout)
+        hook.subscribe.shutdown(self.flush)
+
+    def _open(self):
+        size = header.size + self.capacity * record.size
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fresh = os.fstat(fd).st_size != size
+            if fresh:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            mapped = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        found = header.unpack_from(mapped)
+        if fresh or found[:4] != (MAGIC, VERSION, record.size, self.capacity):
+            header.pack_into(mapped, 0, MAGIC, VERSION, record.size, self.capacity, 0)
+        return mapped
+
+    def put(self, kind, wid=0, value=0, group=0, mask=0, text=""):
+        if self.map is None:
+            return
+        offset = header.size + (self.count % self.capacity) * record.size
+        record.pack_into(
+            self.map,
+            offset,
+            time.time(),
+            wid,
+            value,
+            kind,
+            group,
+            mask,
+            text.encode(errors="replace")[:12],
+        )
+        self.count += 1
+        struct.pack_into("<Q", self.map, 12, self.count)
+
+    def flush(self):
+        if self.map is not None:
+            self.map.flush()
+
+    def _group(self, group):
+        return qtile.groups.index(group) if group in qtile.groups else 0
+
+    def start(self):
+        try:
+            self.map = self._open()
+        except OSError as e:
+            logger.warning("evtrace: cannot open %s: %s", self.path, e)
+            return
+        self.count = header.unpack_from(self.map)[4]
+        self.on_group()
+        for group in qtile.groups:
+            for window in group.windows:
+                self.on_map(window)
+        self.install()
+
+    def install(self):
+        # the wrapper of the previous config load
+        process = getattr(qtile.process_key_event, "__wrapped__", None)
+        process = process or qtile.process_key_event
+
+        def recorded(keysym, mask):
+            self.put(KEY, value=keysym, mask=mask)
+            process(keysym, mask)
+
+        recorded.__wrapped__ = process
+        qtile.process_key_event = recorded
+
+    # hooks
+
+    def on_map(self, window):
+        wm_class = window.get_wm_class() or [""]
+        self.where[window.wid] = self._group(window.group)
+        self.put(
+            MAP,
+            window.wid,
+            group=self.where[window.wid],
+            mask=FLOATING if window.floating else 0,
+            text=wm_class[-1],
+        )
+
+    def on_unmap(self, window):
+        self.where.pop(window.wid, None)
+        self.put(UNMAP, window.wid)
+
+    def on_focus(self, window):
+        self.put(FOCUS, window.wid)
+
+    def on_title(self, window):
+        name = window.name or ""
+        self.put(TITLE, window.wid, len(name), text=name)
+
+    def on_move(self, group, window):
+        # also fires when a new window is first added, before client_managed
+        index = self._group(group)
+        before = self.where.get(window.wid)
+        self.where[window.wid] = index
+        if before is not None and before != index:
+            self.put(MOVE, window.wid, group=index)
+
+    def on_group(self):
+        group = qtile.current_group
+        self.put(GROUP, group=self._group(group), text=group.name)
+
+    def on_layout(self, layout, group):
+        self.put(LAYOUT, group=self._group(group), text=layout.name)
+
+
+# Run inside qtile, through eval ------------------------------
+
+
+def _keys(qtile, keys):
+    for key in keys:
+        yield qtile.core.lookup_key(key), key
+        yield from _keys(qtile, getattr(key, "submappings", []))
+
+
+def blocked_keys(qtile):
+    return json.dumps(
+        sorted(
+            {
+                found
+                for found, key in _keys(qtile, qtile.config.keys)
+                if any(
+                    call.name in blocked_commands
+                    for call in getattr(key, "commands", ())
+                )
+            }
+        )
+    )
+
+
+def names(qtile):
+    return json.dumps(
+        {
+            "groups": [[g.name, isinstance(g, ScratchPad)] for g in qtile.groups],
+            "layouts": [layout.name for layout in qtile.config.layouts],
+        }
+    )
+
+
+def moves(qtile):
+    # the group moves this qtile has recorded, as [wid, group index]
+    return json.dumps([[e.wid, e.group] for e in read() if e.kind == MOVE])
+
+
+# Replay ------------------------------
+
+
+class Player:
+    def __init__(self, x, client, names, blocked):
+        self.x = x
+        self.client = client
+        self.groups = names["groups"]
+        self.layouts = names["layouts"]
+        self.blocked = blocked
+        self.modifiers = {}
+        self.windows = {}
+        self.current = None
+        self.played = collections.Counter()
+        self.skipped = collections.Counter()
+
+    def play(self, event):
+        handler = getattr(self, "_" + kinds[event.kind], None)
+        if handler is None or handler(event) is False:
+            self.skipped[kinds[event.kind]] += 1
+        else:
+            self.played[kinds[event.kind]] += 1
+
+    def _command(self, call):
+        # IPC can overtake the X events still queued: retry until qtile is there
+        deadline = time.monotonic() + 2
+        while True:
+            try:
+                return call()
+            except (CommandError, CommandException, SelectError):
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.001)
+
+    def _name(self, event):
+        if event.group >= len(self.groups):
+            return None
+        return self.groups[event.group]
+
+    def _map(self, event):
+        name, scratchpad = self._name(event) or (None, True)
+        if scratchpad or event.wid in self.windows:
+            return False
+        wid = self.x.create(event.text.encode() + b"\0" + event.text.encode() + b"\0")
+        self.windows[event.wid] = wid
+        if self.current is not None and event.group != self.current:
+            self.x.conn.flush()
+            self._command(lambda: self.client.window[wid].togroup(name))
+
+    def _unmap(self, event):
+        wid = self.windows.pop(event.wid, None)
+        if wid is None:
+            return False
+        self.x.core.DestroyWindow(wid)
+
+    def _focus(self, event):
+        wid = self.windows.get(event.wid)
+        if wid is None:
+            return False
+        # source 2, a pager: qtile switches to the window's group and focuses it
+        self.x.message(wid, "_NET_ACTIVE_WINDOW", [2])
+
+    def _title(self, event):
+        wid = self.windows.get(event.wid)
+        if wid is None:
+            return False
+        self.x.set_name(wid, event.text + "x" * max(0, event.value - len(event.text)))
+
+    def _move(self, event):
+        wid = self.windows.get(event.wid)
+        name = self._name(event)
+        if wid is None or name is None:
+            return False
+        self.x.conn.flush()
+        return self._command(lambda: self.client.window[wid].togroup(name[0]))
+
+    def _group(self, event):
+        if self._name(event) is None:
+            return False
+        self.current = event.group
+        self.x.message(self.x.root, "_NET_CURRENT_DESKTOP", [event.group])
+
+    def _layout(self, event):
+        name = self._name(event)
+        # the name may have been cut short
+        layouts = [n for n in self.layouts if n.startswith(event.text)]
+        if name is None or not layouts:
+            return False
+        self.x.conn.flush()
+        return self._command(lambda: self.client.group[name[0]].setlayout(layouts[0]))
+
+    def _key(self, event):
+        if (event.value, event.mask) in self.blocked:
+            return False
+        try:
+            codes = [self._modifier(bit) for bit in range(8) if event.mask & 1 << bit]
+            codes.append(self.x.keycode(event.value))
+        except RuntimeError:
+            return False
+        self.x.press(codes)
+
+    def _modifier(self, bit):
+        if bit not in self.modifiers:
+            self.modifiers[bit] = self.x.modifier(bit)
+        return self.modifiers[bit]
+
+    def barrier(self, timeout=30):
+        # qtile handles X events in order: once it has managed a last window
+        # named after this run, everything sent before has been handled
+        marker = "evtrace barrier {}".format(os.getpid())
+        self.x.create(b"evtrace\0evtrace\0", marker)
+        self.x.conn.flush()
+        code = (
+            "any(getattr(w, 'name', None) == {!r} for w in self.windows_map.values())"
+        )
+        deadline = time.monotonic() + timeout
+        while harness.evaluate(self.client, code.format(marker)) != "True":
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+
+def write(path, events):
+    # a trace file holding just these events, as the Recorder lays it out
+    capacity = max(1, len(events))
+    with open(path, "wb") as f:
+        f.write(header.pack(MAGIC, VERSION, record.size, capacity, len(events)))
+        for e in events:
+            f.write(
+                record.pack(
+                    e.time,
+                    e.wid,
+                    e.value,
+                    e.kind,
+                    e.group,
+                    e.mask,
+                    e.text.encode()[:12],
+                )
+            )
+
+
+# every kind of event, on the first two groups of this config
+smoke_events = [
+    Event(0, GROUP, group=0, text="1"),
+    Event(0, MAP, 1, text="smoke"),
+    Event(0, MAP, 2, text="smoke"),
+    Event(0, MAP, 3, text="smoke"),
+    Event(0, TITLE, 1, 9, text="smoke one"),
+    Event(0, TITLE, 2, 9, text="smoke two"),
+    Event(0, FOCUS, 2),
+    Event(0, UNMAP, 3),
+    Event(0, GROUP, group=1, text="2"),
+    # a pager focus switches back to the window's group
+    Event(0, FOCUS, 1),
+    Event(0, MOVE, 2, group=1),
+    Event(0, LAYOUT, group=0, text="max"),
+    # super+2
+    Event(0, KEY, value=0x32, mask=1 << 6),
+]
+
+
+def smoke_check(client, player):
+    failures = []
+    # the MOVE replayed above is a real togroup, which the Recorder of the
+    # replaying qtile must have logged
+    moved = [player.windows[2], 1]
+    if moved not in json.loads(
+        harness.evaluate(client, "__import__('evtrace').moves(self)")
+    ):
+        failures.append("the move to group 2 was not recorded")
+    first, second = client.group["1"].info(), client.group["2"].info()
+    if client.group.info()["name"] != "2":
+        failures.append("super+2 did not switch to group 2")
+    if first["focus"] != "smoke one":
+        failures.append("focus on group 1 is {!r}".format(first["focus"]))
+    if first["layout"] != "max":
+        failures.append("group 1 layout is {!r}".format(first["layout"]))
+    if second["windows"] != ["smoke two"]:
+        failures.append("group 2 holds {!r}".format(second["windows"]))
+    if first["windows"] != ["smoke one"]:
+        failures.append("group 1 holds {!r}".format(first["windows"]))
+    return failures
+
+
+def smoke(display=None):
+    # replays smoke_events and checks where qtile ended up
+    directory = tempfile.mkdtemp(prefix="qtile-evtrace-smoke-")
+    path = os.path.join(directory, "smoke.bin")
+    try:
+        write(path, smoke_events)
+        failures = []
+        _, player = replay(
+            path, display, lambda c, p: failures.extend(smoke_check(c, p))
+        )
+    finally:
+        shutil.rmtree(directory)
+    if player.skipped:
+        failures.append("skipped: {}".format(dict(player.skipped)))
+    return failures
+
+
+def replay(path, display=None, check=None):
+    events = read(path)
+    server = None
+    if display is None:
+        server, display = harness.start_xvfb()
+    home = tempfile.mkdtemp(prefix="qtile-evtrace-")
+    process = harness.start_qtile(display, home)
+    try:
+        client = harness.connect(display, home, process)
+        blocked = {
+            tuple(k)
+            for k in json.loads(
+                harness.evaluate(client, "__import__('evtrace').blocked_keys(self)")
+            )
+        }
+        names = json.loads(
+            harness.evaluate(client, "__import__('evtrace').names(self)")
+        )
+        x = harness.Display(display)
+        try:
+            player = Player(x, client, names, blocked)
+            start = time.perf_counter()
+            for event in events:
+                player.play(event)
+            if not player.barrier():
+                raise RuntimeError("qtile did not catch up with the replay")
+            took = (time.perf_counter() - start) * 1e3
+        finally:
+            x.close()
+        if check is not None:
+            check(client, player)
+        client.shutdown()
+        process.wait(timeout=10)
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            process.wait()
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(home)
+    played = sum(player.played.values())
+    name = os.path.basename(path)
+    results = {
+        "replay {} ms".format(name): took,
+        "replay {} ms/event".format(name): took / max(1, played),
+    }
+    return results, player
+
+
+def dump(path):
+    events = read(path)
+    if not events:
+        return "empty trace"
+    origin = events[0].time
+    lines = []
+    for e in events:
+        line = "{:>10.3f}s {:<6}".format(e.time - origin, kinds[e.kind])
+        if e.kind == KEY:
+            line += " keysym {:#x} mask {:#x}".format(e.value, e.mask)
+        else:
+            if e.wid:
+                line += " {:#x}".format(e.wid)
+            if e.kind in (MAP, MOVE, GROUP, LAYOUT):
+                line += " group {}".format(e.group)
+            if e.mask & FLOATING and e.kind == MAP:
+                line += " floating"
+            if e.text:
+                line += " {!r}".format(e.text)
+            if e.kind == TITLE:
+                line += " ({} chars)".format(e.value)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(args):
+    if not args or args[0] not in ("dump", "replay", "smoke"):
+        print("usage: evtrace.py dump|replay|smoke [--save] [--display :N] [trace]")
+        return 2
+    command, args = args[0], args[1:]
+    save = "--save" in args
+    display = None
+    if "--display" in args:
+        display = args.pop(args.index("--display") + 1)
+    args = [a for a in args if not a.startswith("--")]
+    path = args[0] if args else trace_path
+    if command == "dump":
+        print(dump(path))
+        return 0
+    if command == "smoke":
+        failures = smoke(display)
+        print("\n".join(failures or ["smoke replay passed"]))
+        return 1 if failures else 0
+
+    results, player = replay(path, display)
+    baseline = harness.load_baseline()
+    table, regressions = harness.compare(results, baseline)
+    print(table)
+    print()
+    print(
+        "played: "
+        + ", ".join("{} {}".format(n, k) for k, n in sorted(player.played.items()))
+    )
+    print(
+        "skipped: "
+        + (
+            ", ".join("{} {}".format(n, k) for k, n in sorted(player.skipped.items()))
+            or "none"
+        )
+    )
+    print()
+    print("Regressions:")
+    print("\n".join("  " + line for line in regressions or ["none"]))
+    if save:
+        harness.save_baseline(baseline, results)
+    return 1 if regressions and not save else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Shared text measurement cache ------------------------------
+#
+# Drawer.max_layout_size builds a fresh pango layout on every call, and the
+# bar calls it for every GroupBox and TaskList box, both on each draw and
+# again for each widget after reload_config. `install` routes it through one
+# process-wide cache. The cache keeps one measuring layout per (family, size)
+# and the pixel size of each (family, size, text), with LRU eviction. It is
+# kept on the Drawer class so it survives reload_config along with the pango
+# font map. To see how well it does:
+#
+#   qtile cmd-obj -o cmd -f eval -a "__import__('fonts').cache.stats()"
+
+from collections import OrderedDict
+
+import cairocffi
+
+from libqtile import drawer, pangocffi
+from libqtile.backend import base
+
+cache = None
+
+
+class _Measure:
+    # TextLayout only needs a drawer with a ctx to create its pango layout
+    def __init__(self):
+        surface = cairocffi.RecordingSurface(cairocffi.CONTENT_COLOR_ALPHA, None)
+        self.ctx = pangocffi.patch_cairo_context(cairocffi.Context(surface))
+
+
+class Cache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.sizes = OrderedDict()
+        self.layouts = {}
+        self.measure = _Measure()
+        self.hits = 0
+        self.misses = 0
+
+    def layout(self, family, size):
+        key = (family, size)
+        if key not in self.layouts:
+            self.layouts[key] = drawer.TextLayout(
+                self.measure, "", "ffffff", family, size, None
+            )
+        return self.layouts[key]
+
+    def size(self, family, size, text):
+        key = (family, size, text)
+        found = self.sizes.get(key)
+        if found is not None:
+            self.hits += 1
+            self.sizes.move_to_end(key)
+            return found
+        self.misses += 1
+        layout = self.layout(family, size)
+        layout.text = text
+        found = self.sizes[key] = (layout.width, layout.height)
+        while len(self.sizes) > self.maxsize:
+            self.sizes.popitem(last=False)
+        return found
+
+    def max_layout_size(self, texts, family, size):
+        sizes = [self.size(family, size, text) for text in texts]
+        return max(s[0] for s in sizes), max(s[1] for s in sizes)
+
+    def stats(self):
+        return {
+            "fonts": sorted(self.layouts),
+            "entries": len(self.sizes),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _max_layout_size(self, texts, font_family, font_size):
+    return self._text_cache.max_layout_size(texts, font_family, font_size)
+
+
+def install(maxsize=4096):
+    global cache
+    cache = getattr(base.Drawer, "_text_cache", None)
+    if cache is None:
+        cache = base.Drawer._text_cache = Cache(maxsize)
+        base.Drawer.max_layout_size = _max_layout_size
+    cache.maxsize = maxsize
+    return cache
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Config generations ------------------------------
+#
+# reload_config runs config.py again from the top, so every key, layout and
+# float rule is rebuilt even when only a bar colour changed. A section built
+# with `section(name, build)` is kept from one load to the next, and build()
+# only runs again when its fingerprint changes. The fingerprint covers the
+# source of build and the globals it names. Plain data is compared by value,
+# functions by their source and the globals they name, helper modules by
+# their file, and live objects by identity. Live objects are instances from
+# this directory's modules and qtile's command objects.
+#
+# Functions look their globals up when they run, so the objects a reused
+# section reaches through them are the current load's. A section must not
+# call such a function while it builds. Lists and dicts are handed out as
+# copies holding copies of their items, so that config.py can extend them and
+# latency.py and profiler.py can rewrap their commands. After each load the
+# rebuilt and reused sections are logged, along with how long the reload
+# took. The last report is served by:
+#
+#   qtile cmd-obj -o cmd -f eval -a "__import__('generation').report()"
+
+import copy
+import hashlib
+import inspect
+import os
+import sys
+import time
+import types
+
+from libqtile import qtile
+from libqtile.command.base import CommandObject
+from libqtile.log_utils import logger
+
+import timeline
+
+config_dir = os.path.dirname(os.path.abspath(__file__))
+
+# comprehensions run while the section builds, functions and lambdas later
+_comprehensions = {"<listcomp>", "<dictcomp>", "<setcomp>", "<genexpr>"}
+
+
+def _names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType) and const.co_name in _comprehensions:
+            names |= _names(const)
+    return names
+
+
+def _is_local(module_name):
+    module = sys.modules.get(module_name) if module_name else None
+    path = getattr(module, "__file__", None)
+    return path is not None and os.path.dirname(os.path.abspath(path)) == config_dir
+
+
+def _same(old, new):
+    return (
+        old is not None
+        and old[0] == new[0]
+        and len(old[1]) == len(new[1])
+        and all(a is b for a, b in zip(old[1], new[1]))
+    )
+
+
+class _Fingerprint:
+    def __init__(self):
+        self.live = []
+        self.files = {}
+
+    def digest(self, value):
+        h = hashlib.sha1()
+        self._feed(h, value, set(), True)
+        return h.hexdigest()
+
+    def _file(self, path):
+        if path not in self.files:
+            with open(path, "rb") as f:
+                self.files[path] = hashlib.sha1(f.read()).hexdigest()
+        return self.files[path]
+
+    def _source(self, func):
+        try:
+            return inspect.getsource(func)
+        except (OSError, TypeError):
+            return func.__code__.co_code.hex()
+
+    def _feed(self, h, value, path, early):
+        h.update(type(value).__qualname__.encode())
+        if value is None or isinstance(value, (bool, int, float, str, bytes)):
+            h.update(repr(value).encode())
+            return
+        if id(value) in path:
+            h.update(b"cycle")
+            return
+        path = path | {id(value)}
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                self._feed(h, item, path, early)
+        elif isinstance(value, dict):
+            for key in sorted(value, key=repr):
+                h.update(repr(key).encode())
+                self._feed(h, value[key], path, early)
+        elif isinstance(value, (set, frozenset)):
+            for item in sorted(value, key=repr):
+                self._feed(h, item, path, early)
+        elif isinstance(value, types.ModuleType):
+            if _is_local(value.__name__):
+                h.update(self._file(value.__file__).encode())
+            else:
+                h.update(value.__name__.encode())
+        elif isinstance(value, types.FunctionType):
+            h.update(value.__qualname__.encode())
+            h.update(self._source(value).encode())
+            self._feed(h, value.__defaults__, path, early)
+            if _is_local(value.__module__):
+                # looked up when the function runs: live objects do not count
+                for name in sorted(_names(value.__code__)):
+                    if name in value.__globals__:
+                        h.update(name.encode())
+                        self._feed(h, value.__globals__[name], path, False)
+        elif isinstance(value, types.MethodType):
+            h.update(value.__name__.encode())
+            self._feed(h, value.__self__, path, early)
+        elif isinstance(value, type):
+            h.update("{}.{}".format(value.__module__, value.__qualname__).encode())
+        elif isinstance(value, CommandObject) or _is_local(type(value).__module__):
+            if early:
+                self.live.append(value)
+        elif hasattr(value, "__dict__"):
+            self._feed(h, vars(value), path, early)
+        else:
+            h.update(repr(value).encode())
+
+
+class Generations:
+    def __init__(self):
+        self.sections = {}
+        self.number = 0
+        self.start = None
+        self.log = []
+        self.last = "no config loaded yet"
+
+    def begin(self):
+        self.number += 1
+        self.start = time.monotonic()
+        self.log = []
+
+    def _fingerprint(self, build):
+        # {name: (digest, live objects)} for build's source and its globals
+        fingerprint = _Fingerprint()
+        source = hashlib.sha1(inspect.getsource(build).encode()).hexdigest()
+        parts = {"<source>": (source, [])}
+        for name in sorted(_names(build.__code__)):
+            if name in build.__globals__:
+                fingerprint.live = []
+                digest = fingerprint.digest(build.__globals__[name])
+                parts[name] = (digest, fingerprint.live)
+        return parts
+
+    def section(self, name, build):
+        start = time.monotonic()
+        parts = self._fingerprint(build)
+        old = self.sections.get(name)
+        if old is None:
+            changed = ["first load"]
+        else:
+            changed = [key for key in parts if not _same(old[0].get(key), parts[key])]
+            changed += [key for key in old[0] if key not in parts]
+        if changed:
+            value = build()
+            self.sections[name] = (parts, value)
+            status = "rebuilt ({})".format(", ".join(changed))
+        else:
+            value = old[1]
+            status = "reused"
+        self.log.append((name, status, (time.monotonic() - start) * 1e3))
+        if isinstance(value, list):
+            return [copy.copy(item) for item in value]
+        if isinstance(value, dict):
+            return {key: copy.copy(item) for key, item in value.items()}
+        return value
+
+    def finish(self):
+        evaluated = (time.monotonic() - self.start) * 1e3
+        self.last = self._report(evaluated)
+        logger.info("config generation %d:\n%s", self.number, self.last)
+        if not timeline.timeline.cold:
+            # reload_config is a single call on the loop: this runs once it is over
+            qtile.call_soon(self._reloaded)
+
+    def _reloaded(self):
+        took = (time.monotonic() - self.start) * 1e3
+        self.last += "\nreload done {:.1f} ms after config.py started".format(took)
+        logger.info("config generation %d reloaded in %.1f ms", self.number, took)
+
+    def _report(self, evaluated):
+        lines = ["{:<16} {:>8}  {}".format("section", "ms", "status")]
+        for name, status, took in self.log:
+            lines.append("{:<16} {:>8.2f}  {}".format(name, took, status))
+        lines.append("config.py evaluated in {:.1f} ms".format(evaluated))
+        return "\n".join(lines)
+
+
+# importlib.reload keeps the module namespace, and with it the sections of
+# the previous load
+if "generations" not in globals():
+    generations = Generations()
+
+begin = generations.begin
+section = generations.section
+finish = generations.finish
+
+
+def report():
+    return generations.last
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Cached group box ------------------------------
+#
+# widget.GroupBox answers every hook with a full bar.draw(), which lays out
+# and strokes every group box again. Here each group is reduced to a small
+# bitset (occupied, current, other screen, focused screen, urgent) and a box
+# is rendered once per (label, bits) into an offscreen surface. A hook that
+# leaves every bitset unchanged draws nothing. If only bits changed, the
+# widget blits the cached boxes and redraws itself without touching the rest
+# of the bar. The bar is only redrawn when the visible groups change (with
+# hide_unused), because then the widget's length changes too.
+
+import math
+
+import cairocffi
+
+from libqtile import hook, pangocffi, widget
+
+OCCUPIED = 1
+CURRENT = 2
+OTHER = 4
+FOCUSED = 8
+URGENT = 16
+
+
+class GroupBox(widget.GroupBox):
+    """GroupBox that redraws from per-state cached boxes"""
+
+    def __init__(self, **config):
+        widget.GroupBox.__init__(self, **config)
+        self._widths = {}
+        self._boxes = {}
+        self._drawn = None
+
+    def box_width(self, groups):
+        if len(groups) != 1:
+            return widget.GroupBox.box_width(self, groups)
+        label = groups[0].label
+        if label not in self._widths:
+            self._widths[label] = widget.GroupBox.box_width(self, groups)
+        return self._widths[label]
+
+    def _bits(self, group):
+        bits = 0
+        if group.windows:
+            bits |= OCCUPIED
+            if self.group_has_urgent(group):
+                bits |= URGENT
+        if group.screen:
+            bits |= CURRENT if group is self.bar.screen.group else OTHER
+            if self.qtile.current_screen is group.screen:
+                bits |= FOCUSED
+        return bits
+
+    def _state(self):
+        return [(g.label, self._bits(g)) for g in self.groups]
+
+    def _style(self, bits):
+        # widget.GroupBox.draw's colour choice, driven by the bitset
+        style = dict(
+            bordercolor=None,
+            highlight_color=self.highlight_color,
+            rounded=self.rounded,
+            block=self.highlight_method == "block",
+            line=self.highlight_method == "line",
+            highlighted=False,
+        )
+        if bits & URGENT and self.urgent_alert_method == "text":
+            style["textcolor"] = self.urgent_text
+        elif bits & OCCUPIED:
+            style["textcolor"] = self.active
+        else:
+            style["textcolor"] = self.inactive
+
+        if bits & (CURRENT | OTHER):
+            if self.highlight_method == "text":
+                style["textcolor"] = self.this_current_screen_border
+                return style
+            if self.block_highlight_text_color:
+                style["textcolor"] = self.block_highlight_text_color
+            if bits & CURRENT and bits & FOCUSED:
+                style["bordercolor"] = self.this_current_screen_border
+                style["highlighted"] = True
+            elif bits & CURRENT:
+                style["bordercolor"] = self.this_screen_border
+            elif bits & FOCUSED:
+                style["bordercolor"] = self.other_current_screen_border
+            else:
+                style["bordercolor"] = self.other_screen_border
+        elif bits & URGENT and self.urgent_alert_method in ("border", "block", "line"):
+            style["bordercolor"] = self.urgent_border
+            if self.urgent_alert_method == "block":
+                style["block"] = True
+            elif self.urgent_alert_method == "line":
+                style["line"] = True
+        return style
+
+    def _box(self, group, bits):
+        key = (group.label, bits)
+        box = self._boxes.get(key)
+        if box is None:
+            pad = self.borderwidth
+            bw = self.box_width([group])
+            box = cairocffi.ImageSurface(
+                cairocffi.FORMAT_ARGB32, math.ceil(bw) + 2 * pad, self.bar.height
+            )
+            ctx = self.drawer.ctx
+            self.drawer.ctx = pangocffi.patch_cairo_context(cairocffi.Context(box))
+            try:
+                self.drawbox(pad, group.label, width=bw, **self._style(bits))
+            finally:
+                self.drawer.ctx = ctx
+            self._boxes[key] = box
+        return box
+
+    def draw(self):
+        self._drawn = self._state()
+        self.drawer.clear(self.background or self.bar.background)
+        ctx = self.drawer.ctx
+        offset = self.margin_x
+        for g, (_, bits) in zip(self.groups, self._drawn):
+            ctx.set_source_surface(self._box(g, bits), offset - self.borderwidth, 0)
+            ctx.paint()
+            offset += self.box_width([g]) + self.spacing
+        self.drawer.draw(offsetx=self.offset, offsety=self.offsety, width=self.width)
+
+    def _hook_response(self, *args, **kwargs):
+        state = self._state()
+        if state == self._drawn:
+            return
+        if self._drawn is None or [s[0] for s in state] != [s[0] for s in self._drawn]:
+            self.bar.draw()
+        else:
+            self.draw()
+
+    def _killed_response(self, window):
+        # client_killed fires before the window leaves its group
+        self.qtile.call_soon(self._hook_response)
+
+    def setup_hooks(self):
+        widget.GroupBox.setup_hooks(self)
+        hook.subscribe.client_killed(self._killed_response)
+
+    def remove_hooks(self):
+        widget.GroupBox.remove_hooks(self)
+        hook.unsubscribe.client_killed(self._killed_response)
@@ -0,0 +1,484 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Headless harness ------------------------------
+#
+# Starts qtile with this config on a throwaway Xvfb, with a scratch HOME whose
+# .config/qtile points back here, so the session, startup and cache files of
+# the real login are left alone. Nothing the config starts may run beside the
+# timings: QTILE_HARNESS turns off the autostart services and the prewarmed
+# dropdowns and dashboard, spawned commands find an empty PATH and HTTP goes
+# to a proxy that refuses at once. Then it:
+#
+#   - checks that config.py loaded (qtile falls back to its default config
+#     when it does not) and that resize() moves and clamps the Bsp splits
+#   - times config load (spawn until IPC answers, and the startup timeline's
+#     last event) and a reload_config round trip
+#   - opens 1 to 100 plain windows and times layout_all on the current group
+#     with every configured layout, server round trip included
+#   - sends mod+1 / mod+2 through XTEST and times each press until
+#     _NET_CURRENT_DESKTOP changes on the root window
+#
+# The numbers are compared with the baseline in ~/.cache/qtile/harness.json:
+# anything more than `tolerance` times slower (and `slack` ms) is reported as
+# a regression and the exit status is 1. --save stores the run as the new
+# baseline. --display runs against an X server that is already up instead,
+# a Xephyr for instance, to watch what happens.
+#
+#   python harness.py [--save] [--display :N] [--windows 1,10,50,100]
+
+import json
+import os
+import select
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+baseline_path = os.path.expanduser("~/.cache/qtile/harness.json")
+
+tolerance = 1.25
+slack = 0.5
+
+window_counts = [1, 10, 50, 100]
+rounds = 20
+presses = 20
+
+
+# Run inside qtile, through eval ------------------------------
+
+
+def _sync(qtile):
+    qtile.core.conn.conn.core.GetInputFocus().reply()
+
+
+def relayout(qtile, rounds):
+    group = qtile.current_group
+    original = group.layout.name
+    times = {}
+    for layout in group.layouts:
+        group.cmd_setlayout(layout.name)
+        _sync(qtile)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            group.layout_all()
+        _sync(qtile)
+        times[layout.name] = (time.perf_counter() - start) * 1e3 / rounds
+    group.cmd_setlayout(original)
+    return json.dumps(times)
+
+
+def _split(layout, horizontal):
+    # the split resize() moves: the nearest one along that axis
+    node = layout.current.parent
+    while node is not None and node.split_horizontal != horizontal:
+        node = node.parent
+    return node
+
+
+def check_resize(qtile):
+    resize = qtile.config.resize
+    group = qtile.current_group
+    original = group.layout.name
+    group.cmd_setlayout("bsp")
+    layout = group.layout
+    failures = []
+    for horizontal, shrink, grow in ((True, "left", "right"), (False, "up", "down")):
+        node = _split(layout, horizontal)
+        if node is None:
+            failures.append("no {} split to resize".format(shrink + "/" + grow))
+            continue
+        window = layout.current.client
+        before = (window.width, window.height)
+        ratio = node.split_ratio
+        resize(qtile, shrink)
+        if node.split_ratio != max(5, ratio - layout.grow_amount):
+            failures.append(
+                "{}: ratio {} -> {}".format(shrink, ratio, node.split_ratio)
+            )
+        if (window.width, window.height) == before and node.split_ratio != ratio:
+            failures.append("{}: ratio moved but nothing was laid out".format(shrink))
+        for _ in range(120):
+            resize(qtile, shrink)
+        if node.split_ratio != 5:
+            failures.append("{}: stopped at {}, not 5".format(shrink, node.split_ratio))
+        for _ in range(120):
+            resize(qtile, grow)
+        if node.split_ratio != 95:
+            failures.append("{}: stopped at {}, not 95".format(grow, node.split_ratio))
+        node.split_ratio = ratio
+    group.cmd_setlayout(original)
+    return json.dumps(failures)
+
+
+# Driver ------------------------------
+
+
+def start_xvfb():
+    read, write = os.pipe()
+    server = subprocess.Popen(
+        ["Xvfb", "-displayfd", str(write), "-screen", "0", "1920x1080x24"]
+        + ["-nolisten", "tcp"],
+        pass_fds=(write,),
+        stderr=subprocess.DEVNULL,
+    )
+    os.close(write)
+    number = b""
+    while not number.endswith(b"\n"):
+        chunk = os.read(read, 16)
+        if not chunk:
+            raise RuntimeError("Xvfb exited before choosing a display")
+        number += chunk
+    os.close(read)
+    return server, ":" + number.decode().strip()
+
+
+def start_qtile(display, home, **extra):
+    os.makedirs(os.path.join(home, ".config"))
+    os.symlink(here, os.path.join(home, ".config", "qtile"))
+    empty = os.path.join(home, "bin")
+    os.makedirs(empty)
+    # the discard port: the weather widget fails and backs off without waiting
+    refused = "http://127.0.0.1:9"
+    env = dict(
+        os.environ,
+        DISPLAY=display,
+        HOME=home,
+        PATH=empty,
+        QTILE_HARNESS="1",
+        http_proxy=refused,
+        https_proxy=refused,
+    )
+    env.update(extra)
+    for name in (
+        "XDG_CACHE_HOME",
+        "XDG_CONFIG_HOME",
+        "WAYLAND_DISPLAY",
+        "no_proxy",
+        "NO_PROXY",
+    ):
+        env.pop(name, None)
+    log = open(os.path.join(home, "qtile.log"), "w")
+    command = [sys.executable, "-m", "libqtile.scripts.main", "start"]
+    command += ["-c", os.path.join(here, "config.py")]
+    return subprocess.Popen(command, env=env, stdout=log, stderr=log)
+
+
+def connect(display, home, process, timeout=30):
+    from libqtile.command.client import InteractiveCommandClient
+    from libqtile.command.interface import IPCCommandInterface
+    from libqtile.ipc import SOCKBASE, Client, IPCError
+
+    path = os.path.join(home, ".cache", "qtile", SOCKBASE % display)
+    client = InteractiveCommandClient(IPCCommandInterface(Client(path)))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("qtile exited, see {}/qtile.log".format(home))
+        try:
+            client.status()
+            return client
+        except (IPCError, OSError):
+            time.sleep(0.02)
+    raise RuntimeError("qtile did not answer within {}s".format(timeout))
+
+
+def evaluate(client, code):
+    ok, result = client.eval(code)
+    if not ok:
+        raise RuntimeError("{}: {}".format(code, result))
+    return result
+
+
+def startup_timeline(home, timeout=10):
+    path = os.path.join(home, ".cache", "qtile", "startup.json")
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            return None
+        time.sleep(0.1)
+    with open(path) as f:
+        return max(at for at, _, _ in json.load(f)["events"])
+
+
+class Display:
+    def __init__(self, display):
+        import xcffib
+        import xcffib.xproto
+        import xcffib.xtest
+
+        self.xproto = xcffib.xproto
+        self.conn = xcffib.connect(display=display)
+        self.core = self.conn.core
+        self.xtest = self.conn(xcffib.xtest.key)
+        setup = self.conn.get_setup()
+        self.screen = setup.roots[0]
+        self.root = self.screen.root
+        self.min_keycode = setup.min_keycode
+        self.keymap = self.core.GetKeyboardMapping(
+            setup.min_keycode, setup.max_keycode - setup.min_keycode + 1
+        ).reply()
+        self.windows = []
+        self.atoms = {}
+
+    def atom(self, name):
+        if name not in self.atoms:
+            self.atoms[name] = self.core.InternAtom(False, len(name), name).reply().atom
+        return self.atoms[name]
+
+    def keycode(self, keysym):
+        per = self.keymap.keysyms_per_keycode
+        for i, sym in enumerate(self.keymap.keysyms):
+            if sym == keysym:
+                return self.min_keycode + i // per
+        raise RuntimeError("no keycode for keysym {:#x}".format(keysym))
+
+    def modifier(self, index):
+        mapping = self.core.GetModifierMapping().reply()
+        per = mapping.keycodes_per_modifier
+        for code in mapping.keycodes[index * per : (index + 1) * per]:
+            if code:
+                return code
+        raise RuntimeError("no key carries modifier {}".format(index))
+
+    def create(self, wm_class=b"harness\0Harness\0", name=None):
+        wid = self.conn.generate_id()
+        self.core.CreateWindow(
+            self.screen.root_depth,
+            wid,
+            self.root,
+            0,
+            0,
+            200,
+            100,
+            0,
+            self.xproto.WindowClass.InputOutput,
+            self.screen.root_visual,
+            0,
+            [],
+        )
+        self.core.ChangeProperty(
+            self.xproto.PropMode.Replace,
+            wid,
+            self.xproto.Atom.WM_CLASS,
+            self.xproto.Atom.STRING,
+            8,
+            len(wm_class),
+            wm_class,
+        )
+        if name is not None:
+            self.set_name(wid, name)
+        self.core.MapWindow(wid)
+        self.windows.append(wid)
+        return wid
+
+    def open(self, count):
+        for _ in range(count):
+            self.create()
+        self.conn.flush()
+
+    def set_name(self, wid, name):
+        data = name.encode()
+        self.core.ChangeProperty(
+            self.xproto.PropMode.Replace,
+            wid,
+            self.atom("_NET_WM_NAME"),
+            self.atom("UTF8_STRING"),
+            8,
+            len(data),
+            data,
+        )
+
+    def message(self, wid, name, values):
+        # a client message to the window manager, as pagers send them
+        values = (list(values) + [0] * 5)[:5]
+        data = self.xproto.ClientMessageData.synthetic(values, "I" * 5)
+        event = self.xproto.ClientMessageEvent.synthetic(32, wid, self.atom(name), data)
+        mask = (
+            self.xproto.EventMask.SubstructureRedirect
+            | self.xproto.EventMask.SubstructureNotify
+        )
+        self.core.SendEvent(False, self.root, mask, event.pack())
+
+    def press(self, codes):
+        for code in codes:
+            self.xtest.FakeInput(self.xproto.KEY_PRESS, code, 0, self.root, 0, 0, 0)
+        for code in reversed(codes):
+            self.xtest.FakeInput(self.xproto.KEY_RELEASE, code, 0, self.root, 0, 0, 0)
+        self.conn.flush()
+
+    def wait_property(self, atom, timeout=2):
+        deadline = time.monotonic() + timeout
+        fd = self.conn.get_file_descriptor()
+        while True:
+            event = self.conn.poll_for_event()
+            if event is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                select.select([fd], [], [], remaining)
+            elif (
+                isinstance(event, self.xproto.PropertyNotifyEvent)
+                and event.atom == atom
+            ):
+                return True
+
+    def close(self):
+        self.conn.disconnect()
+
+
+def wait_windows(client, count, timeout=10):
+    deadline = time.monotonic() + timeout
+    while int(evaluate(client, "len(self.current_group.windows)")) < count:
+        if time.monotonic() > deadline:
+            raise RuntimeError("qtile did not manage {} windows".format(count))
+        time.sleep(0.02)
+
+
+def keypress_latency(client, x, presses):
+    # super+1 / super+2 switch groups, which sets _NET_CURRENT_DESKTOP
+    client.group["1"].toscreen()
+    current = x.atom("_NET_CURRENT_DESKTOP")
+    x.core.ChangeWindowAttributes(
+        x.root, x.xproto.CW.EventMask, [x.xproto.EventMask.PropertyChange]
+    )
+    x.core.GetInputFocus().reply()
+    mod = x.modifier(6)
+    keys = [x.keycode(ord("2")), x.keycode(ord("1"))]
+    times = []
+    for i in range(presses):
+        while x.conn.poll_for_event() is not None:
+            pass
+        start = time.perf_counter()
+        x.press([mod, keys[i % 2]])
+        if not x.wait_property(current):
+            raise RuntimeError("a key press did not switch groups")
+        times.append((time.perf_counter() - start) * 1e3)
+    return times
+
+
+def run(display, home, process, counts):
+    spawned = time.monotonic()
+    client = connect(display, home, process)
+    results = {"load ms": (time.monotonic() - spawned) * 1e3}
+    failures = []
+    if evaluate(client, "hasattr(self.config, 'resize')") != "True":
+        raise RuntimeError("config.py did not load, see {}/qtile.log".format(home))
+    painted = startup_timeline(home)
+    if painted is not None:
+        results["startup timeline ms"] = painted
+
+    x = Display(display)
+    try:
+        client.group["1"].toscreen()
+        opened = 0
+        checked = False
+        for count in counts:
+            x.open(count - opened)
+            opened = count
+            wait_windows(client, count)
+            times = json.loads(
+                evaluate(client, "__import__('harness').relayout(self, %d)" % rounds)
+            )
+            for name, took in times.items():
+                results["relayout {} {}".format(name, count)] = took
+            if count >= 4 and not checked:
+                # enough windows for splits along both axes
+                failures += json.loads(
+                    evaluate(client, "__import__('harness').check_resize(self)")
+                )
+                checked = True
+
+        times = keypress_latency(client, x, presses)
+        results["keypress median ms"] = statistics.median(times)
+        results["keypress max ms"] = max(times)
+    finally:
+        x.close()
+
+    start = time.monotonic()
+    client.reload_config()
+    results["reload ms"] = (time.monotonic() - start) * 1e3
+    client.shutdown()
+    return results, ["resize: " + f for f in failures]
+
+
+def compare(results, baseline):
+    regressions = []
+    lines = ["{:<32} {:>10} {:>10}".format("measure", "ms", "baseline")]
+    for name, value in results.items():
+        base = baseline.get(name)
+        mark = ""
+        if base is not None and value > base * tolerance + slack:
+            mark = "  slower"
+            regressions.append(
+                "{}: {:.2f} ms, baseline {:.2f} ms".format(name, value, base)
+            )
+        lines.append(
+            "{:<32} {:>10.2f} {:>10}{}".format(
+                name, value, "-" if base is None else "{:.2f}".format(base), mark
+            )
+        )
+    return "\n".join(lines), regressions
+
+
+def load_baseline():
+    try:
+        with open(baseline_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(baseline, results):
+    # evtrace.py replays keep their numbers in the same file
+    baseline.update(results)
+    os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+    with open(baseline_path, "w") as f:
+        json.dump(baseline, f, indent=1)
+    print()
+    print("baseline saved to {}".format(baseline_path))
+
+
+def main(args):
+    save = "--save" in args
+    display = None
+    counts = window_counts
+    if "--display" in args:
+        display = args[args.index("--display") + 1]
+    if "--windows" in args:
+        counts = sorted(int(n) for n in args[args.index("--windows") + 1].split(","))
+
+    server = None
+    if display is None:
+        server, display = start_xvfb()
+    home = tempfile.mkdtemp(prefix="qtile-harness-")
+    process = start_qtile(display, home)
+    try:
+        results, failures = run(display, home, process, counts)
+        process.wait(timeout=10)
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            process.wait()
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(home)
+
+    baseline = load_baseline()
+    table, regressions = compare(results, baseline)
+    print(table)
+    for title, lines in (("Failed checks", failures), ("Regressions", regressions)):
+        print()
+        print("{}:".format(title))
+        print("\n".join("  " + line for line in lines or ["none"]))
+    if save:
+        save_baseline(baseline, results)
+    return 1 if failures or (regressions and not save) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
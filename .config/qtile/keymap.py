@@ -0,0 +1,531 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Keymap analyzer ------------------------------
+#
+# `keys` is put together in several places (the main list, the `mod+a` help
+# key, the group loop, the profiler key), so a chord bound twice goes
+# unnoticed: qtile keeps the last binding and the first silently stops
+# working. This loads config.py offline, with libqtile (and any other module
+# that is not installed) replaced by stand-ins that only record what the
+# config builds, and reports:
+#
+#   - chords bound more than once, and which binding shadows which
+#   - actions bound to several chords, and descriptions shared by different
+#     actions or missing
+#   - chords that a key remapper started by the config (ksuperkey) also sends
+#   - what grabbing the keys costs and how dispatch scales with the number of
+#     bindings; with --x11 the grabs are timed against $DISPLAY (use a
+#     throwaway Xvfb: the keys are grabbed on its root window)
+#
+#   python keymap.py [--x11] [path/to/config.py]
+
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import logging
+import os
+import random
+import sys
+import time
+import types
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# Caps Lock and Num Lock: x11 grabs every chord with each combination of them
+lock_variants = 4
+
+# X11 modifier bits, as libqtile.backend.x11.xcbq.ModMasks
+modmasks = {
+    "shift": 1 << 0,
+    "lock": 1 << 1,
+    "control": 1 << 2,
+    "mod1": 1 << 3,
+    "mod2": 1 << 4,
+    "mod3": 1 << 5,
+    "mod4": 1 << 6,
+    "mod5": 1 << 7,
+}
+
+modifier_names = {"mod4": "super", "mod1": "alt"}
+modifier_order = ["super", "alt", "control", "shift"]
+
+# keysyms a remapper can send, as ksuperkey takes them
+remap_modifiers = {
+    "Alt_L": "mod1",
+    "Alt_R": "mod1",
+    "Control_L": "control",
+    "Control_R": "control",
+    "Shift_L": "shift",
+    "Shift_R": "shift",
+    "Super_L": "mod4",
+    "Super_R": "mod4",
+}
+
+
+# Stand-ins ------------------------------
+
+
+class _StubMeta(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _stub_class(name)
+
+    def __iter__(cls):
+        return iter(())
+
+    def __call__(cls, *args, **kwargs):
+        # widgets and layouts subclassing a stand-in are not set up either
+        return cls.__new__(cls)
+
+
+class _Stub(metaclass=_StubMeta):
+    # any attribute, call, item or iteration gives back another stand-in
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Stub()
+
+    def __call__(self, *args, **kwargs):
+        return _Stub()
+
+    def __getitem__(self, key):
+        return _Stub()
+
+    def __iter__(self):
+        return iter(())
+
+
+def _stub_class(name):
+    return _StubMeta(name, (_Stub,), {})
+
+
+class _StubModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__path__ = []
+        self._stubs = {}
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name not in self._stubs:
+            self._stubs[name] = _stub_class(name)
+        return self._stubs[name]
+
+
+def _config_line():
+    frame = sys._getframe(2)
+    while frame is not None:
+        if os.path.basename(frame.f_code.co_filename) == "config.py":
+            return frame.f_lineno
+        frame = frame.f_back
+    return None
+
+
+class LazyCall:
+    def __init__(self, name, args, kwargs):
+        self.name = name
+        self.selectors = []
+        self.args = self._args = args
+        self.kwargs = self._kwargs = kwargs
+        self._focused = self._if_no_focused = self._layouts = None
+        self._when_floating = True
+
+    def when(self, *args, **kwargs):
+        return self
+
+    def __repr__(self):
+        args = [getattr(a, "__name__", None) or repr(a) for a in self.args]
+        args += ["{}={!r}".format(k, v) for k, v in self.kwargs.items()]
+        return "{}({})".format(self.name, ", ".join(args))
+
+
+class Lazy:
+    def __init__(self, path=()):
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Lazy(self._path + (name,))
+
+    def __getitem__(self, selector):
+        return Lazy(self._path[:-1] + ("{}[{!r}]".format(self._path[-1], selector),))
+
+    def __call__(self, *args, **kwargs):
+        return LazyCall(".".join(self._path), args, kwargs)
+
+
+class Key:
+    def __init__(self, modifiers, key, *commands, desc="", **kwargs):
+        self.modifiers = modifiers
+        self.key = key
+        self.commands = commands
+        self.desc = desc
+        self.line = _config_line()
+
+
+class KeyChord:
+    def __init__(self, modifiers, key, submappings, mode=False, name="", **kwargs):
+        self.modifiers = modifiers
+        self.key = key
+        self.submappings = submappings
+        self.mode = mode
+        self.name = name or key
+        self.desc = name or kwargs.get("desc", "")
+        self.commands = ()
+        self.line = _config_line()
+
+
+class _Record:
+    # Group, ScratchPad and DropDown take their name first
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.name = args[0] if args else None
+        self.__dict__.update(kwargs)
+
+
+class Screen(_Record):
+    top = bottom = left = right = None
+
+
+class Mouse(_Record):
+    def __init__(self, modifiers, button, *commands, **kwargs):
+        super().__init__(**kwargs)
+        self.modifiers = modifiers
+        self.button = button
+        self.commands = commands
+
+
+class _Subscribe:
+    def __getattr__(self, name):
+        return lambda func: func
+
+
+def _libqtile_module(name):
+    module = _StubModule(name)
+    if name == "libqtile":
+        module.qtile = _Stub()
+    elif name == "libqtile.config":
+        module.Key = Key
+        module.KeyChord = KeyChord
+        module.Screen = Screen
+        module.Click = module.Drag = Mouse
+        for record in ("Group", "ScratchPad", "DropDown", "Match", "Rule"):
+            setattr(module, record, type(record, (_Record,), {}))
+    elif name == "libqtile.lazy":
+        module.lazy = Lazy()
+        module.LazyCall = LazyCall
+    elif name == "libqtile.hook":
+        module.subscribe = _Subscribe()
+        module.subscriptions = {}
+        module.fire = lambda *args, **kwargs: None
+    elif name == "libqtile.log_utils":
+        module.logger = logging.getLogger("keymap")
+    return module
+
+
+class _StubLoader(importlib.abc.Loader):
+    def __init__(self, factory):
+        self.factory = factory
+
+    def create_module(self, spec):
+        return self.factory(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+
+class _StandIns(importlib.abc.MetaPathFinder):
+    # first in sys.meta_path for libqtile, last for everything else missing
+    def __init__(self, only_libqtile):
+        self.only_libqtile = only_libqtile
+
+    def find_spec(self, name, path, target=None):
+        if name == "libqtile" or name.startswith("libqtile."):
+            return importlib.machinery.ModuleSpec(name, _StubLoader(_libqtile_module))
+        if self.only_libqtile:
+            return None
+        return importlib.machinery.ModuleSpec(name, _StubLoader(_StubModule))
+
+
+def load(path):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    sys.meta_path.insert(0, _StandIns(True))
+    sys.meta_path.append(_StandIns(False))
+    logging.getLogger("keymap").setLevel(logging.ERROR)
+    spec = importlib.util.spec_from_file_location("config", path)
+    config = importlib.util.module_from_spec(spec)
+    sys.modules["config"] = config
+    # keep the actions as config.py wrote them, not wrapped for timing
+    importlib.import_module("latency").instrument = lambda *args: None
+    spec.loader.exec_module(config)
+    return config
+
+
+# Analysis ------------------------------
+
+
+def chord(binding, prefix=()):
+    mods = sorted(
+        (
+            modifier_names.get(m.lower(), m.lower())
+            for m in binding.modifiers
+            if m.lower() not in ("lock", "mod2")
+        ),
+        key=lambda m: (modifier_order.index(m) if m in modifier_order else 9, m),
+    )
+    key = binding.key.lower() if len(binding.key) == 1 else binding.key
+    return prefix + ("+".join(mods + [key]),)
+
+
+def action(binding):
+    if isinstance(binding, KeyChord):
+        return "chord {}".format(binding.name)
+    return ", ".join(repr(c) for c in binding.commands)
+
+
+def index(keys, prefix=()):
+    # {chord path: [bindings in the order qtile grabs them]}
+    found = {}
+    for binding in keys:
+        path = chord(binding, prefix)
+        found.setdefault(path, []).append(binding)
+        if isinstance(binding, KeyChord):
+            for sub, bindings in index(binding.submappings, path).items():
+                found.setdefault(sub, []).extend(bindings)
+    return found
+
+
+def _where(binding):
+    return "config.py:{}".format(binding.line) if binding.line else "config.py"
+
+
+def _name(path):
+    return " ".join(path)
+
+
+def shadowed(found):
+    lines = []
+    for path, bindings in found.items():
+        if len(bindings) > 1:
+            winner = bindings[-1]
+            for lost in bindings[:-1]:
+                lines.append(
+                    "{}  {} ({}) is shadowed by {} ({})".format(
+                        _name(path),
+                        _where(lost),
+                        action(lost),
+                        _where(winner),
+                        action(winner),
+                    )
+                )
+    return lines
+
+
+def duplicate_actions(found):
+    by_action = {}
+    for path, bindings in found.items():
+        binding = bindings[-1]
+        if not isinstance(binding, KeyChord):
+            # the same action in two modes is not a duplicate
+            scope = (path[:-1], action(binding))
+            by_action.setdefault(scope, []).append((path, binding))
+    return [
+        "{}: {}".format(
+            name, ", ".join("{} ({})".format(_name(p), _where(b)) for p, b in paths)
+        )
+        for (_, name), paths in by_action.items()
+        if len(paths) > 1
+    ]
+
+
+def descriptions(found):
+    lines = []
+    by_desc = {}
+    for path, bindings in found.items():
+        binding = bindings[-1]
+        if not binding.desc:
+            lines.append("no description: {} ({})".format(_name(path), _where(binding)))
+            continue
+        by_desc.setdefault(binding.desc, []).append((path, binding))
+    for desc, paths in by_desc.items():
+        if len({action(b) for _, b in paths}) > 1:
+            lines.append(
+                "{!r} describes different actions: {}".format(
+                    desc,
+                    "; ".join("{} {}".format(_name(p), action(b)) for p, b in paths),
+                )
+            )
+    return lines
+
+
+def remaps(config):
+    # (tapped key, chord sent, program) for the remappers config.py starts
+    found = []
+    for service in getattr(config, "autostart_services", []):
+        argv = list(getattr(service, "argv", []))
+        if not argv or os.path.basename(argv[0]) != "ksuperkey":
+            continue
+        exprs = [argv[i + 1] for i, a in enumerate(argv[:-1]) if a == "-e"]
+        for expr in ";".join(exprs).split(";"):
+            tapped, _, sent = expr.partition("=")
+            if not sent:
+                continue
+            sent = sent.split("|")
+            mods = [remap_modifiers[k] for k in sent[:-1] if k in remap_modifiers]
+            found.append((tapped.strip(), Key(mods, sent[-1].strip()), "ksuperkey"))
+    return found
+
+
+def overlaps(found, config):
+    lines = []
+    for tapped, sent, program in remaps(config):
+        bindings = found.get(chord(sent))
+        if bindings:
+            binding = bindings[-1]
+            lines.append(
+                "{} ({}, {}) is also what {} sends when {} is tapped alone".format(
+                    _name(chord(sent)),
+                    binding.desc or action(binding),
+                    _where(binding),
+                    program,
+                    tapped,
+                )
+            )
+    return lines
+
+
+# Benchmark ------------------------------
+
+
+def _keys_map(bindings):
+    # what qtile's grab_keys builds: {(keysym, modmask): binding}
+    keys_map = {}
+    for binding in bindings:
+        mask = 0
+        for m in binding.modifiers:
+            mask |= modmasks.get(m.lower(), 0)
+        keys_map[(hash(binding.key) & 0xFFFF, mask)] = binding
+    return keys_map
+
+
+def _synthetic(keys, count):
+    bindings = list(keys)
+    mods = [[], ["shift"], ["control"], ["mod1"], ["mod4", "shift"], ["mod4", "mod1"]]
+    i = 0
+    while len(bindings) < count:
+        bindings.append(Key(mods[i % len(mods)], "k{}".format(i)))
+        i += 1
+    return bindings[:count]
+
+
+def benchmark(keys, counts, presses=100000):
+    rows = []
+    for count in counts:
+        bindings = _synthetic(keys, count)
+        start = time.perf_counter()
+        keys_map = _keys_map(bindings)
+        build = time.perf_counter() - start
+        events = list(keys_map) + [(1, 0)] * (len(keys_map) // 4)
+        events = [random.choice(events) for _ in range(presses)]
+        start = time.perf_counter()
+        for event in events:
+            keys_map.get(event)
+        dispatch = time.perf_counter() - start
+        rows.append(
+            (count, count * lock_variants, build * 1e6, dispatch / presses * 1e9)
+        )
+    return rows
+
+
+def benchmark_x11(counts, rounds=5):
+    # times ungrab-all plus one GrabKey per chord and lock variant, flushed
+    # together and waited for with a single round trip, as grab_keys does
+    import xcffib
+    import xcffib.xproto
+
+    conn = xcffib.connect()
+    setup = conn.get_setup()
+    root = setup.roots[0].root
+    core = conn.core
+    codes = range(setup.min_keycode, setup.max_keycode + 1)
+    masks = [0, 1, 4, 8, 64, 65, 72]
+    lock_masks = [0, 2, 16, 18]
+    rows = []
+    try:
+        for count in counts:
+            chords = [
+                (codes[i % len(codes)], masks[(i // len(codes)) % len(masks)])
+                for i in range(count)
+            ]
+            best = None
+            for _ in range(rounds):
+                start = time.perf_counter()
+                core.UngrabKey(0, root, xcffib.xproto.ModMask.Any)
+                for code, mask in chords:
+                    for lock in lock_masks:
+                        core.GrabKey(
+                            True,
+                            root,
+                            mask | lock,
+                            code,
+                            xcffib.xproto.GrabMode.Async,
+                            xcffib.xproto.GrabMode.Async,
+                        )
+                core.GetInputFocus().reply()
+                took = time.perf_counter() - start
+                best = took if best is None else min(best, took)
+            rows.append((count, count * len(lock_masks), best * 1e3))
+    finally:
+        core.UngrabKey(0, root, xcffib.xproto.ModMask.Any)
+        conn.flush()
+        conn.disconnect()
+    return rows
+
+
+def report(config, x11=False):
+    keys = list(getattr(config, "keys", []))
+    found = index(keys)
+    chords = sum(isinstance(k, KeyChord) for k in keys)
+    out = [
+        "{} bindings, {} of them key chords, {} grabbed at the top level".format(
+            len(found), chords, len({chord(k) for k in keys})
+        )
+    ]
+    for title, lines in (
+        ("Shadowed chords", shadowed(found)),
+        ("Same action on several chords", duplicate_actions(found)),
+        ("Descriptions", descriptions(found)),
+        ("Sent by key remappers", overlaps(found, config)),
+    ):
+        out.append("")
+        out.append("{}:".format(title))
+        out.extend("  " + line for line in lines or ["none"])
+    counts = sorted({len(keys), 25, 50, 100, 200, 400, 800})
+    out.append("")
+    out.append(
+        "Grab and dispatch cost ({} GrabKey requests per chord):".format(lock_variants)
+    )
+    out.append("  bindings  GrabKey  keys_map build us  dispatch ns/press")
+    for count, grabs, build, dispatch in benchmark(keys, counts):
+        out.append(
+            "  {:>8}  {:>7}  {:>17.1f}  {:>17.1f}".format(count, grabs, build, dispatch)
+        )
+    if x11:
+        out.append("")
+        out.append("X server grab_keys round trip ({}):".format(os.environ["DISPLAY"]))
+        out.append("  bindings  GrabKey  ms")
+        for count, grabs, took in benchmark_x11(counts):
+            out.append("  {:>8}  {:>7}  {:>6.2f}".format(count, grabs, took))
+    return "\n".join(out)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    x11 = "--x11" in args
+    args = [a for a in args if a != "--x11"]
+    path = args[0] if args else os.path.join(here, "config.py")
+    print(report(load(path), x11))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Keypress to window latency ------------------------------
+#
+# `instrument()` rewrites the spawning commands of the given keys, mouse
+# bindings and bar mouse callbacks so that each spawn is stamped with the time
+# the binding fired. The spawned PID is matched against the `client_managed`
+# hook and the elapsed time goes into a per-binding log-scale histogram.
+# `SpawnLatency` shows the slowest binding's p50/p99 on the bar and serves the
+# full table over the command interface:
+#
+#   qtile cmd-obj -o widget spawnlatency -f stats
+
+import os
+import time
+from bisect import bisect_left
+
+from libqtile import hook, qtile
+from libqtile.config import Key
+from libqtile.lazy import lazy
+from libqtile.widget import base
+
+import spawner
+
+# Histogram bucket upper bounds in milliseconds, 5ms .. ~20s
+buckets = [round(5 * 1.25**i) for i in range(38)]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.last = 0
+
+    def add(self, ms):
+        self.counts[bisect_left(buckets, ms)] += 1
+        self.total += 1
+        self.last = ms
+
+    def percentile(self, p):
+        if not self.total:
+            return 0
+        rank = p * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return buckets[min(i, len(buckets) - 1)]
+        return buckets[-1]
+
+    def info(self):
+        return {
+            "count": self.total,
+            "last": round(self.last),
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+        }
+
+
+class Tracker:
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.pending = {}
+        self.histograms = {}
+        hook.subscribe.client_managed(self.on_client_managed)
+
+    def start(self, binding, hint, pid):
+        if pid > 0:
+            self.pending[pid] = (binding, hint, time.monotonic())
+
+    def spawn(self, qtile, binding, cmd, shell=False):
+        argv0 = cmd.split()[0] if isinstance(cmd, str) else cmd[0]
+        self.start(binding, os.path.basename(argv0), qtile.cmd_spawn(cmd, shell))
+
+    def run(self, qtile, binding, command):
+        self.start(binding, os.path.basename(command.binary), command.spawn())
+
+    def run_line(self, qtile, binding, func, line):
+        self.start(binding, os.path.basename(line.split()[0]), func(qtile, line))
+
+    def on_client_managed(self, client):
+        if not self.pending:
+            return
+        now = time.monotonic()
+        for pid, (_, _, started) in list(self.pending.items()):
+            if now - started > self.timeout:
+                del self.pending[pid]
+        match = self.pending.pop(client.get_pid(), None)
+        if match is None:
+            wm_class = [c.lower() for c in (client.get_wm_class() or [])]
+            for pid, (_, hint, _) in self.pending.items():
+                if hint.lower() in wm_class:
+                    match = self.pending.pop(pid)
+                    break
+        if match is not None:
+            binding, _, started = match
+            self.histograms.setdefault(binding, Histogram()).add((now - started) * 1000)
+
+    def stats(self):
+        return {name: h.info() for name, h in self.histograms.items()}
+
+
+tracker = Tracker()
+
+
+def _chord(binding):
+    return "+".join(
+        list(binding.modifiers)
+        + [binding.button if not isinstance(binding, Key) else binding.key]
+    )
+
+
+def _wrap(call, binding):
+    if call.name == "spawn" and not call.selectors:
+        new = lazy.function(tracker.spawn, binding, *call.args, **call.kwargs)
+    elif call.name == "function" and isinstance(
+        getattr(call.args[0], "__self__", None), spawner.Command
+    ):
+        new = lazy.function(tracker.run, binding, call.args[0].__self__)
+    elif call.name == "function" and getattr(call.args[0], "spawns_line", False):
+        new = lazy.function(tracker.run_line, binding, *call.args)
+    else:
+        return call
+    new._focused = call._focused
+    new._if_no_focused = call._if_no_focused
+    new._layouts = call._layouts
+    new._when_floating = call._when_floating
+    return new
+
+
+def instrument(keys, mouse, screens):
+    for binding in keys:
+        if isinstance(binding, Key):
+            chord = _chord(binding)
+            binding.commands = tuple(_wrap(c, chord) for c in binding.commands)
+    for binding in mouse:
+        chord = _chord(binding)
+        binding.commands = tuple(_wrap(c, chord) for c in binding.commands)
+    for screen in screens:
+        for gap in (screen.top, screen.bottom, screen.left, screen.right):
+            for w in getattr(gap, "widgets", []):
+                for button, cb in w.mouse_callbacks.items():
+                    if isinstance(cb, spawner.Command):
+                        w.mouse_callbacks[button] = _Callback(
+                            "{}:{}".format(w.name, cb.name), cb
+                        )
+
+
+class _Callback:
+    def __init__(self, binding, command):
+        self.binding = binding
+        self.command = command
+
+    def __call__(self):
+        tracker.run(qtile, self.binding, self.command)
+
+
+class SpawnLatency(base.InLoopPollText):
+    """Shows p50/p99 spawn latency of the slowest measured binding"""
+
+    defaults = [
+        ("format", "{binding} {p50}/{p99}ms", "Display format"),
+    ]
+
+    def __init__(self, **config):
+        base.InLoopPollText.__init__(self, "", **config)
+        self.add_defaults(SpawnLatency.defaults)
+
+    def poll(self):
+        stats = tracker.stats()
+        if not stats:
+            return ""
+        binding, info = max(stats.items(), key=lambda item: item[1]["p99"])
+        return self.format.format(binding=binding, **info)
+
+    def cmd_stats(self):
+        """Return the per-binding latency histogram summary"""
+        return tracker.stats()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Layout costs ------------------------------
+#
+# Every window that maps, unmaps or takes the focus makes the group lay out
+# all its windows again, and some of the configured layouts (Spiral, RatioTile,
+# Bsp with fair=True) do much more work for that than others. `Costs` tracks
+# how long each layout is on screen. `run()` reads those window events back
+# from the trace evtrace.py records and replays them in the executor through
+# a fresh copy of every configured layout. The copies lay out stand-in
+# windows on a rectangle the size of the current screen, so nothing reaches
+# the X server.
+# It measures the placement time per event and how many of the windows
+# already there had to move. A synthetic trace of `burst` windows opening,
+# taking the focus in turn and closing again is replayed too. It shows how
+# a layout does with many windows.
+#
+# From those costs and the screen time it suggests layouts to drop (costly
+# and hardly used) and the order to cycle through the rest. TreeTab draws its
+# tab panel in a window of its own, and that drawing is left out.
+# The replay runs only on demand, it is kept in ~/.cache/qtile/layoutcost.json
+# and read back at startup and on reload_config. `LayoutCost` shows the
+# current layout's cost from the last replay on the bar and replays the trace
+# again on a click. From a shell:
+#
+#   qtile cmd-obj -o widget layoutcost -f run
+#   qtile cmd-obj -o widget layoutcost -f report
+
+import json
+import os
+import statistics
+import time
+
+from libqtile import hook, qtile
+from libqtile.log_utils import logger
+from libqtile.widget import base
+
+import evtrace
+
+report_path = os.path.expanduser("~/.cache/qtile/layoutcost.json")
+
+ADD, REMOVE, FOCUS = range(3)
+
+
+class _Window:
+    # what Zoomy sets on the X window
+    def set_property(self, *args, **kwargs):
+        pass
+
+    def get_property(self, *args, **kwargs):
+        return None
+
+
+class _Client:
+    def __init__(self, wid, group):
+        self.wid = wid
+        self.name = str(wid)
+        self.group = group
+        self.window = _Window()
+        self.x = self.y = 0
+        self.width = self.height = 0
+        self.hidden = True
+        self.floating = self.fullscreen = self.maximized = self.minimized = False
+        self.urgent = False
+        self.float_x = self.float_y = None
+
+    @property
+    def has_focus(self):
+        return self.group.current_window is self
+
+    def place(self, x, y, width, height, *args, **kwargs):
+        self.x, self.y, self.width, self.height = x, y, width, height
+
+    def hide(self):
+        self.hidden = True
+
+    def unhide(self):
+        self.hidden = False
+
+    def geometry(self):
+        return self.x, self.y, self.width, self.height, self.hidden
+
+    def info(self):
+        return dict(name=self.name, id=self.wid)
+
+    def get_wm_class(self):
+        return None
+
+    def is_transient_for(self):
+        return None
+
+    def has_user_set_position(self):
+        return False
+
+    def paint_borders(self, *args):
+        pass
+
+    def cmd_bring_to_front(self):
+        pass
+
+
+class _Group:
+    # the part of Group the layouts reach for
+    def __init__(self, name, template, rect):
+        self.name = name
+        self.rect = rect
+        self.screen = None
+        self.qtile = None
+        self.clients = {}
+        self.current_window = None
+        self.layout = template.clone(self)
+
+    def layout_all(self, warp=False):
+        # the replay lays out once per event, after the event
+        pass
+
+    def focus(self, client, warp=True, force=False):
+        if client is not None:
+            self.current_window = client
+            self.layout.focus(client)
+
+    def apply(self, kind, wid):
+        client = self.clients.get(wid)
+        if kind == ADD:
+            if client is not None:
+                return False
+            client = self.clients[wid] = _Client(wid, self)
+            self.layout.add(client)
+            self.focus(client)
+        elif client is None:
+            return False
+        elif kind == REMOVE:
+            del self.clients[wid]
+            following = self.layout.remove(client)
+            if self.current_window is client:
+                self.current_window = None
+                if following not in self.clients.values() and self.clients:
+                    following = list(self.clients.values())[-1]
+                self.focus(following)
+        else:
+            self.focus(client)
+        if self.clients:
+            self.layout.layout(list(self.clients.values()), self.rect)
+        return True
+
+
+def replay(template, events, rect):
+    groups = {}
+    times = []
+    moved = []
+    for kind, wid, name in events:
+        group = groups.get(name)
+        if group is None:
+            group = groups[name] = _Group(name, template, rect)
+        before = {c: c.geometry() for c in group.clients.values()}
+        start = time.perf_counter()
+        if not group.apply(kind, wid):
+            continue
+        times.append((time.perf_counter() - start) * 1e3)
+        moved.append(
+            sum(c.geometry() != g for c, g in before.items() if c.wid in group.clients)
+        )
+    if not times:
+        return {"events": 0, "mean_ms": 0.0, "max_ms": 0.0, "moved": 0.0}
+    return {
+        "events": len(times),
+        "mean_ms": statistics.fmean(times),
+        "max_ms": max(times),
+        "moved": statistics.fmean(moved),
+    }
+
+
+def synthetic(count):
+    events = [(ADD, wid, "burst") for wid in range(count)]
+    events += [(FOCUS, wid, "burst") for wid in range(0, count, 3)]
+    events += [(REMOVE, wid, "burst") for wid in range(count)]
+    return events
+
+
+def recommend(results, usage, order, expensive=2.0, rare=0.05):
+    costs = {
+        name: r["recorded"]["mean_ms"]
+        for name, r in results.items()
+        if "error" not in r and r["recorded"]["events"]
+    }
+    lines = []
+    if not costs:
+        return lines
+    median = statistics.median(costs.values())
+    total = sum(usage.values()) or 1
+    for name in order:
+        if "error" in results[name]:
+            lines.append(
+                "{} could not be replayed: {}".format(name, results[name]["error"])
+            )
+            continue
+        share = usage.get(name, 0) / total
+        cost = costs.get(name)
+        if cost is not None and cost > expensive * median and share < rare:
+            lines.append(
+                "drop {}: {:.1f}x the median cost per event, on screen {:.0%}"
+                " of the time".format(name, cost / (median or 1), share)
+            )
+    # the first layout is every group's default, next_layout cycles in order
+    better = sorted(
+        order, key=lambda name: (-usage.get(name, 0), costs.get(name, float("inf")))
+    )
+    if better != order:
+        lines.append("reorder: " + ", ".join(better))
+    return lines
+
+
+def _write(data):
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    tmp = report_path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, report_path)
+
+
+def _read():
+    try:
+        with open(report_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def from_trace(trace, names):
+    # the tiled window events of an evtrace log, by group name
+    events = []
+    where = {}
+    for e in trace:
+        if e.kind == evtrace.MAP:
+            # a restart maps the windows that are already there again
+            if e.mask & evtrace.FLOATING or e.group >= len(names) or e.wid in where:
+                continue
+            where[e.wid] = names[e.group]
+            events.append((ADD, e.wid, where[e.wid]))
+        elif e.wid not in where:
+            continue
+        elif e.kind == evtrace.UNMAP:
+            events.append((REMOVE, e.wid, where.pop(e.wid)))
+        elif e.kind == evtrace.FOCUS:
+            events.append((FOCUS, e.wid, where[e.wid]))
+        elif e.kind == evtrace.MOVE and e.group < len(names):
+            events.append((REMOVE, e.wid, where[e.wid]))
+            where[e.wid] = names[e.group]
+            events.append((ADD, e.wid, where[e.wid]))
+    return events
+
+
+class Costs:
+    def __init__(self, burst=50):
+        self.burst = burst
+        self.showing = None
+        self.since = 0.0
+        self.running = False
+        self.listeners = []
+        stored = _read()
+        self.results = stored.get("results", {})
+        self.traced = stored.get("traced", 0)
+        self.advice = stored.get("advice", [])
+        self.usage = stored.get("usage", {})
+        hook.subscribe.startup(self.on_screen)
+        hook.subscribe.layout_change(self.on_screen)
+        hook.subscribe.setgroup(self.on_screen)
+
+    def on_screen(self, *args):
+        now = time.monotonic()
+        if self.showing is not None:
+            self.usage[self.showing] = (
+                self.usage.get(self.showing, 0) + now - self.since
+            )
+        self.showing = qtile.current_layout.name
+        self.since = now
+
+    def run(self):
+        if self.running:
+            return False
+        self.running = True
+        self.on_screen()
+        rect = qtile.current_screen.get_rect()
+        names = [group.name for group in qtile.groups]
+        future = qtile.run_in_executor(
+            self._replay, list(qtile.config.layouts), names, rect
+        )
+        future.add_done_callback(self._done)
+        return True
+
+    def _replay(self, layouts, names, rect):
+        try:
+            events = from_trace(evtrace.read(), names)
+        except (OSError, ValueError):
+            events = []
+        results = {}
+        burst = synthetic(self.burst)
+        for template in layouts:
+            try:
+                results[template.name] = {
+                    "recorded": replay(template, events, rect),
+                    "burst": replay(template, burst, rect),
+                }
+            except Exception as e:
+                results[template.name] = {"error": "{}: {}".format(type(e).__name__, e)}
+        return results, len(events)
+
+    def _done(self, future):
+        self.running = False
+        try:
+            self.results, self.traced = future.result()
+        except Exception:
+            logger.exception("layoutbench: replay failed")
+            return
+        order = [layout.name for layout in qtile.config.layouts]
+        self.advice = recommend(self.results, self.usage, order)
+        logger.info("layout costs:\n%s", self.report())
+        data = json.dumps(
+            {
+                "results": self.results,
+                "traced": self.traced,
+                "advice": self.advice,
+                "usage": self.usage,
+            }
+        )
+        qtile.run_in_executor(_write, data).add_done_callback(self._written)
+        for callback in list(self.listeners):
+            callback()
+
+    def _written(self, future):
+        try:
+            future.result()
+        except OSError as e:
+            logger.warning("layoutbench: cannot save: %s", e)
+
+    def cost(self, name):
+        result = self.results.get(name)
+        if result is None or "error" in result:
+            return None
+        return result["recorded"]
+
+    def report(self):
+        if not self.results:
+            return "no replay yet"
+        total = sum(self.usage.values()) or 1
+        lines = [
+            "{:<16} {:>8} {:>8} {:>6} {:>10} {:>6}".format(
+                "layout", "ms/event", "max ms", "moved", "burst ms", "shown"
+            )
+        ]
+        for name, result in self.results.items():
+            if "error" in result:
+                lines.append("{:<16} {}".format(name, result["error"]))
+                continue
+            recorded = result["recorded"]
+            lines.append(
+                "{:<16} {:>8.3f} {:>8.3f} {:>6.1f} {:>10.3f} {:>6.0%}".format(
+                    name,
+                    recorded["mean_ms"],
+                    recorded["max_ms"],
+                    recorded["moved"],
+                    result["burst"]["mean_ms"],
+                    self.usage.get(name, 0) / total,
+                )
+            )
+        lines.append(
+            "{} traced window events, burst of {} windows".format(
+                self.traced, self.burst
+            )
+        )
+        lines.extend(self.advice or ["nothing to drop or reorder"])
+        return "\n".join(lines)
+
+
+costs = Costs()
+
+
+class LayoutCost(base.InLoopPollText):
+    """Shows the last replayed cost of the current layout, click to replay again"""
+
+    defaults = [
+        ("format", "{ms:.2f}ms {moved:.1f}mv", "Display format"),
+    ]
+
+    def __init__(self, **config):
+        base.InLoopPollText.__init__(self, "", **config)
+        self.add_defaults(LayoutCost.defaults)
+        self.add_callbacks({"Button1": self.cmd_run})
+
+    def _configure(self, qtile, bar):
+        base.InLoopPollText._configure(self, qtile, bar)
+        costs.listeners.append(self.tick)
+        hook.subscribe.layout_change(self._changed)
+
+    def _changed(self, *args):
+        self.tick()
+
+    def poll(self):
+        cost = costs.cost(qtile.current_layout.name)
+        if cost is None:
+            return ""
+        return self.format.format(ms=cost["mean_ms"], moved=cost["moved"])
+
+    def finalize(self):
+        if self.tick in costs.listeners:
+            costs.listeners.remove(self.tick)
+        base.InLoopPollText.finalize(self)
+
+    def cmd_run(self):
+        """Replay the recorded trace through every layout again"""
+        costs.run()
+
+    def cmd_report(self):
+        """Return the per-layout cost report and suggestions"""
+        return costs.report()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Event loop watchdog ------------------------------
+#
+# A heartbeat rescheduled with `qtile.call_later` measures how late the event
+# loop runs it, giving a continuous loop lag sample. A daemon thread watches the
+# heartbeat and, when it is overdue by more than `stall` seconds, snapshots the
+# loop thread's stack, so the widget poll, hook or callback that was blocking
+# can be named. Stalls are appended as JSON lines to `log_path`, and the
+# `LoopLatency` widget shows p50/p99 lag:
+#
+#   qtile cmd-obj -o widget looplatency -f stats
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from libqtile import qtile
+from libqtile.log_utils import logger
+from libqtile.widget import base
+
+here = os.path.dirname(os.path.abspath(__file__))
+log_path = os.path.expanduser("~/.cache/qtile/loopwatch.jsonl")
+
+_current = None
+
+
+def _percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def _owner(frame):
+    # Innermost frame whose `self` is a widget, layout or something from this
+    # config folder names the stall better than the raw stack.
+    while frame is not None:
+        obj = frame.f_locals.get("self")
+        if obj is not None:
+            module = type(obj).__module__ or ""
+            filename = frame.f_code.co_filename
+            if module.startswith(("libqtile.widget", "libqtile.layout")) or (
+                os.path.dirname(filename) == here
+            ):
+                return "{}.{}".format(
+                    getattr(obj, "name", type(obj).__name__), frame.f_code.co_name
+                )
+        frame = frame.f_back
+    return None
+
+
+class Watchdog:
+    def __init__(self, interval=0.25, stall=0.2, samples=1200):
+        self.interval = interval
+        self.stall = stall
+        self.lags = deque(maxlen=samples)
+        self.stalls = deque(maxlen=50)
+        self.expected = None
+        self.last_beat = time.monotonic()
+        self.reported = False
+        self.loop_thread = None
+
+    def start(self):
+        global _current
+        _current = self
+        self.loop_thread = threading.get_ident()
+        self.expected = time.monotonic() + self.interval
+        qtile.call_later(self.interval, self.beat)
+        threading.Thread(target=self.watch, name="loopwatch", daemon=True).start()
+
+    def beat(self):
+        if _current is not self:
+            return
+        now = time.monotonic()
+        lag = max(0.0, now - self.expected)
+        self.lags.append(lag)
+        if self.reported:
+            self.stalls[-1]["lag_ms"] = round(lag * 1000)
+            self.log(self.stalls[-1])
+        self.last_beat = now
+        self.reported = False
+        self.expected = now + self.interval
+        qtile.call_later(self.interval, self.beat)
+
+    def watch(self):
+        while _current is self:
+            time.sleep(self.interval / 2)
+            overdue = time.monotonic() - self.expected
+            if overdue > self.stall and not self.reported:
+                self.stalls.append(self.snapshot(overdue))
+                self.reported = True
+
+    def snapshot(self, overdue):
+        frame = sys._current_frames().get(self.loop_thread)
+        stack = traceback.extract_stack(frame)[-12:] if frame is not None else []
+        return {
+            "time": time.time(),
+            "lag_ms": round(overdue * 1000),
+            "owner": _owner(frame),
+            "stack": [
+                "{}:{} {}".format(os.path.basename(f.filename), f.lineno, f.name)
+                for f in stack
+            ],
+        }
+
+    def log(self, record):
+        record = dict(record, **self.percentiles())
+        try:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            logger.exception("loopwatch: could not write %s", log_path)
+
+    def percentiles(self):
+        ordered = sorted(self.lags)
+        return {
+            "p50_ms": round(_percentile(ordered, 0.5) * 1000, 1),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 1),
+            "max_ms": round((ordered[-1] if ordered else 0) * 1000, 1),
+        }
+
+    def stats(self):
+        return dict(self.percentiles(), stalls=list(self.stalls))
+
+
+def start(**config):
+    watchdog = Watchdog(**config)
+    watchdog.start()
+    return watchdog
+
+
+class LoopLatency(base.InLoopPollText):
+    """Shows p50/p99 event loop lag measured by the loopwatch heartbeat"""
+
+    defaults = [
+        ("format", "{p50_ms:.0f}/{p99_ms:.0f}ms", "Display format"),
+    ]
+
+    def __init__(self, **config):
+        base.InLoopPollText.__init__(self, "", **config)
+        self.add_defaults(LoopLatency.defaults)
+
+    def poll(self):
+        if _current is None:
+            return ""
+        return self.format.format(**_current.percentiles())
+
+    def cmd_stats(self):
+        """Return loop lag percentiles and the recent stalls"""
+        return _current.stats() if _current is not None else {}
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Cached marquee ------------------------------
+#
+# _TextBox scrolling re-lays out and re-renders the whole pango layout on
+# every scroll tick. Marquee renders the text once into an offscreen surface
+# whenever the text, colour or font changes, and each tick only paints a
+# shifted, clipped window of that surface. Text that fits is drawn the normal
+# way and never scrolls, and ticks stop while the bar is hidden (the next bar
+# draw starts them again).
+
+import cairocffi
+
+from libqtile import pangocffi, widget
+from libqtile.widget import base
+
+
+class Marquee:
+    _marquee = None
+    _marquee_key = None
+
+    def _render_marquee(self):
+        size = self.bar.size
+        key = (
+            self.layout.text,
+            self.layout.colour,
+            self.layout.font_family,
+            self.layout.font_size,
+            self.layout.font_shadow,
+            size,
+        )
+        if key != self._marquee_key:
+            width = self.layout.width + 2
+            surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, width, size)
+            ctx = self.drawer.ctx
+            self.drawer.ctx = pangocffi.patch_cairo_context(cairocffi.Context(surface))
+            try:
+                self.layout.draw(0, int(size / 2.0 - self.layout.height / 2.0) + 1)
+            finally:
+                self.drawer.ctx = ctx
+            self._marquee = surface
+            self._marquee_key = key
+        return self._marquee
+
+    def draw(self):
+        if not self._should_scroll or not self.bar.horizontal:
+            self._marquee = self._marquee_key = None
+            return base._TextBox.draw(self)
+        if not self.can_draw():
+            return
+
+        self.drawer.clear(self.background or self.bar.background)
+        ctx = self.drawer.ctx
+        ctx.save()
+        ctx.rectangle(
+            self.actual_padding,
+            0,
+            self._scroll_width - 2 * self.actual_padding,
+            self.bar.size,
+        )
+        ctx.clip()
+        ctx.set_source_surface(
+            self._render_marquee(), self.actual_padding - self._scroll_offset, 0
+        )
+        ctx.paint()
+        ctx.restore()
+        self.drawer.draw(
+            offsetx=self.offsetx,
+            offsety=self.offsety,
+            width=self.width,
+            height=self.height,
+        )
+
+        if self._is_scrolling and not self._scroll_queued:
+            self._scroll_queued = True
+            if self._scroll_offset == 0:
+                interval = self.scroll_delay
+            else:
+                interval = self.scroll_interval
+            self._scroll_timer = self.timeout_add(interval, self.do_scroll)
+
+    def do_scroll(self):
+        if not self.bar.is_show():
+            self._scroll_queued = False
+            return
+        base._TextBox.do_scroll(self)
+
+    def finalize(self):
+        self._marquee = self._marquee_key = None
+        super().finalize()
+
+
+class Wlan(Marquee, widget.Wlan):
+    pass
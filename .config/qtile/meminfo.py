@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# /proc/meminfo sampler ------------------------------
+#
+# One Sampler is shared by the Memory and DF widgets (see metrics.py) so a
+# tick costs one pread of /proc/meminfo into a preallocated buffer, one
+# statvfs per partition and, if available, one read of /proc/pressure/memory.
+# The kernel prints meminfo with fixed-width columns, so the byte offsets of
+# the wanted lines are found once and reused while every line still starts
+# and ends where it did. Each value is parsed from its colon to " kB", as the
+# numbers are right-aligned and start earlier when they gain a digit. Values
+# are kept in kB in a preallocated array.
+#
+# `python meminfo.py` benchmarks a tick against a plain parse (and psutil if
+# it is installed).
+
+import os
+import re
+import threading
+import time
+from array import array
+
+fields = (
+    "MemTotal",
+    "MemFree",
+    "MemAvailable",
+    "Buffers",
+    "Cached",
+    "SReclaimable",
+    "Shmem",
+    "Active",
+    "Inactive",
+    "SwapTotal",
+    "SwapFree",
+)
+index = {name: i for i, name in enumerate(fields)}
+line_re = re.compile(rb"^([^:\n]+):\s+(\d+)", re.M)
+
+
+class Sampler:
+    def __init__(self, path="/proc/meminfo", psi="/proc/pressure/memory", max_age=0.5):
+        self.path = path
+        self.psi = psi if os.path.exists(psi) else None
+        self.max_age = max_age
+        self.values = array("Q", [0] * len(fields))
+        self.pressure = 0.0
+        self.buf = bytearray(8192)
+        self.psi_buf = bytearray(256)
+        self.length = -1
+        self.offsets = []
+        self.disks = {}
+        self.stamp = 0.0
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDONLY)
+        self.psi_fd = os.open(self.psi, os.O_RDONLY) if self.psi else None
+
+    def __del__(self):
+        # __init__ may have failed before opening either file
+        if getattr(self, "fd", None) is not None:
+            os.close(self.fd)
+        if getattr(self, "psi_fd", None) is not None:
+            os.close(self.psi_fd)
+
+    def _locate(self, length):
+        # (slot, colon, newline) of every wanted line in the buffer
+        self.offsets = []
+        for m in line_re.finditer(self.buf, 0, length):
+            slot = index.get(m.group(1).decode())
+            if slot is not None:
+                self.offsets.append((slot, m.end(1), self.buf.index(b"\n", m.end(2))))
+        self.length = length
+
+    def _parse(self):
+        # values are right-aligned: a number gaining a digit starts a byte
+        # earlier, so each is read from the colon to " kB"
+        buf = self.buf
+        values = self.values
+        for slot, colon, newline in self.offsets:
+            if buf[colon] != 58 or buf[newline] != 10:
+                return False
+            values[slot] = int(buf[colon + 1 : newline - 3])
+        return True
+
+    def _read_meminfo(self):
+        length = os.preadv(self.fd, [self.buf], 0)
+        if length != self.length or not self._parse():
+            # the lines moved: a column grew wider
+            self._locate(length)
+            self._parse()
+
+    def _read_pressure(self):
+        # "some avg10=0.00 avg60=0.00 avg300=0.00 total=0"
+        length = os.preadv(self.psi_fd, [self.psi_buf], 0)
+        start = self.psi_buf.find(b"avg10=", 0, length) + 6
+        self.pressure = float(self.psi_buf[start : self.psi_buf.find(b" ", start)])
+
+    def sample(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.stamp >= self.max_age:
+                self._read_meminfo()
+                if self.psi_fd is not None:
+                    self._read_pressure()
+                self.disks.clear()
+                self.stamp = now
+        return self
+
+    def get(self, name):
+        return self.values[index[name]]
+
+    def statvfs(self, partition):
+        with self.lock:
+            if partition not in self.disks:
+                self.disks[partition] = os.statvfs(partition)
+            return self.disks[partition]
+
+    # Same arithmetic as psutil on Linux, in kB
+    def used(self):
+        v = self.values
+        used = v[0] - v[1] - v[3] - v[4] - v[5]
+        return used if used >= 0 else v[0] - v[1]
+
+    def percent(self):
+        v = self.values
+        return (v[0] - v[2]) / v[0] * 100 if v[0] else 0.0
+
+
+sampler = None
+
+
+def shared():
+    global sampler
+    if sampler is None:
+        sampler = Sampler()
+    return sampler
+
+
+def _plain_parse(path="/proc/meminfo"):
+    values = {}
+    with open(path) as f:
+        for line in f:
+            name, value = line.split(":", 1)
+            values[name] = int(value.split()[0])
+    return values
+
+
+def benchmark(n=20000):
+    s = Sampler(max_age=0)
+    runs = [("sampler", lambda: (s.sample(), s.used()))]
+    runs.append(("plain parse", _plain_parse))
+    try:
+        import psutil
+
+        runs.append(("psutil", lambda: (psutil.virtual_memory(), psutil.swap_memory())))
+    except ImportError:
+        pass
+    for name, func in runs:
+        start = time.perf_counter()
+        for _ in range(n):
+            func()
+        print(
+            "{:<12} {:8.2f} us/tick".format(
+                name, (time.perf_counter() - start) / n * 1e6
+            )
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Memory and disk widgets ------------------------------
+#
+# Drop-in replacements for widget.Memory and widget.DF that read from the
+# shared meminfo.Sampler instead of psutil and their own statvfs calls. The
+# format values dict is reused between ticks and the text only changes when
+# the formatted output does. If /proc/pressure/memory exists, Memory switches
+# to `warn_color` while the 10s memory stall average is above `pressure_warn`.
+
+from libqtile import widget
+from libqtile.widget import base
+
+import meminfo
+
+measures = {"G": 1024 * 1024, "M": 1024, "K": 1, "B": 1 / 1024}
+
+
+class Memory(base.ThreadPoolText):
+    """Displays memory/swap usage, same fields as widget.Memory"""
+
+    defaults = [
+        (
+            "format",
+            "{MemUsed: .0f}{mm}/{MemTotal: .0f}{mm}",
+            "Formatting for field names.",
+        ),
+        ("update_interval", 1.0, "Update interval for the Memory"),
+        ("measure_mem", "M", "Measurement for Memory (G, M, K, B)"),
+        ("measure_swap", "M", "Measurement for Swap (G, M, K, B)"),
+        ("pressure_warn", 10.0, "Memory PSI avg10 above which to warn"),
+        ("warn_color", "#FF3131", "Text colour while memory is under pressure"),
+    ]
+
+    def __init__(self, **config):
+        base.ThreadPoolText.__init__(self, "", **config)
+        self.add_defaults(Memory.defaults)
+        self.calc_mem = measures[self.measure_mem]
+        self.calc_swap = measures[self.measure_swap]
+        self.sampler = meminfo.shared()
+        self.values = {"mm": self.measure_mem, "ms": self.measure_swap}
+        self.pressured = False
+
+    def poll(self):
+        s = self.sampler.sample()
+        val = self.values
+        mem = self.calc_mem
+        swap = self.calc_swap
+        swap_total = s.get("SwapTotal")
+        swap_used = swap_total - s.get("SwapFree")
+        val["MemUsed"] = s.used() / mem
+        val["MemTotal"] = s.get("MemTotal") / mem
+        val["MemFree"] = s.get("MemFree") / mem
+        val["MemPercent"] = s.percent()
+        val["Buffers"] = s.get("Buffers") / mem
+        val["Active"] = s.get("Active") / mem
+        val["Inactive"] = s.get("Inactive") / mem
+        val["Shmem"] = s.get("Shmem") / mem
+        val["SwapTotal"] = swap_total / swap
+        val["SwapFree"] = s.get("SwapFree") / swap
+        val["SwapUsed"] = swap_used / swap
+        val["SwapPercent"] = swap_used / swap_total * 100 if swap_total else 0.0
+        self.pressured = s.pressure > self.pressure_warn
+        return self.format.format(**val)
+
+    def update(self, text):
+        colour = self.warn_color if self.pressured else self.foreground
+        if colour != self.layout.colour:
+            self.layout.colour = colour
+            if self.text == text:
+                self.draw()
+        base.ThreadPoolText.update(self, text)
+
+
+class DF(widget.DF):
+    """widget.DF reading statvfs through the shared sampler"""
+
+    def poll(self):
+        statvfs = meminfo.shared().sample().statvfs(self.partition)
+        size = statvfs.f_frsize * statvfs.f_blocks // self.calc
+        free = statvfs.f_frsize * statvfs.f_bfree // self.calc
+        self.user_free = statvfs.f_frsize * statvfs.f_bavail // self.calc
+        if self.visible_on_warn and self.user_free >= self.warn_space:
+            return ""
+        return self.format.format(
+            p=self.partition,
+            s=size,
+            f=free,
+            uf=self.user_free,
+            m=self.measure,
+            r=(size - self.user_free) / size * 100,
+        )
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Modal key maps ------------------------------
+#
+# Every global binding stays grabbed on the root window (four times over, for
+# the Caps Lock and Num Lock variants) for as long as qtile runs. Bindings
+# only needed in bursts, like resizing or picking a layout, live in modes
+# instead: `mode()` builds a persistent KeyChord that Escape or Return
+# leaves. While it is active qtile ungrabs everything and grabs only the
+# mode's keys, then grabs the global set again when it ends.
+#
+# A switch sends its UngrabKey and GrabKey requests unchecked, and they go
+# out in one flush. `Switches` times each switch, waits for the server with a
+# single GetInputFocus round trip, and keeps per-mode statistics:
+#
+#   qtile cmd-obj -o cmd -f eval -a "__import__('modes').switches.stats()"
+
+import time
+
+from libqtile import hook, qtile
+from libqtile.config import Key, KeyChord
+from libqtile.lazy import lazy
+from libqtile.log_utils import logger
+
+
+def mode(modifiers, key, name, bindings):
+    # Escape is appended by KeyChord itself
+    return KeyChord(
+        modifiers,
+        key,
+        bindings + [Key([], "Return", lazy.ungrab_chord(), desc="Leave " + name)],
+        mode=True,
+        name=name,
+    )
+
+
+class Switches:
+    def __init__(self, sync=True):
+        self.sync = sync
+        self.stats_by_mode = {}
+        hook.subscribe.startup(self.install)
+
+    def install(self):
+        for name in ("grab_chord", "cmd_ungrab_chord", "cmd_ungrab_all_chords"):
+            method = getattr(qtile, name)
+            # the wrapper of the previous config load
+            method = getattr(method, "__wrapped__", method)
+            setattr(qtile, name, self._timed(name, method))
+
+    def _timed(self, name, method):
+        def timed(*args):
+            start = time.perf_counter()
+            method(*args)
+            if self.sync and qtile.core.name == "x11":
+                qtile.core.conn.conn.core.GetInputFocus().reply()
+            took = (time.perf_counter() - start) * 1e3
+            target = qtile.chord_stack[-1].name if qtile.chord_stack else "global"
+            self._record(target, len(qtile.keys_map), took)
+
+        timed.__wrapped__ = method
+        return timed
+
+    def _record(self, target, grabbed, took):
+        s = self.stats_by_mode.setdefault(
+            target, {"switches": 0, "grabbed": 0, "last_ms": 0, "max_ms": 0, "sum": 0}
+        )
+        s["switches"] += 1
+        s["grabbed"] = grabbed
+        s["last_ms"] = round(took, 3)
+        s["max_ms"] = max(s["max_ms"], s["last_ms"])
+        s["sum"] += took
+        logger.debug("modes: %s, %d chords grabbed in %.2f ms", target, grabbed, took)
+
+    def stats(self):
+        return {
+            target: {
+                "switches": s["switches"],
+                "grabbed": s["grabbed"],
+                "last_ms": s["last_ms"],
+                "mean_ms": round(s["sum"] / s["switches"], 3),
+                "max_ms": s["max_ms"],
+            }
+            for target, s in self.stats_by_mode.items()
+        }
+
+
+switches = Switches()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Asyncio MPD client ------------------------------
+#
+# One connection sits in `idle` and pushes status/currentsong to subscribers
+# whenever MPD reports a change; a second, lazily opened connection carries
+# commands (next, pause, ...) so the media keys don't fork `mpc`. Both
+# reconnect on their own. FakeServer speaks enough of the protocol to run the
+# client without MPD, and the self-check fails unless the updates come in the
+# expected order:
+#
+#   python mpdclient.py
+
+import asyncio
+import logging
+import sys
+
+try:
+    from libqtile.log_utils import logger
+except ImportError:
+    # the self-check runs without qtile
+    logger = logging.getLogger("libqtile")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class CommandError(Exception):
+    pass
+
+
+def _quote(arg):
+    return '"{}"'.format(str(arg).replace("\\", "\\\\").replace('"', '\\"'))
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, host="localhost", port=6600, password=None, timeout=5):
+        if host.startswith("/"):
+            connect = asyncio.open_unix_connection(host)
+        else:
+            connect = asyncio.open_connection(host, port)
+        reader, writer = await asyncio.wait_for(connect, timeout)
+        greeting = await asyncio.wait_for(reader.readline(), timeout)
+        conn = cls(reader, writer)
+        if not greeting.startswith(b"OK MPD "):
+            conn.close()
+            raise ProtocolError("unexpected greeting {!r}".format(greeting))
+        if password:
+            try:
+                await conn.command("password", password)
+            except CommandError:
+                conn.close()
+                raise
+        return conn
+
+    async def command(self, name, *args):
+        line = name + "".join(" " + _quote(a) for a in args) + "\n"
+        self.writer.write(line.encode())
+        await self.writer.drain()
+        pairs = []
+        while True:
+            raw = await self.reader.readline()
+            if not raw:
+                raise ConnectionError("MPD closed the connection")
+            line = raw.decode("utf-8", "replace").rstrip("\n")
+            if line == "OK":
+                return pairs
+            if line.startswith("ACK "):
+                raise CommandError(line)
+            key, _, value = line.partition(": ")
+            pairs.append((key, value))
+
+    def close(self):
+        self.writer.close()
+
+
+class Client:
+    subsystems = ("player", "mixer", "options", "playlist")
+
+    def __init__(self, host="localhost", port=6600, password=None, timeout=5):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.status = {}
+        self.song = {}
+        self.connected = False
+        self.listeners = []
+        self._task = None
+        self._idle = None
+        self._cmd = None
+        self._lock = None
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _notify(self):
+        for callback in list(self.listeners):
+            callback(self)
+
+    def _open(self):
+        return Connection.open(self.host, self.port, self.password, self.timeout)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._idle_loop())
+            self._task.add_done_callback(self._finished)
+
+    def _finished(self, task):
+        if task is self._task:
+            self._task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("mpd: idle loop died", exc_info=task.exception())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for conn in (self._idle, self._cmd):
+            if conn is not None:
+                conn.close()
+        self._idle = self._cmd = None
+
+    async def _refresh(self, conn):
+        self.status = dict(await conn.command("status"))
+        self.song = dict(await conn.command("currentsong"))
+        self._notify()
+
+    async def _idle_loop(self):
+        delay = 1
+        while True:
+            try:
+                self._idle = await self._open()
+                self.connected = True
+                await self._refresh(self._idle)
+                delay = 1
+                while True:
+                    await self._idle.command("idle", *self.subsystems)
+                    await self._refresh(self._idle)
+            except (OSError, ProtocolError, asyncio.TimeoutError, CommandError) as e:
+                # MPD refusing the password or a command is retried like a
+                # dropped connection, it may be restarting with a new config
+                if self.connected or isinstance(e, CommandError):
+                    logger.warning("mpd: %s", e or type(e).__name__)
+                if self._idle is not None:
+                    self._idle.close()
+                    self._idle = None
+                if self.connected:
+                    self.connected = False
+                    self.status = {}
+                    self.song = {}
+                    self._notify()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    async def command(self, name, *args):
+        # MPD drops clients that are quiet for connection_timeout, so a failed
+        # command on the pooled connection is retried once on a fresh one.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._cmd is None:
+                        self._cmd = await self._open()
+                    return await self._cmd.command(name, *args)
+                except (OSError, ProtocolError, asyncio.TimeoutError):
+                    if self._cmd is not None:
+                        self._cmd.close()
+                        self._cmd = None
+                    if attempt:
+                        raise
+
+    async def toggle(self):
+        if self.status.get("state") == "play":
+            return await self.command("pause", 1)
+        return await self.command("play")
+
+    async def run(self, name):
+        if name == "toggle":
+            return await self.toggle()
+        return await self.command(name)
+
+
+class FakeServer:
+    def __init__(self, songs=("One", "Two", "Three")):
+        self.songs = list(songs)
+        self.song = 0
+        self.state = "stop"
+        self.waiters = []
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    def close(self):
+        self.server.close()
+
+    def changed(self, subsystem="player"):
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(subsystem)
+
+    def reply(self, name, args):
+        if name == "status":
+            return "state: {}\nsong: {}\n".format(self.state, self.song)
+        if name == "currentsong":
+            if self.state == "stop":
+                return ""
+            return "file: {0}.flac\nTitle: {0}\n".format(self.songs[self.song])
+        if name in ("next", "previous"):
+            step = 1 if name == "next" else -1
+            self.song = (self.song + step) % len(self.songs)
+            self.state = "play"
+        elif name == "play":
+            self.state = "play"
+        elif name == "pause":
+            self.state = "pause" if self.state == "play" else "play"
+        elif name == "stop":
+            self.state = "stop"
+        elif name not in ("ping", "password"):
+            return None
+        if name not in ("ping", "password"):
+            self.changed()
+        return ""
+
+    async def handle(self, reader, writer):
+        writer.write(b"OK MPD 0.23.0\n")
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                name, *args = raw.decode().split()
+                if name == "idle":
+                    waiter = asyncio.get_running_loop().create_future()
+                    self.waiters.append(waiter)
+                    writer.write("changed: {}\nOK\n".format(await waiter).encode())
+                else:
+                    body = self.reply(name, args)
+                    if body is None:
+                        body = "ACK [5@0] {{{}}} unknown command\n".format(name)
+                    else:
+                        body += "OK\n"
+                    writer.write(body.encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+expected = [
+    ("stop", None),
+    ("play", "One"),
+    ("play", "Two"),
+    ("pause", "Two"),
+    ("stop", None),
+]
+
+
+async def _selfcheck():
+    server = FakeServer()
+    port = await server.start()
+    client = Client("127.0.0.1", port)
+    seen = []
+    client.subscribe(
+        lambda c: seen.append((c.status.get("state"), c.song.get("Title")))
+    )
+
+    async def settled(count, timeout=2):
+        # each command is pushed back through idle as one update
+        deadline = asyncio.get_running_loop().time() + timeout
+        while len(seen) < count and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+
+    client.start()
+    await settled(1)
+    for count, name in enumerate(("toggle", "next", "toggle", "stop"), 2):
+        await client.run(name)
+        await settled(count)
+    await asyncio.sleep(0.05)
+    client.stop()
+    server.close()
+    for update in seen:
+        print(*update)
+    if seen != expected:
+        print("FAIL expected", expected)
+        return 1
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_selfcheck()))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# MPD widget and media keys ------------------------------
+#
+# `Mpd` replaces widget.Mpd2: instead of polling it redraws when the shared
+# mpdclient.Client pushes a change from its idle connection, and scrolls
+# through a cached marquee. `command` is the lazy.function used by the
+# XF86Audio* keys, sending the command over the client's pooled connection
+# rather than forking `mpc`.
+
+import asyncio
+import os
+
+from libqtile.log_utils import logger
+from libqtile.widget import base
+
+import marquee
+import mpdclient
+
+_clients = {}
+
+
+def client(host="localhost", port=6600, password=None):
+    host = os.environ.get("MPD_HOST", host)
+    port = int(os.environ.get("MPD_PORT", port))
+    if (host, port) not in _clients:
+        _clients[(host, port)] = mpdclient.Client(host, port, password)
+    return _clients[(host, port)]
+
+
+async def _run(mpd, name):
+    try:
+        await mpd.run(name)
+    except (OSError, mpdclient.ProtocolError, mpdclient.CommandError) as e:
+        logger.warning("mpd: %s failed: %s", name, e)
+
+
+def command(qtile, name):
+    asyncio.create_task(_run(client(), name))
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return ""
+
+
+class Mpd(marquee.Marquee, base._TextBox):
+    """Shows the current MPD song, updated from MPD's idle notifications"""
+
+    defaults = [
+        ("host", "localhost", "MPD host or socket path"),
+        ("port", 6600, "MPD port"),
+        ("password", None, "MPD password"),
+        ("status_format", "{title}", "Format while playing or paused"),
+        ("idle_message", "MPD IDLE", "Text while stopped"),
+        ("disconnected_message", "", "Text while MPD is unreachable"),
+        (
+            "mouse_buttons",
+            {1: "toggle", 3: "stop", 4: "previous", 5: "next"},
+            "Button number to MPD command",
+        ),
+    ]
+
+    def __init__(self, **config):
+        base._TextBox.__init__(self, "", **config)
+        self.add_defaults(Mpd.defaults)
+        self.client = client(self.host, self.port, self.password)
+
+    def _configure(self, qtile, bar):
+        base._TextBox._configure(self, qtile, bar)
+        self.client.subscribe(self.on_change)
+        self.client.start()
+        self.on_change(self.client)
+
+    def on_change(self, mpd):
+        if not mpd.connected:
+            text = self.disconnected_message
+        elif mpd.status.get("state", "stop") == "stop" or not mpd.song:
+            text = self.idle_message
+        else:
+            fields = _Fields((k.lower(), v) for k, v in mpd.song.items())
+            fields.update(mpd.status)
+            if not fields["title"]:
+                fields["title"] = os.path.basename(fields["file"])
+            text = self.status_format.format_map(fields)
+        self.update(text)
+
+    def button_press(self, x, y, button):
+        name = self.mouse_buttons.get(button)
+        if name is not None:
+            asyncio.create_task(_run(self.client, name))
+        base._TextBox.button_press(self, x, y, button)
+
+    def finalize(self):
+        self.client.unsubscribe(self.on_change)
+        if not self.client.listeners:
+            self.client.stop()
+        marquee.Marquee.finalize(self)
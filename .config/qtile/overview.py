@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Window overview ------------------------------
+#
+# `Overview.toggle` opens a popup showing every window of every group as a
+# thumbnail; clicking one switches to its group and focuses it, clicking
+# anywhere else closes it. Thumbnails are captured incrementally, never when
+# the overview opens: a window is captured when it loses focus, and again once
+# it has held the focus for `settle` seconds. The grab and the downscaling run
+# in the executor on a separate X connection, and the results are kept in an
+# LRU bounded by `budget` bytes. Windows without a thumbnail yet (or on
+# Wayland) are drawn as a placeholder with their title; visible ones are
+# queued for capture when the overview opens and appear as they arrive.
+
+import math
+import threading
+from collections import OrderedDict
+
+import cairocffi
+
+from libqtile import hook, pangocffi, qtile
+from libqtile.log_utils import logger
+from libqtile.popup import Popup
+
+try:
+    import xcffib
+    import xcffib.xproto
+except ImportError:
+    xcffib = None
+
+
+class Thumbnails:
+    def __init__(self, width=320, height=200, budget=32 * 2**20, settle=0.5):
+        self.width = width
+        self.height = height
+        self.budget = budget
+        self.settle = settle
+        self.surfaces = OrderedDict()
+        self.size = 0
+        self.pending = set()
+        self.listeners = []
+        self.focused = None
+        self.conn = None
+        self.lock = threading.Lock()
+        hook.subscribe.client_focus(self.on_focus)
+        hook.subscribe.client_killed(self.on_killed)
+
+    def get(self, wid):
+        surface = self.surfaces.get(wid)
+        if surface is not None:
+            self.surfaces.move_to_end(wid)
+        return surface
+
+    def capture(self, window):
+        if qtile.core.name != "x11" or xcffib is None or window.wid in self.pending:
+            return
+        self.pending.add(window.wid)
+        future = qtile.run_in_executor(self._grab, window.wid)
+        future.add_done_callback(lambda f: self._store(window.wid, f))
+
+    def _grab(self, wid):
+        # Executor thread: a connection of our own keeps qtile's untouched
+        with self.lock:
+            try:
+                if self.conn is None:
+                    self.conn = xcffib.connect()
+                core = self.conn.core
+                geom = core.GetGeometry(wid).reply()
+                image = core.GetImage(
+                    xcffib.xproto.ImageFormat.ZPixmap,
+                    wid,
+                    0,
+                    0,
+                    geom.width,
+                    geom.height,
+                    0xFFFFFFFF,
+                ).reply()
+            except xcffib.ConnectionException:
+                self.conn = None
+                return None
+            except xcffib.ProtocolException:
+                # unmapped or already destroyed
+                return None
+        fmt = cairocffi.FORMAT_ARGB32 if image.depth == 32 else cairocffi.FORMAT_RGB24
+        source = cairocffi.ImageSurface.create_for_data(
+            bytearray(image.data.buf()), fmt, geom.width, geom.height, geom.width * 4
+        )
+        scale = min(self.width / geom.width, self.height / geom.height, 1)
+        thumb = cairocffi.ImageSurface(
+            fmt, math.ceil(geom.width * scale), math.ceil(geom.height * scale)
+        )
+        ctx = cairocffi.Context(thumb)
+        ctx.scale(scale, scale)
+        ctx.set_source_surface(source)
+        ctx.get_source().set_filter(cairocffi.FILTER_GOOD)
+        ctx.paint()
+        return thumb
+
+    def _store(self, wid, future):
+        self.pending.discard(wid)
+        try:
+            thumb = future.result()
+        except Exception:
+            logger.exception("overview: capturing %s failed", wid)
+            return
+        if thumb is None or wid not in qtile.windows_map:
+            return
+        old = self.surfaces.pop(wid, None)
+        if old is not None:
+            self.size -= old.get_stride() * old.get_height()
+        self.surfaces[wid] = thumb
+        self.size += thumb.get_stride() * thumb.get_height()
+        while self.size > self.budget and len(self.surfaces) > 1:
+            _, old = self.surfaces.popitem(last=False)
+            self.size -= old.get_stride() * old.get_height()
+        for callback in list(self.listeners):
+            callback()
+
+    def on_focus(self, window):
+        previous, self.focused = self.focused, window
+        if previous is not None and previous is not window:
+            if previous.wid in qtile.windows_map:
+                self.capture(previous)
+        qtile.call_later(self.settle, self._settled, window)
+
+    def _settled(self, window):
+        if self.focused is window and window.wid in qtile.windows_map:
+            self.capture(window)
+
+    def on_killed(self, window):
+        if self.focused is window:
+            self.focused = None
+        old = self.surfaces.pop(window.wid, None)
+        if old is not None:
+            self.size -= old.get_stride() * old.get_height()
+
+
+class Overview:
+    def __init__(
+        self,
+        margin=60,
+        gap=20,
+        caption=24,
+        exclude=("SPD",),
+        placeholder="#ffffff20",
+        highlight="#ff5555",
+        thumbnails=None,
+        **config
+    ):
+        self.margin = margin
+        self.gap = gap
+        self.caption = caption
+        self.exclude = exclude
+        self.placeholder = placeholder
+        self.highlight = highlight
+        self.thumbnails = thumbnails or Thumbnails()
+        self.config = dict(text_alignment="center", wrap=False)
+        self.config.update(config)
+        self.popup = None
+        self.windows = []
+        self.cells = []
+
+    def toggle(self, qtile):
+        if self.popup is None:
+            self.open(qtile)
+        else:
+            self.close()
+
+    def _grid(self, count, width, height):
+        # Column count that gives the largest 16:10 thumbnails
+        best = None
+        for cols in range(1, count + 1):
+            rows = math.ceil(count / cols)
+            cw = (width - self.gap * (cols + 1)) / cols
+            ch = (height - self.gap * (rows + 1)) / rows
+            fit = min(cw, (ch - self.caption) * 1.6)
+            if best is None or fit > best[0]:
+                best = (fit, cols, rows, cw, ch)
+        _, cols, rows, cw, ch = best
+        return [
+            (
+                self.gap + (i % cols) * (cw + self.gap),
+                self.gap + (i // cols) * (ch + self.gap),
+                cw,
+                ch,
+            )
+            for i in range(count)
+        ]
+
+    def open(self, qtile):
+        self.windows = [
+            w for g in qtile.groups if g.name not in self.exclude for w in g.windows
+        ]
+        if not self.windows:
+            return
+        screen = qtile.current_screen
+        width = screen.width - 2 * self.margin
+        height = screen.height - 2 * self.margin
+        self.popup = Popup(
+            qtile,
+            screen.x + self.margin,
+            screen.y + self.margin,
+            width,
+            height,
+            **self.config
+        )
+        self.popup.win.process_button_click = self.on_click
+        self.cells = self._grid(len(self.windows), width, height)
+        for w in self.windows:
+            if w.group.screen and (
+                w is qtile.current_window or self.thumbnails.get(w.wid) is None
+            ):
+                self.thumbnails.capture(w)
+        self.thumbnails.listeners.append(self.draw)
+        self.popup.place()
+        self.popup.unhide()
+        self.draw()
+
+    def close(self):
+        if self.draw in self.thumbnails.listeners:
+            self.thumbnails.listeners.remove(self.draw)
+        if self.popup is not None:
+            self.popup.kill()
+            self.popup = None
+
+    def draw(self):
+        if self.popup is None:
+            return
+        self.popup.clear()
+        drawer = self.popup.drawer
+        ctx = drawer.ctx
+        for (x, y, w, h), window in zip(self.cells, self.windows):
+            area = h - self.caption
+            thumb = self.thumbnails.get(window.wid)
+            if thumb is None:
+                drawer.set_source_rgb(self.placeholder)
+                ctx.rectangle(x, y, w, area)
+                ctx.fill()
+            else:
+                scale = min(w / thumb.get_width(), area / thumb.get_height())
+                ctx.save()
+                ctx.translate(
+                    x + (w - thumb.get_width() * scale) / 2,
+                    y + (area - thumb.get_height() * scale) / 2,
+                )
+                ctx.scale(scale, scale)
+                ctx.set_source_surface(thumb)
+                ctx.paint()
+                ctx.restore()
+            if window is qtile.current_window:
+                drawer.set_source_rgb(self.highlight)
+                ctx.set_line_width(2)
+                ctx.rectangle(x - 1, y - 1, w + 2, area + 2)
+                ctx.stroke()
+            self.popup.layout.width = w
+            self.popup.text = pangocffi.markup_escape_text(
+                "{}  {}".format(window.group.label or window.group.name, window.name)
+            )
+            self.popup.draw_text(x, y + area + 4)
+        self.popup.draw()
+
+    def on_click(self, x, y, button):
+        target = None
+        for (cx, cy, w, h), window in zip(self.cells, self.windows):
+            if cx <= x <= cx + w and cy <= y <= cy + h:
+                target = window
+                break
+        self.close()
+        if target is None or target.wid not in qtile.windows_map:
+            return
+        qtile.current_screen.set_group(target.group)
+        target.group.focus(target, False)
+        if target.floating:
+            target.cmd_bring_to_front()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Shared battery model ------------------------------
+#
+# widget.BatteryIcon and widget.Battery each poll the same power_supply files
+# on their own timer. Here one Model per battery reads the status, and both
+# widgets subscribe to it. The model refreshes when UPower reports a property
+# change on its display device (if UPower is on the system bus) and otherwise
+# on one shared slow poll. Subscribers are only called when the (icon, percent,
+# state) bucket changes, and BatteryIcon keeps its preloaded surfaces, so
+# nothing redraws in between.
+
+import asyncio
+
+from libqtile import qtile, widget
+from libqtile.log_utils import logger
+from libqtile.utils import add_signal_receiver
+from libqtile.widget.battery import load_battery
+
+UPOWER = "org.freedesktop.UPower"
+DISPLAY_DEVICE = "/org/freedesktop/UPower/devices/DisplayDevice"
+
+_models = {}
+
+
+class Model:
+    def __init__(self, battery=0, poll_interval=60, evented_interval=600):
+        self.battery = load_battery(battery=battery)
+        self.poll_interval = poll_interval
+        self.evented_interval = evented_interval
+        self.evented = False
+        self.status = None
+        self.bucket = None
+        self.listeners = []
+        self.started = False
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+        if not self.started:
+            self.start()
+        elif self.status is not None:
+            callback(self.status)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def start(self):
+        self.started = True
+        self.refresh()
+        asyncio.create_task(self._watch_upower())
+        qtile.call_later(self.poll_interval, self._poll)
+
+    async def _watch_upower(self):
+        self.evented = await add_signal_receiver(
+            self._on_signal,
+            session_bus=False,
+            signal_name="PropertiesChanged",
+            dbus_interface="org.freedesktop.DBus.Properties",
+            bus_name=UPOWER,
+            path=DISPLAY_DEVICE,
+            check_service=True,
+        )
+
+    def _alive(self):
+        return any(m is self for m in _models.values())
+
+    def _on_signal(self, message):
+        if self._alive():
+            self.refresh()
+
+    def _poll(self):
+        if not self._alive():
+            return
+        self.refresh()
+        interval = self.evented_interval if self.evented else self.poll_interval
+        qtile.call_later(interval, self._poll)
+
+    def refresh(self):
+        try:
+            status = self.battery.update_status()
+        except RuntimeError:
+            logger.exception("power: could not read the battery")
+            return
+        bucket = (
+            widget.BatteryIcon._get_icon_key(status),
+            round(status.percent * 100),
+            status.state,
+        )
+        if bucket == self.bucket:
+            return
+        self.bucket = bucket
+        self.status = status
+        for callback in list(self.listeners):
+            callback(status)
+
+
+def model(battery=0):
+    if battery not in _models:
+        _models[battery] = Model(battery)
+    return _models[battery]
+
+
+class _Cached:
+    # Stands in for the widget's own _Battery so poll() reuses the model status
+    def __init__(self, model):
+        self.model = model
+
+    def update_status(self):
+        return self.model.status
+
+
+class BatteryIcon(widget.BatteryIcon):
+    def timer_setup(self):
+        self.model = model(self.battery)
+        self.model.subscribe(self.on_status)
+
+    def on_status(self, status):
+        icon = self._get_icon_key(status)
+        if icon != self.current_icon:
+            self.current_icon = icon
+            self.draw()
+
+    def finalize(self):
+        if hasattr(self, "model"):
+            self.model.unsubscribe(self.on_status)
+        widget.BatteryIcon.finalize(self)
+
+
+class Battery(widget.Battery):
+    def timer_setup(self):
+        self.model = model(self.battery)
+        self._battery = _Cached(self.model)
+        self.model.subscribe(self.on_status)
+
+    def on_status(self, status):
+        self.update(self.poll())
+
+    def finalize(self):
+        if hasattr(self, "model"):
+            self.model.unsubscribe(self.on_status)
+        widget.Battery.finalize(self)
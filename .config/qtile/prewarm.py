@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Prewarmed ScratchPad dropdowns ------------------------------
+#
+# ScratchPad only spawns a DropDown's command on the first toggle, so the first
+# press waits for a terminal cold start. Prewarm spawns the dropdowns hidden a
+# little after startup, respawns them (hidden) when they die and kills the ones
+# that have not been toggled for `idle_timeout` seconds to give the memory back.
+# An unloaded dropdown is spawned again the ordinary way on its next toggle.
+# reload_config makes a new Prewarm: it takes over the idle times of the old
+# one and stops its idle check.
+
+import time
+
+from libqtile import hook, qtile
+
+
+class Prewarm:
+    def __init__(
+        self,
+        group,
+        names,
+        delay=10,
+        stagger=2,
+        respawn_delay=3,
+        idle_timeout=30 * 60,
+        check_interval=60,
+    ):
+        self.group_name = group
+        self.names = list(names)
+        self.delay = delay
+        self.stagger = stagger
+        self.respawn_delay = respawn_delay
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.last_used = {}
+        self.unloaded = set()
+        self.started = False
+        self.alive = True
+
+    @property
+    def group(self):
+        return qtile.groups_map.get(self.group_name)
+
+    def start(self, previous=None):
+        if self.started:
+            return
+        self.started = True
+        if previous is not None:
+            self.last_used.update(previous.last_used)
+            self.unloaded.update(previous.unloaded)
+            previous.stop()
+        hook.subscribe.client_killed(self.on_client_killed)
+        now = time.monotonic()
+        for i, name in enumerate(self.names):
+            self.last_used.setdefault(name, now)
+            qtile.call_later(self.delay + i * self.stagger, self.spawn_hidden, name)
+        if self.idle_timeout:
+            qtile.call_later(self.check_interval, self.check_idle)
+
+    def stop(self):
+        # the next check_idle returns without rescheduling itself
+        self.alive = False
+
+    def spawn_hidden(self, name):
+        group = self.group
+        if group is None or name in self.unloaded:
+            return
+        if name in group.dropdowns or name in group._spawned:
+            return
+        if name not in group._to_hide:
+            group._to_hide.append(name)
+        group._spawn(group._dropdownconfig[name])
+
+    def toggle(self, qtile, name):
+        group = self.group
+        self.last_used[name] = time.monotonic()
+        self.unloaded.discard(name)
+        # Toggled while the prewarm spawn is still starting up: show it instead.
+        if name in group._spawned and name in group._to_hide:
+            group._to_hide.remove(name)
+            return
+        group.cmd_dropdown_toggle(name)
+
+    def on_client_killed(self, client):
+        group = self.group
+        if group is None:
+            return
+        for name, dd in group.dropdowns.items():
+            if dd.window is client and name in self.names:
+                if name not in self.unloaded:
+                    qtile.call_later(self.respawn_delay, self.spawn_hidden, name)
+                break
+
+    def check_idle(self):
+        if not self.alive:
+            return
+        group = self.group
+        now = time.monotonic()
+        for name in self.names:
+            dd = group.dropdowns.get(name) if group is not None else None
+            if dd is None or dd.visible:
+                continue
+            if now - self.last_used.get(name, now) >= self.idle_timeout:
+                self.unloaded.add(name)
+                dd.window.kill()
+        qtile.call_later(self.check_interval, self.check_idle)
+
+    def info(self):
+        group = self.group
+        now = time.monotonic()
+        return {
+            name: {
+                "loaded": group is not None and name in group.dropdowns,
+                "unloaded": name in self.unloaded,
+                "idle": round(now - self.last_used.get(name, now), 1),
+            }
+            for name in self.names
+        }
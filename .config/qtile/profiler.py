@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Callback profiler ------------------------------
+#
+# Opt-in (`profile_callbacks` in config.py). `wrap_config()` wraps every hook
+# subscriber, `lazy.function` and Python bar mouse callback that comes from the
+# config folder, measuring wall and CPU time per call and logging any call
+# that holds the event loop longer than `threshold` seconds. With `trace`
+# enabled the wrapped calls also run under a profile hook that collects
+# self-time per call stack, and `dump()` writes them in the collapsed format
+# read by flamegraph.pl / speedscope / inferno, plus a per-callback summary.
+# A wrapped hook subscriber compares equal to the original, so unsubscribing
+# and identity checks against the original keep working.
+
+import asyncio
+import copy
+import json
+import os
+import sys
+import time
+
+from libqtile import hook
+from libqtile.config import Key
+from libqtile.log_utils import logger
+
+here = os.path.dirname(os.path.abspath(__file__))
+threshold = 0.05
+trace = True
+dump_path = os.path.expanduser("~/.cache/qtile/callbacks.folded")
+
+stats = {}
+folded = {}
+
+
+class _Tracer:
+    def __init__(self, root):
+        self.stack = [root]
+        self.last = time.perf_counter()
+
+    def _account(self):
+        now = time.perf_counter()
+        path = ";".join(self.stack)
+        folded[path] = folded.get(path, 0) + now - self.last
+        self.last = now
+
+    def __call__(self, frame, event, arg):
+        if event == "call":
+            self._account()
+            code = frame.f_code
+            self.stack.append(
+                "{}:{}".format(os.path.basename(code.co_filename), code.co_name)
+            )
+        elif event == "c_call":
+            self._account()
+            self.stack.append(getattr(arg, "__qualname__", repr(arg)))
+        elif event in ("return", "c_return", "c_exception") and len(self.stack) > 1:
+            self._account()
+            self.stack.pop()
+
+
+class _Profiled:
+    # compares and hashes as the callable it wraps, so hook.unsubscribe and
+    # `in` checks on hook.subscriptions still find the original
+    def __init__(self, func, name):
+        self.func = func
+        self.name = name
+        self.__name__ = getattr(func, "__name__", name)
+        self.__wrapped__ = func
+
+    def __eq__(self, other):
+        if isinstance(other, _Profiled):
+            other = other.func
+        return self.func == other
+
+    def __hash__(self):
+        return hash(self.func)
+
+    def __call__(self, *args, **kwargs):
+        name = self.name
+        tracer = None
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if trace and sys.getprofile() is None:
+            tracer = _Tracer(name)
+            sys.setprofile(tracer)
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            if tracer is not None:
+                sys.setprofile(None)
+                tracer._account()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            entry = stats.setdefault(
+                name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "max": 0.0, "slow": 0}
+            )
+            entry["calls"] += 1
+            entry["wall"] += wall
+            entry["cpu"] += cpu
+            entry["max"] = max(entry["max"], wall)
+            if wall > threshold:
+                entry["slow"] += 1
+                logger.warning(
+                    "%s blocked the event loop for %.0fms (cpu %.0fms)",
+                    name,
+                    wall * 1000,
+                    cpu * 1000,
+                )
+
+
+def wrap(func, name):
+    if isinstance(func, _Profiled) or asyncio.iscoroutinefunction(func):
+        # hook.fire awaits coroutine functions only when it can tell them apart
+        return func
+    return _Profiled(func, name)
+
+
+def _from_config(func):
+    code = getattr(getattr(func, "__func__", func), "__code__", None)
+    return code is not None and os.path.dirname(code.co_filename) == here
+
+
+def _callname(func):
+    return getattr(func, "__qualname__", None) or repr(func)
+
+
+def wrap_config(keys, mouse, screens):
+    for event, subscribers in hook.subscriptions.items():
+        for i, func in enumerate(subscribers):
+            if _from_config(func):
+                subscribers[i] = wrap(func, "hook:{}:{}".format(event, _callname(func)))
+    for binding in list(keys) + list(mouse):
+        commands = []
+        for call in getattr(binding, "commands", ()):
+            if call.name == "function" and _from_config(call.args[0]):
+                chord = "+".join(
+                    list(binding.modifiers)
+                    + [binding.key if isinstance(binding, Key) else binding.button]
+                )
+                func = call.args[0]
+                # a copy: the call may be shared with bindings kept by generation.py
+                call = copy.copy(call)
+                call._args = (
+                    wrap(func, "bind:{}:{}".format(chord, _callname(func))),
+                ) + call.args[1:]
+            commands.append(call)
+        if commands:
+            binding.commands = tuple(commands)
+    for screen in screens:
+        for gap in (screen.top, screen.bottom, screen.left, screen.right):
+            for w in getattr(gap, "widgets", []):
+                for button, cb in w.mouse_callbacks.items():
+                    if callable(cb) and not hasattr(cb, "selectors"):
+                        w.mouse_callbacks[button] = wrap(
+                            cb, "widget:{}:{}".format(w.name, button)
+                        )
+
+
+def summary():
+    return {
+        name: {
+            "calls": s["calls"],
+            "wall_ms": round(s["wall"] * 1000, 1),
+            "cpu_ms": round(s["cpu"] * 1000, 1),
+            "max_ms": round(s["max"] * 1000, 1),
+            "slow": s["slow"],
+        }
+        for name, s in sorted(stats.items(), key=lambda i: -i[1]["wall"])
+    }
+
+
+def dump(qtile=None, path=None):
+    path = path or dump_path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        for stack, seconds in sorted(folded.items()):
+            micro = int(seconds * 1e6)
+            if micro:
+                f.write("{} {}\n".format(stack, micro))
+    with open(os.path.splitext(path)[0] + ".json", "w") as f:
+        json.dump(summary(), f, indent=2)
+    return path
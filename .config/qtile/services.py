@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Autostart supervisor ------------------------------
+#
+# Replaces autostart.sh. Each Service names its command, the services it has
+# to wait for (`after`) and how to tell it is up: a socket accepting
+# connections, a D-Bus name with an owner, a command exiting 0, or nothing
+# (up once spawned). Services whose dependencies are up start in parallel.
+# Daemons that exit are restarted with exponential backoff. Programs that
+# fork into the background or just do one thing and exit are `oneshot`: they
+# are up once they exit 0 and are never restarted. A service whose readiness
+# check already passes (mpd run by systemd, say) is left alone.
+#
+# Startup times go to the startup timeline (see timeline.py), and the
+# current state is served by:
+#
+#   qtile cmd-obj -o cmd -f eval -a "__import__('services').report()"
+
+import asyncio
+import time
+
+from libqtile.log_utils import logger
+
+import timeline
+
+try:
+    from dbus_next import Message
+    from dbus_next.aio import MessageBus
+    from dbus_next.constants import MessageType
+
+    has_dbus = True
+except ImportError:
+    has_dbus = False
+
+
+class Listening:
+    def __init__(self, address):
+        self.address = address
+
+    async def check(self):
+        if isinstance(self.address, str):
+            connect = asyncio.open_unix_connection(self.address)
+        else:
+            connect = asyncio.open_connection(*self.address)
+        try:
+            _, writer = await asyncio.wait_for(connect, 1)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    def close(self):
+        pass
+
+
+class BusName:
+    def __init__(self, name):
+        self.name = name
+        self.bus = None
+
+    async def check(self):
+        if not has_dbus:
+            return True
+        if self.bus is None:
+            self.bus = await MessageBus().connect()
+        reply = await self.bus.call(
+            Message(
+                destination="org.freedesktop.DBus",
+                path="/org/freedesktop/DBus",
+                interface="org.freedesktop.DBus",
+                member="NameHasOwner",
+                signature="s",
+                body=[self.name],
+            )
+        )
+        return reply.message_type == MessageType.METHOD_RETURN and reply.body[0]
+
+    def close(self):
+        if self.bus is not None:
+            self.bus.disconnect()
+            self.bus = None
+
+
+class Succeeds:
+    def __init__(self, *argv):
+        self.argv = argv
+
+    async def check(self):
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self.argv,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except OSError:
+            return False
+        return await proc.wait() == 0
+
+    def close(self):
+        pass
+
+
+class Service:
+    def __init__(
+        self,
+        name,
+        argv,
+        after=(),
+        ready=None,
+        oneshot=False,
+        timeout=10,
+        max_restarts=5,
+    ):
+        self.name = name
+        self.argv = argv
+        self.after = after
+        self.ready = ready
+        self.oneshot = oneshot
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.up = asyncio.Event()
+        self.proc = None
+        self.state = "waiting"
+        self.started = None
+        self.startup = None
+        self.restarts = 0
+
+    async def _spawn(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.argv,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.started = time.monotonic()
+        self.state = "starting"
+
+    async def _wait_ready(self):
+        # True once up, False if it exited or timed out first
+        if self.oneshot:
+            try:
+                code = await asyncio.wait_for(self.proc.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                return False
+            return code == 0
+        if self.ready is None:
+            return True
+        deadline = self.started + self.timeout
+        while time.monotonic() < deadline and self.proc.returncode is None:
+            try:
+                if await self.ready.check():
+                    return True
+            except Exception:
+                logger.exception("services: %s readiness check failed", self.name)
+                return False
+            await asyncio.sleep(0.05)
+        return False
+
+
+class Supervisor:
+    def __init__(self, services):
+        self.services = {s.name: s for s in services}
+        self.stopping = False
+        self.tasks = []
+
+    def start(self):
+        for service in self.services.values():
+            timeline.timeline.expect(service.name)
+            self.tasks.append(asyncio.create_task(self._run(service)))
+
+    def stop(self):
+        self.stopping = True
+
+    def _up(self, service, state):
+        service.state = state
+        if service.up.is_set():
+            return
+        if service.started is not None:
+            service.startup = (time.monotonic() - service.started) * 1e3
+        timeline.timeline.done(
+            service.name, "{} {}".format(service.name, state), took=service.startup
+        )
+        service.up.set()
+
+    async def _running(self, service):
+        if service.ready is None or service.oneshot:
+            return False
+        try:
+            return await service.ready.check()
+        except Exception:
+            return False
+
+    async def _run(self, service):
+        for name in service.after:
+            await self.services[name].up.wait()
+        try:
+            if await self._running(service):
+                service.started = time.monotonic()
+                self._up(service, "already running")
+                return
+            delay = 1
+            while not self.stopping:
+                await service._spawn()
+                if await service._wait_ready():
+                    self._up(service, "done" if service.oneshot else "up")
+                else:
+                    logger.warning("services: %s did not come up", service.name)
+                    self._up(service, "not ready")
+                if service.oneshot:
+                    return
+                await service.proc.wait()
+                if self.stopping:
+                    return
+                if time.monotonic() - service.started > 60:
+                    delay = 1
+                    service.restarts = 0
+                service.restarts += 1
+                if service.restarts > service.max_restarts:
+                    service.state = "failed"
+                    logger.warning(
+                        "services: %s keeps exiting, giving up", service.name
+                    )
+                    return
+                service.state = "restarting"
+                logger.warning(
+                    "services: %s exited with %s, restarting in %ss",
+                    service.name,
+                    service.proc.returncode,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+        except OSError as e:
+            logger.warning("services: cannot start %s: %s", service.name, e)
+            self._up(service, "failed")
+        finally:
+            if service.ready is not None:
+                service.ready.close()
+
+    def report(self):
+        lines = [
+            "{:<24} {:<16} {:>8} {:>10} {:>9}".format(
+                "service", "state", "pid", "startup ms", "restarts"
+            )
+        ]
+        for s in self.services.values():
+            lines.append(
+                "{:<24} {:<16} {:>8} {:>10} {:>9}".format(
+                    s.name,
+                    s.state,
+                    s.proc.pid if s.proc else "",
+                    "" if s.startup is None else "{:.0f}".format(s.startup),
+                    s.restarts,
+                )
+            )
+        return "\n".join(lines)
+
+
+# importlib.reload keeps the module namespace, so the supervisor started at
+# login stays reachable after reload_config
+if "supervisor" not in globals():
+    supervisor = None
+
+
+def start(services):
+    global supervisor
+    supervisor = Supervisor(services)
+    supervisor.start()
+
+
+def stop():
+    # subscribed to shutdown by config.py on every load, reload_config clears
+    # the hooks but keeps the supervisor
+    if supervisor is not None:
+        supervisor.stop()
+
+
+def report():
+    return supervisor.report() if supervisor else "no services started"
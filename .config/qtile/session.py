@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Session snapshot ------------------------------
+#
+# Restarts and reloads rebuild every group with fresh layouts: the layout each
+# group was using, the Bsp split ratios set with resize(), the Columns widths
+# and heights and (after logging in again) the group each window lived on are
+# all lost. Session keeps a JSON snapshot of that state in
+# ~/.cache/qtile/session.json. It is written in the executor a couple of
+# seconds after the window or layout hooks fire, and re-checked every `poll`
+# seconds for the resizes that fire no hook; identical snapshots are not
+# written again. At startup the snapshot is matched against the windows qtile
+# manages: by window id (restart and reload), then by pid and class, then by
+# class and command line (a new login). Matched windows are moved back to
+# their group, the split trees and columns are rebuilt in place and each
+# visible group is laid out once. The Session restored last is the live one,
+# the poll of the one it replaced stops.
+
+import json
+import os
+
+from libqtile import hook, qtile
+from libqtile.layout import Bsp, Columns
+from libqtile.log_utils import logger
+from libqtile.scratchpad import ScratchPad
+
+snapshot_path = os.path.expanduser("~/.cache/qtile/session.json")
+
+# importlib.reload keeps the namespace: the Session that is polling
+if "live" not in globals():
+    live = None
+
+
+def _cmdline(pid):
+    try:
+        with open("/proc/{}/cmdline".format(pid), "rb") as f:
+            return f.read().rstrip(b"\0").decode(errors="replace").split("\0")
+    except OSError:
+        return None
+
+
+def _write(data):
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp = snapshot_path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, snapshot_path)
+
+
+def _read():
+    try:
+        with open(snapshot_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _skip_layout(warp=False):
+    pass
+
+
+def _rebalance(values, total):
+    # the layouts expect widths and heights averaging 100, as after a grow
+    values = [max(1, int(v * total / sum(values))) for v in values]
+    values[0] += total - sum(values)
+    return values
+
+
+class Session:
+    def __init__(self, debounce=2, poll=10):
+        self.debounce = debounce
+        self.poll = poll
+        self.identities = {}
+        self.timer = None
+        self.last = None
+        self.restored = False
+        self.alive = True
+        for name in (
+            "client_managed",
+            "client_killed",
+            "group_window_add",
+            "layout_change",
+            "setgroup",
+        ):
+            getattr(hook.subscribe, name)(self.changed)
+        hook.subscribe.client_killed(self.on_killed)
+        hook.subscribe.startup(self.restore)
+        hook.subscribe.restart(self.save_now)
+        hook.subscribe.shutdown(self.save_now)
+
+    def _groups(self):
+        # dropdowns are placed by their ScratchPad
+        return [g for g in qtile.groups if not isinstance(g, ScratchPad)]
+
+    # saving
+
+    def _identity(self, window):
+        found = self.identities.get(window.wid)
+        if found is None:
+            try:
+                pid = window.get_pid()
+            except Exception:
+                pid = None
+            found = self.identities[window.wid] = {
+                "wid": window.wid,
+                "pid": pid,
+                "class": (window.get_wm_class() or [None])[0],
+                "cmd": _cmdline(pid) if pid else None,
+            }
+        return found
+
+    def _bsp(self, node, index):
+        if node.client is not None:
+            return {"win": index[node.client]}
+        if not node.children:
+            return None
+        return {
+            "split": node.split_horizontal,
+            "ratio": node.split_ratio,
+            "children": [self._bsp(child, index) for child in node.children],
+        }
+
+    def _columns(self, layout, index):
+        return {
+            "current": layout.current,
+            "columns": [
+                {
+                    "width": col.width,
+                    "split": col.split,
+                    "windows": [index[c] for c in col.clients],
+                    "heights": [col.heights[c] for c in col.clients],
+                }
+                for col in layout.columns
+            ],
+        }
+
+    def capture(self):
+        windows = []
+        index = {}
+        groups = {}
+        for group in self._groups():
+            for window in group.windows:
+                index[window] = len(windows)
+                windows.append(self._identity(window))
+            state = {
+                "layout": group.layout.name,
+                "windows": [index[w] for w in group.windows],
+            }
+            for layout in group.layouts:
+                if isinstance(layout, Bsp):
+                    state[layout.name] = {"bsp": self._bsp(layout.root, index)}
+                elif isinstance(layout, Columns):
+                    state[layout.name] = self._columns(layout, index)
+            groups[group.name] = state
+        return {"version": 1, "windows": windows, "groups": groups}
+
+    def changed(self, *args):
+        if self.timer is None and self.restored:
+            self.timer = qtile.call_later(self.debounce, self.save)
+
+    def save(self):
+        self.timer = None
+        data = json.dumps(self.capture(), separators=(",", ":"))
+        if data == self.last:
+            return
+        self.last = data
+        future = qtile.run_in_executor(_write, data)
+        future.add_done_callback(self._written)
+
+    def _written(self, future):
+        if future.exception() is not None:
+            logger.warning("session: cannot save: %s", future.exception())
+            self.last = None
+
+    def save_now(self):
+        # the loop is going away, so no executor and no timers
+        if not self.restored:
+            return
+        try:
+            _write(json.dumps(self.capture(), separators=(",", ":")))
+        except OSError as e:
+            logger.warning("session: cannot save: %s", e)
+
+    def _tick(self):
+        if not self.alive:
+            return
+        self.save()
+        qtile.call_later(self.poll, self._tick)
+
+    def on_killed(self, window):
+        self.identities.pop(window.wid, None)
+
+    # restoring
+
+    def restore(self):
+        global live
+        if live is not None and live is not self:
+            # made by an earlier config load, this one takes over
+            live.alive = False
+        live = self
+        future = qtile.run_in_executor(_read)
+        future.add_done_callback(self._restore)
+
+    def _restore(self, future):
+        try:
+            saved = future.result()
+            if saved and saved.get("version") == 1:
+                self.apply(saved)
+        except Exception:
+            logger.exception("session: cannot restore")
+        finally:
+            self.restored = True
+            self.last = None
+            qtile.call_later(self.poll, self._tick)
+
+    def _match(self, saved):
+        live = [w for g in self._groups() for w in g.windows]
+        matched = {}
+        for key in (("wid", "class"), ("pid", "class"), ("class", "cmd")):
+            ids = {}
+            for window in live:
+                ident = self._identity(window)
+                if None not in (ident[k] for k in key):
+                    ids.setdefault(tuple(str(ident[k]) for k in key), []).append(window)
+            for i, ident in enumerate(saved):
+                if i in matched or None in (ident.get(k) for k in key):
+                    continue
+                candidates = ids.get(tuple(str(ident[k]) for k in key))
+                if candidates:
+                    window = candidates.pop(0)
+                    matched[i] = window
+                    live.remove(window)
+            if not live:
+                break
+        return matched
+
+    def _move(self, moves):
+        # togroup lays out the group it leaves and the one it joins: hold those
+        # passes back until every window is in place
+        touched = {w.group for w, _ in moves} | {g for _, g in moves}
+        for group in touched:
+            group.layout_all = _skip_layout
+        try:
+            for window, group in moves:
+                window.togroup(group.name)
+        finally:
+            for group in touched:
+                del group.layout_all
+        return touched
+
+    def apply(self, saved):
+        matched = self._match(saved["windows"])
+        moves = []
+        for name, state in saved["groups"].items():
+            if name not in qtile.groups_map:
+                continue
+            for i in state["windows"]:
+                window = matched.get(i)
+                if window is not None and window.group.name != name:
+                    moves.append((window, qtile.groups_map[name]))
+        unlaid = self._move(moves)
+        for group in self._groups():
+            state = saved["groups"].get(group.name)
+            if state is None:
+                continue
+            tiled = [w for w in group.windows if w in group.tiled_windows]
+            for layout in group.layouts:
+                data = state.get(layout.name)
+                if isinstance(layout, Bsp) and data:
+                    self._restore_bsp(layout, data["bsp"], matched, tiled)
+                elif isinstance(layout, Columns) and data:
+                    self._restore_columns(layout, data, matched, tiled)
+            old = group.layout
+            names = [layout.name for layout in group.layouts]
+            if state["layout"] in names:
+                group.current_layout = names.index(state["layout"])
+            if group.layout is not old:
+                hook.fire("layout_change", group.layout, group)
+            if group.screen:
+                # the one layout pass this group gets
+                if group.layout is not old:
+                    old.hide()
+                group.layout_all()
+                unlaid.discard(group)
+                if group.layout is not old:
+                    group.layout.show(group.screen.get_rect())
+        for group in unlaid:
+            if group.screen:
+                group.layout_all()
+
+    def _bsp_node(self, cls, data, clients, parent):
+        if data is None:
+            return None
+        node = cls(parent)
+        if "win" in data:
+            node.client = clients.pop(data["win"], None)
+            return node if node.client is not None else None
+        children = [self._bsp_node(cls, d, clients, node) for d in data["children"]]
+        children = [c for c in children if c is not None]
+        if len(children) < 2:
+            # a side whose windows are gone collapses into the other one
+            if children:
+                children[0].parent = parent
+                return children[0]
+            return None
+        node.children = children
+        node.split_horizontal = data["split"]
+        node.split_ratio = data["ratio"]
+        return node
+
+    def _restore_bsp(self, layout, data, matched, tiled):
+        clients = {i: w for i, w in matched.items() if w in tiled}
+        if not clients:
+            return
+        cls = type(layout.root)
+        layout.root = self._bsp_node(cls, data, clients, None) or cls()
+        placed = set(layout.root.clients())
+        layout.current = layout.root
+        for node in layout.root:
+            if node.client is not None:
+                layout.current = node
+                break
+        for window in tiled:
+            if window not in placed:
+                layout.add(window)
+        current = layout.group.current_window
+        if current in tiled:
+            layout.focus(current)
+
+    def _restore_columns(self, layout, data, matched, tiled):
+        if not any(w in tiled for w in matched.values()):
+            return
+        layout.columns = []
+        layout.current = 0
+        placed = set()
+        for saved in data["columns"]:
+            rows = [
+                (matched[i], h)
+                for i, h in zip(saved["windows"], saved["heights"])
+                if matched.get(i) in tiled and matched[i] not in placed
+            ]
+            if not rows:
+                continue
+            col = layout.add_column()
+            col.width = saved["width"]
+            col.split = saved["split"]
+            heights = _rebalance([h for _, h in rows], 100 * len(rows))
+            for (window, _), height in zip(rows, heights):
+                col.append(window)
+                col.heights[window] = height
+                placed.add(window)
+        if layout.columns:
+            widths = _rebalance(
+                [c.width for c in layout.columns], 100 * len(layout.columns)
+            )
+            for col, width in zip(layout.columns, widths):
+                col.width = width
+            layout.current = min(data["current"], len(layout.columns) - 1)
+        else:
+            layout.add_column()
+        for window in tiled:
+            if window not in placed:
+                layout.add(window)
+        current = layout.group.current_window
+        if current in tiled:
+            layout.focus(current)
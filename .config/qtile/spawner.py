@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Launcher ------------------------------
+#
+# `qtile.cmd_spawn("kitty -e ranger")` shlex-splits the string and looks the
+# binary up in PATH on every call, and each terminal cold starts. Commands
+# prepared through a Launcher are split and resolved once at config load,
+# terminals with a single-instance mode reuse their running process, and the
+# time from spawn to the first window being mapped is recorded per app.
+
+import os
+import shlex
+import shutil
+import time
+from collections import deque
+
+from libqtile import hook, qtile
+from libqtile.lazy import lazy
+
+# Flags that make a terminal open new windows from an already running instance
+single_instance_flags = {
+    "kitty": ["--single-instance"],
+}
+
+
+class Command:
+    def __init__(self, launcher, line, name=None):
+        self.launcher = launcher
+        self.line = line
+        argv = shlex.split(line)
+        self.binary = argv[0]
+        self.name = name or (
+            self.binary if len(argv) < 3 or argv[1] != "-e" else argv[2]
+        )
+        extra = launcher.single_instance.get(os.path.basename(self.binary), [])
+        self.argv = [self.binary] + extra + argv[1:]
+        self.resolve()
+
+    def resolve(self):
+        path = shutil.which(self.binary)
+        if path is not None:
+            self.argv[0] = path
+        return path is not None
+
+    def spawn(self):
+        if not os.path.isabs(self.argv[0]) and not self.resolve():
+            return -1
+        return self.launcher.spawn(self)
+
+    # Used as a bar widget mouse callback
+    def __call__(self):
+        return self.spawn()
+
+    def _lazy(self, qtile):
+        self.spawn()
+
+    @property
+    def lazy(self):
+        return lazy.function(self._lazy)
+
+
+def by_line(func):
+    # Marks func(qtile, line), which spawns Launcher.cmd(line), for latency.py
+    # to time like a Command
+    func.spawns_line = True
+    return func
+
+
+class Launcher:
+    def __init__(self, single_instance=None, timeout=30, samples=50):
+        self.single_instance = (
+            single_instance_flags if single_instance is None else single_instance
+        )
+        self.timeout = timeout
+        self.samples = samples
+        self.commands = {}
+        self.pending = {}
+        self.latency = {}
+        hook.subscribe.client_new(self.on_client_new)
+
+    def cmd(self, line, name=None):
+        if line not in self.commands:
+            self.commands[line] = Command(self, line, name)
+        return self.commands[line]
+
+    def spawn(self, command):
+        pid = qtile.cmd_spawn(command.argv)
+        if pid > 0:
+            self.pending[pid] = (command, time.monotonic())
+        return pid
+
+    def record(self, command, started):
+        elapsed = time.monotonic() - started
+        history = self.latency.setdefault(command.name, deque(maxlen=self.samples))
+        history.append(elapsed)
+
+    def on_client_new(self, client):
+        if not self.pending:
+            return
+        now = time.monotonic()
+        for pid, (_, started) in list(self.pending.items()):
+            if now - started > self.timeout:
+                del self.pending[pid]
+        match = self.pending.pop(client.get_pid(), None)
+        if match is None:
+            # Single-instance terminals map their windows from the parent
+            # process, fall back to the oldest pending spawn of that class.
+            wm_class = [c.lower() for c in (client.get_wm_class() or [])]
+            for pid, (command, started) in self.pending.items():
+                if os.path.basename(command.binary).lower() in wm_class:
+                    match = self.pending.pop(pid)
+                    break
+        if match is not None:
+            self.record(*match)
+
+    def info(self):
+        stats = {}
+        for name, history in self.latency.items():
+            ordered = sorted(history)
+            stats[name] = {
+                "count": len(ordered),
+                "last": round(history[-1] * 1000),
+                "median": round(ordered[len(ordered) // 2] * 1000),
+                "max": round(ordered[-1] * 1000),
+            }
+        return stats
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Incremental task list ------------------------------
+#
+# widget.TaskList measures every title with a fresh pango layout, and redraws
+# the whole bar on every focus change or title change. This version keeps:
+#
+#   - scaled icons per (wm_class, icon_size), shared by every window of a class
+#     and every TaskList on every screen,
+#   - title widths per title,
+#   - rendered boxes per (title, width, colours, icon), so an event re-renders
+#     only the entries whose box changed and blits the rest.
+#
+# An event that leaves the visible entries unchanged (a title change in
+# another group, a repeated focus_change) draws nothing. The widget redraws
+# itself, not the whole bar. `qtile cmd-obj -o widget tasklist -f benchmark`
+# compares it with the stock widget at 10/50/200 fake windows.
+
+import math
+import time
+from collections import OrderedDict
+
+import cairocffi
+
+from libqtile import pangocffi, widget
+
+_icons = {}
+
+
+def _hashable(colour):
+    return tuple(colour) if isinstance(colour, list) else colour
+
+
+class _FakeGroup:
+    current_window = None
+
+
+class _FakeWindow:
+    def __init__(self, wid, name, wm_class, group, icon_size):
+        self.wid = wid
+        self.name = name
+        self.wm_class = wm_class
+        self.group = group
+        self.minimized = self.maximized = self.floating = self.urgent = False
+        size = "{0}x{0}".format(icon_size)
+        self.icons = {size: bytearray(icon_size * icon_size * 4)}
+
+    def get_wm_class(self):
+        return [self.wm_class]
+
+
+class TaskList(widget.TaskList):
+    """TaskList with cached icons, title widths and rendered boxes"""
+
+    defaults = [
+        ("cache_size", 512, "Number of rendered boxes and title widths to keep"),
+    ]
+
+    def __init__(self, **config):
+        widget.TaskList.__init__(self, **config)
+        self.add_defaults(TaskList.defaults)
+        self._classes = {}
+        self._widths = OrderedDict()
+        self._boxes = OrderedDict()
+        self._signature = None
+        self._bench = None
+        self._bypass = False
+
+    @property
+    def windows(self):
+        if self._bench is not None:
+            return self._bench
+        return self.bar.screen.group.windows
+
+    def _state(self):
+        return (self.width,) + tuple(
+            (
+                w.wid,
+                w.name,
+                w.minimized,
+                w.maximized,
+                w.floating,
+                w.urgent,
+                w is w.group.current_window,
+            )
+            for w in self.windows
+        )
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def box_width(self, text):
+        if self._bypass:
+            return widget.TaskList.box_width(self, text)
+        width = self._widths.get(text)
+        if width is None:
+            width = widget.TaskList.box_width(self, text)
+            return self._remember(self._widths, text, width)
+        self._widths.move_to_end(text)
+        return width
+
+    def _icon_key(self, window):
+        wm_class = self._classes.get(window.wid)
+        if wm_class is None:
+            classes = window.get_wm_class()
+            wm_class = classes[0] if classes else window.wid
+            self._classes[window.wid] = wm_class
+        return (wm_class, self.icon_size)
+
+    def _scaled(self, pattern):
+        # Paint the scaled pattern once instead of rescaling it on every draw
+        surface = cairocffi.ImageSurface(
+            cairocffi.FORMAT_ARGB32, self.icon_size, self.icon_size
+        )
+        ctx = cairocffi.Context(surface)
+        ctx.set_source(pattern)
+        ctx.paint()
+        return cairocffi.SurfacePattern(surface)
+
+    def get_window_icon(self, window):
+        if self._bypass:
+            return widget.TaskList.get_window_icon(self, window)
+        key = self._icon_key(window)
+        if key not in _icons:
+            pattern = widget.TaskList.get_window_icon(self, window)
+            self._icons_cache.pop(window.wid, None)
+            _icons[key] = self._scaled(pattern) if pattern is not None else None
+        return _icons[key]
+
+    def remove_icon_cache(self, window):
+        widget.TaskList.remove_icon_cache(self, window)
+        self._classes.pop(window.wid, None)
+
+    def invalidate_cache(self, window):
+        _icons.pop(self._icon_key(window), None)
+        self.remove_icon_cache(window)
+        # the icon is not part of _state(), so update() would draw nothing
+        if window in self.windows:
+            self.draw()
+
+    def update(self, window=None):
+        if self._bypass:
+            return widget.TaskList.update(self, window)
+        if window is not None and window not in self.windows:
+            return
+        if self._state() != self._signature:
+            self.draw()
+
+    def _render_box(self, key, textwidth):
+        task, bw, border, text_color, icon = key
+        pad = self.borderwidth
+        surface = cairocffi.ImageSurface(
+            cairocffi.FORMAT_ARGB32, math.ceil(bw) + 2 * pad, self.bar.height
+        )
+        ctx = self.drawer.ctx
+        self.drawer.ctx = pangocffi.patch_cairo_context(cairocffi.Context(surface))
+        try:
+            self.drawbox(
+                pad,
+                task,
+                border,
+                text_color,
+                rounded=self.rounded,
+                block=(self.highlight_method == "block"),
+                width=textwidth,
+                icon=icon,
+            )
+        finally:
+            self.drawer.ctx = ctx
+        return self._remember(self._boxes, key, surface)
+
+    def draw(self):
+        if self._bypass:
+            return widget.TaskList.draw(self)
+        self._signature = self._state()
+        self.drawer.clear(self.background or self.bar.background)
+        ctx = self.drawer.ctx
+        offset = self.margin_x
+
+        self._box_end_positions = []
+        for w, icon, task, bw in self.calc_box_widths():
+            self._box_end_positions.append(offset + bw)
+
+            if w.urgent:
+                border = self.urgent_border
+                text_color = border
+            elif w is w.group.current_window:
+                border = self.border
+                text_color = border
+            else:
+                border = self.unfocused_border or None
+                text_color = self.foreground
+
+            if self.highlight_method == "text":
+                border = None
+            else:
+                text_color = self.foreground
+
+            key = (task, bw, _hashable(border), _hashable(text_color), icon)
+            box = self._boxes.get(key)
+            if box is None:
+                textwidth = (
+                    bw
+                    - 2 * self.padding_x
+                    - ((self.icon_size + self.padding_x) if icon else 0)
+                )
+                box = self._render_box(key, textwidth)
+            else:
+                self._boxes.move_to_end(key)
+            ctx.set_source_surface(box, offset - self.borderwidth, 0)
+            ctx.paint()
+            offset += bw + self.spacing
+
+        self.drawer.draw(offsetx=self.offset, offsety=self.offsety, width=self.width)
+
+    def _bench_events(self, windows, events, bypass):
+        # Alternate title changes (a browser tab) with focus changes
+        self._bypass = bypass
+        group = windows[0].group
+        start = time.perf_counter()
+        for i in range(events):
+            window = windows[(i * 7) % len(windows)]
+            if i % 2:
+                group.current_window = window
+                self.update()
+            else:
+                window.name = "Page {} - Browser".format(i % 13)
+                self.update(window)
+            if bypass:
+                # the stock update() only asks the bar to draw
+                widget.TaskList.draw(self)
+        self._bypass = False
+        return (time.perf_counter() - start) / events * 1e3
+
+    def cmd_benchmark(self, events=200):
+        """Time title and focus events against the stock TaskList"""
+        self.bar.draw = lambda: None
+        lines = []
+        try:
+            for count in (10, 50, 200):
+                group = _FakeGroup()
+                self._bench = [
+                    _FakeWindow(
+                        -1 - i,
+                        "Window {}".format(i),
+                        "class{}".format(i % 8),
+                        group,
+                        self.icon_size or 16,
+                    )
+                    for i in range(count)
+                ]
+                group.current_window = self._bench[0]
+                stock = self._bench_events(self._bench, events, True)
+                cached = self._bench_events(self._bench, events, False)
+                lines.append(
+                    "{:>4} windows  stock {:7.3f} ms/event  cached {:7.3f} ms/event".format(
+                        count, stock, cached
+                    )
+                )
+        finally:
+            self._bench = None
+            self._bypass = False
+            del self.bar.draw
+            self._icons_cache.clear()
+            self._classes.clear()
+            self._widths.clear()
+            self._boxes.clear()
+            _icons.clear()
+            self.draw()
+        return "\n".join(lines)
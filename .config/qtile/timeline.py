@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Startup timeline ------------------------------
+#
+# Records when each startup step happens, measured from the moment the qtile
+# process started (or from the reload, for reload_config). config.py marks its
+# own sections, `instrument()` times every bar and widget _configure and each
+# bar's first paint, and services.py reports each autostarted service through
+# `expect()` and `done()`. Once every bar has painted and every service is up
+# (or timed out), the report is logged and saved to
+# ~/.cache/qtile/startup.json. To print the last one:
+#
+#   python timeline.py
+
+import json
+import os
+import time
+
+import libqtile
+from libqtile import hook
+from libqtile.log_utils import logger
+
+report_path = os.path.expanduser("~/.cache/qtile/startup.json")
+
+
+def _now():
+    return time.clock_gettime(time.CLOCK_BOOTTIME)
+
+
+def _process_start():
+    # starttime, field 22 of /proc/self/stat, in clock ticks since boot
+    with open("/proc/self/stat") as f:
+        fields = f.read().rpartition(")")[2].split()
+    return int(fields[19]) / os.sysconf("SC_CLK_TCK")
+
+
+class Timeline:
+    def __init__(self):
+        # no_spawn turns on once startup_once has fired, i.e. on reloads
+        self.cold = not getattr(libqtile.qtile, "no_spawn", False)
+        self.origin = _process_start() if self.cold else _now()
+        self.events = []
+        self.unpainted = set()
+        self.expected = set()
+        self.finished = False
+        self.mark("qtile started" if self.cold else "reload started", self.origin)
+
+    def mark(self, name, at=None, took=None):
+        at = _now() if at is None else at
+        self.events.append(((at - self.origin) * 1e3, took, name))
+
+    def span(self, name, func):
+        def wrapper(*args, **kwargs):
+            start = _now()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.mark(name, start, (_now() - start) * 1e3)
+
+        return wrapper
+
+    def _first_paint(self, name, bar):
+        draw = bar._actual_draw
+
+        def wrapper():
+            del bar._actual_draw
+            draw()
+            self.mark(name)
+            self.unpainted.discard(name)
+            self._maybe_finish()
+
+        bar._actual_draw = wrapper
+        self.unpainted.add(name)
+
+    def instrument(self, screens):
+        for name in ("startup_once", "startup", "startup_complete"):
+            getattr(hook.subscribe, name)(self._hook_mark(name))
+        for i, screen in enumerate(screens):
+            for side in ("top", "bottom", "left", "right"):
+                gap = getattr(screen, side)
+                if not hasattr(gap, "widgets"):
+                    continue
+                name = "screen {} {} bar".format(i, side)
+                gap._configure = self.span(name + " configured", gap._configure)
+                self._first_paint(name + " painted", gap)
+                for w in gap.widgets:
+                    w._configure = self.span(
+                        "widget {} configured".format(w.name), w._configure
+                    )
+
+    def _hook_mark(self, name):
+        def callback():
+            self.mark(name + " hook")
+
+        return callback
+
+    def expect(self, name):
+        # hold the report back until done(name) is called
+        self.expected.add(name)
+
+    def done(self, name, event, at=None, took=None):
+        self.mark(event, at, took)
+        self.expected.discard(name)
+        self._maybe_finish()
+
+    def _maybe_finish(self):
+        if self.finished or self.unpainted or self.expected:
+            return
+        self.finished = True
+        logger.info("startup timeline:\n%s", self.report())
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump({"cold": self.cold, "events": self.events}, f)
+
+    def report(self):
+        return format_report(self.events)
+
+
+def format_report(events):
+    lines = ["      at ms    took ms  event"]
+    for at, took, name in sorted(events, key=lambda e: e[0]):
+        lines.append(
+            "{:11.1f} {:>10}  {}".format(
+                at, "" if took is None else "{:.1f}".format(took), name
+            )
+        )
+    return "\n".join(lines)
+
+
+timeline = Timeline()
+mark = timeline.mark
+instrument = timeline.instrument
+
+
+if __name__ == "__main__":
+    with open(report_path) as f:
+        saved = json.load(f)
+    print("cold start" if saved["cold"] else "reload")
+    print(format_report(saved["events"]))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Cached update checker ------------------------------
+#
+# CheckUpdates reruns `yay -Qu` every update_interval. This subclass keeps the
+# last count on disk and only reruns the command (at idle CPU/IO priority)
+# when the pacman database changed since the cached run or the cache is older
+# than `cache_ttl`. update_interval is then just the cost of a few stat()
+# calls, and the cached count is drawn at startup before any check runs.
+
+import json
+import os
+import shutil
+import time
+from subprocess import CalledProcessError
+
+from libqtile import widget
+from libqtile.log_utils import logger
+
+
+class CheckUpdates(widget.CheckUpdates):
+    defaults = [
+        ("cache_ttl", 3 * 60 * 60, "Rerun the check after this many seconds anyway"),
+        (
+            "cache_file",
+            "~/.cache/qtile/updates.json",
+            "Where the last update count is kept",
+        ),
+        ("pacman_db", "/var/lib/pacman", "Database whose changes trigger a recheck"),
+        ("low_priority", True, "Run the check under nice/ionice"),
+    ]
+
+    def __init__(self, **config):
+        widget.CheckUpdates.__init__(self, **config)
+        self.add_defaults(CheckUpdates.defaults)
+        self.cache_file = os.path.expanduser(self.cache_file)
+        if self.cmd and self.low_priority:
+            prefix = "nice -n 19 "
+            if shutil.which("ionice"):
+                prefix += "ionice -c 3 "
+            self.cmd = prefix + self.cmd
+        self.cache = self._load()
+        if self.cache is not None:
+            self.text = self._format(self.cache["count"])
+
+    def _configure(self, qtile, bar):
+        widget.CheckUpdates._configure(self, qtile, bar)
+        if self.cache is not None:
+            self._colour(self.cache["count"])
+
+    def _db_stamp(self):
+        try:
+            stamp = os.stat(os.path.join(self.pacman_db, "local")).st_mtime
+        except OSError:
+            stamp = 0.0
+        try:
+            with os.scandir(os.path.join(self.pacman_db, "sync")) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".db"):
+                        stamp = max(stamp, entry.stat().st_mtime)
+        except OSError:
+            pass
+        return stamp
+
+    def _load(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp = self.cache_file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.cache, f)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            logger.exception("CheckUpdates: could not write %s", self.cache_file)
+
+    def _format(self, count):
+        if count == 0:
+            return self.no_update_string
+        return self.display_format.format(updates=count)
+
+    def _colour(self, count):
+        self.layout.colour = (
+            self.colour_have_updates if count else self.colour_no_updates
+        )
+
+    def _count(self):
+        try:
+            updates = self.call_process(self.cmd, shell=True)
+        except CalledProcessError:
+            updates = ""
+        return max(0, self.custom_command_modify(len(updates.splitlines())))
+
+    def poll(self):
+        if not self.cmd:
+            return "N/A"
+        stamp = self._db_stamp()
+        cache = self.cache
+        if (
+            cache is None
+            or cache["stamp"] != stamp
+            or time.time() - cache["checked"] > self.cache_ttl
+        ):
+            self.cache = cache = {
+                "count": self._count(),
+                "stamp": stamp,
+                "checked": time.time(),
+            }
+            self._save()
+        self._colour(cache["count"])
+        return self._format(cache["count"])
+
+    def cmd_force_update(self):
+        """Ignore the cache and rerun the check"""
+        self.cache = None
+        future = self.qtile.run_in_executor(self.poll)
+        future.add_done_callback(lambda f: self.update(f.result()))
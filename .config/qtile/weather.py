@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding=utf-8 -*-
+
+# Cached weather ------------------------------
+#
+# Wttr fetches on every update with no timeout and shows "No network" when
+# offline. Here one Provider per URL is shared by every Wttr widget on every
+# screen and keeps the last answer in `~/.cache/qtile/weather.json`. The cached
+# text is drawn at startup and stays up while a refresh is due (stale while
+# revalidate); refreshes use If-None-Match/If-Modified-Since and failures back
+# off exponentially. `base_url` can point the widget at a local HTTP server to
+# try it without wttr.in. FakeWttr is one: it answers with an ETag and a
+# Last-Modified, 304 to a matching conditional request and 503 when told to
+# fail. Run against it, the self-check goes through the cache, the
+# conditional requests, the backoff and the stale text:
+#
+#   python weather.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
+
+from libqtile import widget
+from libqtile.log_utils import logger
+
+cache_path = os.path.expanduser("~/.cache/qtile/weather.json")
+
+_providers = {}
+_cache_lock = threading.Lock()
+
+
+def _read_cache():
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_entry(url, entry):
+    with _cache_lock:
+        cache = _read_cache()
+        cache[url] = entry
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp = cache_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp, cache_path)
+        except OSError:
+            logger.exception("weather: could not write %s", cache_path)
+
+
+class Provider:
+    def __init__(self, url, max_age=600, timeout=10, backoff=30, max_backoff=3600):
+        self.url = url
+        self.max_age = max_age
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.entry = _read_cache().get(url)
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def text(self):
+        return self.entry["text"] if self.entry else None
+
+    def stale(self):
+        return self.entry is None or time.time() - self.entry["fetched"] > self.max_age
+
+    def refresh(self, user_agent="Qtile"):
+        # Called from widget poll threads; only one of them does the request.
+        if not self.lock.acquire(blocking=False):
+            return self.text
+        try:
+            if not self.stale() or time.monotonic() < self.retry_at:
+                return self.text
+            headers = {"User-agent": user_agent}
+            if self.entry:
+                if self.entry.get("etag"):
+                    headers["If-None-Match"] = self.entry["etag"]
+                if self.entry.get("last_modified"):
+                    headers["If-Modified-Since"] = self.entry["last_modified"]
+            try:
+                res = urlopen(Request(self.url, None, headers), timeout=self.timeout)
+                charset = res.headers.get_content_charset() or "utf-8"
+                self.entry = {
+                    "text": res.read().decode(charset).strip(),
+                    "etag": res.headers.get("ETag"),
+                    "last_modified": res.headers.get("Last-Modified"),
+                    "fetched": time.time(),
+                }
+            except HTTPError as e:
+                if e.code != 304 or self.entry is None:
+                    return self._failed(e)
+                self.entry["fetched"] = time.time()
+            except (URLError, OSError) as e:
+                return self._failed(e)
+            self.failures = 0
+            self.retry_at = 0.0
+            _write_entry(self.url, self.entry)
+            return self.text
+        finally:
+            self.lock.release()
+
+    def _failed(self, error):
+        delay = min(self.max_backoff, self.backoff * 2**self.failures)
+        self.failures += 1
+        self.retry_at = time.monotonic() + delay
+        logger.info("weather: %s failed (%s), retrying in %ss", self.url, error, delay)
+        return self.text
+
+
+def provider(url, **config):
+    if url not in _providers:
+        _providers[url] = Provider(url, **config)
+    return _providers[url]
+
+
+class Wttr(widget.Wttr):
+    defaults = [
+        ("base_url", "https://wttr.in", "Weather service, wttr.in compatible"),
+        ("max_age", 600, "Refetch once the cached weather is older than this"),
+        ("stale_marker", "", "Appended to the text while it is stale"),
+        ("offline_text", "-", "Shown when nothing was ever fetched"),
+    ]
+
+    def __init__(self, **config):
+        config.setdefault("update_interval", 60)
+        widget.Wttr.__init__(self, **config)
+        self.add_defaults(Wttr.defaults)
+        self.url = self._get_url()
+        self.provider = provider(self.url, max_age=self.max_age)
+        self.text = self.provider.text or self.offline_text
+
+    def _get_url(self):
+        # An empty location lets wttr.in locate us by IP
+        location = ":".join(quote(loc) for loc in (self.location or {}))
+        params = urlencode({"format": self.format, "lang": self.lang})
+        return "{}/{}?{}&{}".format(
+            getattr(self, "base_url", "https://wttr.in"), location, self.units, params
+        )
+
+    def poll(self):
+        text = self.provider.refresh(self.user_agent)
+        if text is None:
+            return self.offline_text
+        if self.provider.stale():
+            text += self.stale_marker
+        return self.parse(text)
+
+
+class FakeWttr:
+    def __init__(self, text="+12°C"):
+        self.text = text
+        self.failing = False
+        self.requests = []
+        self._changed(text)
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append(dict(self.headers))
+                fake.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+
+    def _changed(self, text):
+        self.text = text
+        self.etag = '"{}"'.format(abs(hash(text)))
+        self.last_modified = formatdate(usegmt=True)
+
+    def handle(self, req):
+        if self.failing:
+            req.send_error(503)
+            return
+        if req.headers.get("If-None-Match") == self.etag or (
+            req.headers.get("If-Modified-Since") == self.last_modified
+            and "If-None-Match" not in req.headers
+        ):
+            req.send_response(304)
+            req.end_headers()
+            return
+        body = self.text.encode()
+        req.send_response(200)
+        req.send_header("Content-Type", "text/plain; charset=utf-8")
+        req.send_header("Content-Length", str(len(body)))
+        req.send_header("ETag", self.etag)
+        req.send_header("Last-Modified", self.last_modified)
+        req.end_headers()
+        req.wfile.write(body)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _selfcheck():
+    global cache_path
+    failures = []
+
+    def check(ok, what):
+        print("{} {}".format("ok  " if ok else "FAIL", what))
+        if not ok:
+            failures.append(what)
+
+    directory = tempfile.mkdtemp(prefix="qtile-weather-")
+    cache_path = os.path.join(directory, "weather.json")
+    server = FakeWttr()
+    config = dict(max_age=0.3, timeout=2, backoff=0.2, max_backoff=0.4)
+    try:
+        p = Provider(server.url, **config)
+        check(p.refresh() == "+12°C" and len(server.requests) == 1, "first fetch")
+        check("If-None-Match" not in server.requests[0], "no validators at first")
+        p.refresh()
+        check(len(server.requests) == 1, "a fresh cache makes no request")
+        check(Provider(server.url).text == "+12°C", "the cache file is read back")
+
+        time.sleep(0.4)
+        check(p.stale(), "stale after max_age")
+        check(p.refresh() == "+12°C", "304 keeps the cached text")
+        sent = server.requests[-1]
+        check(
+            sent.get("If-None-Match") == server.etag
+            and sent.get("If-Modified-Since") == server.last_modified,
+            "the refresh is conditional",
+        )
+        check(not p.stale(), "304 renews the cached text")
+
+        server.failing = True
+        time.sleep(0.4)
+        check(p.refresh() == "+12°C", "503 serves the stale text")
+        check(p.failures == 1, "503 counts as a failure")
+        count = len(server.requests)
+        p.refresh()
+        check(len(server.requests) == count, "no request while backing off")
+        time.sleep(0.25)
+        p.refresh()
+        waited = p.retry_at - time.monotonic()
+        check(p.failures == 2 and waited > 0.3, "the backoff doubles")
+
+        server.failing = False
+        server._changed("+14°C")
+        time.sleep(0.45)
+        check(p.refresh() == "+14°C" and p.failures == 0, "recovers with new text")
+        check(
+            Provider(server.url).entry["etag"] == server.etag, "the new ETag is saved"
+        )
+    finally:
+        server.close()
+        shutil.rmtree(directory)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(_selfcheck())